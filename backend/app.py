@@ -1,25 +1,95 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, has_app_context, Response, stream_with_context
 from flask_cors import CORS
 import sqlite3
 import os
-from datetime import datetime
+from datetime import datetime, timezone
 import uuid
 import re
+import json
+import time
+
+from connection_pool import ConnectionPool
+from client_registry import ClientRegistry
+from batch_edit import BatchAborted, BatchError, batch_delete, batch_update, validate_request
+from bulk_import import BulkImporter, import_rows
+from changes import API_NAMES, MAX_LIMIT, ChangeNotifier, latest_sequence, prune, read_changes
+from stream_import import ImportFormatError, stream_import
+from migrations import migrate_all, migrate_database
+from money import to_paise
+from natural_keys import ImportModeError, duplicate_message, is_duplicate_error, parse_mode
+from portfolio import PortfolioCache, iter_portfolio
+from gstr1 import (FORMATS as GSTR1_FORMATS, Gstr1Error, export_filename, iter_export, parse_format,
+                   parse_sections)
+from jobs import JobManager, adopt_jobs, create_jobs_table
+from ledger import LedgerCache
+from list_queries import ListQueryError, list_query_json, query_columns
+from normalized import parse_date
+from partitions import SpanError, reader_for, search_readers
+from reports import (GSTR3B_COLUMNS, HSN_SOURCES_SQL, RATE_SUMMARY_TABLES, financial_year_months, gstr3b_summary,
+                     iter_hsn_summary_json, rate_summary)
+from rollups import month_summary
+from schema import PURCHASES, SALES, B2C_SALES, SUNDRY_DEBTORS
+from search import FIELD_NAMES, MAX_LIMIT as SEARCH_MAX_LIMIT, SearchError, search
+from serializers import iter_json_array, plain_cursor, table_serializer
+from storage import connection_factory, profile_from_env
+from versions import month_versions, table_versions, version_etag
+from write_queue import WriteQueues
 
 app = Flask(__name__)
-CORS(app)  # Enable CORS for React frontend
+CORS(app, expose_headers=['ETag', 'Last-Modified'])  # Enable CORS for React frontend
 
 # Database configuration
 MAIN_DATABASE = 'gst_clients.db'
+# Background job state, apart so job progress does not touch gst_clients.db
+JOBS_DATABASE = 'gst_jobs.db'
 CLIENT_DB_DIR = 'client_databases'
 
+# Connection pool configuration
+POOL_MAX_PER_CLIENT = int(os.environ.get('GST_POOL_MAX_PER_CLIENT', 4))
+POOL_MAX_OPEN = int(os.environ.get('GST_POOL_MAX_OPEN', 64))
+POOL_IDLE_TIMEOUT = float(os.environ.get('GST_POOL_IDLE_TIMEOUT', 300))
+POOL_CHECKOUT_TIMEOUT = float(os.environ.get('GST_POOL_CHECKOUT_TIMEOUT', 10))
+
+# PRAGMAs applied to every pooled connection (see storage.py)
+STORAGE_PROFILE = profile_from_env()
+
+# Single-row writes are batched into group commits per client database
+WRITE_MAX_BATCH = int(os.environ.get('GST_WRITE_MAX_BATCH', 64))
+
+# Background bulk import jobs (?async=1); request bodies are spooled here
+JOB_PAYLOAD_DIR = 'job_payloads'
+JOB_WORKERS = int(os.environ.get('GST_JOB_WORKERS', 2))
+
+# Change log entries kept per client database, how often change streams
+# look for writes made by other processes, and how long (seconds) one
+# stream holds a server thread before the browser reconnects
+CHANGE_LOG_RETENTION = int(os.environ.get('GST_CHANGE_LOG_RETENTION', 50000))
+CHANGE_STREAM_POLL = float(os.environ.get('GST_CHANGE_STREAM_POLL', 15))
+CHANGE_STREAM_LIFETIME = float(os.environ.get('GST_CHANGE_STREAM_LIFETIME', 300))
+
+# Parallel scans over client_databases/ for the portfolio summary
+PORTFOLIO_WORKERS = int(os.environ.get('GST_PORTFOLIO_WORKERS', min(8, os.cpu_count() or 1)))
+
 # Create client database directory if it doesn't exist
 if not os.path.exists(CLIENT_DB_DIR):
     os.makedirs(CLIENT_DB_DIR)
 
+# Shared pool for the main database and every client database
+db_pool = ConnectionPool(
+    max_per_client=POOL_MAX_PER_CLIENT,
+    max_open=POOL_MAX_OPEN,
+    idle_timeout=POOL_IDLE_TIMEOUT,
+    checkout_timeout=POOL_CHECKOUT_TIMEOUT,
+    factory=connection_factory(STORAGE_PROFILE)
+)
+
+# Writer thread per client database; jobs run on pooled connections
+write_queues = WriteQueues(db_pool.connect, max_batch=WRITE_MAX_BATCH)
+
 def init_db():
     """Initialize the main SQLite database with clients table"""
     conn = sqlite3.connect(MAIN_DATABASE)
+    conn.execute('PRAGMA journal_mode=WAL')
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -40,12 +110,95 @@ def init_db():
     
     conn.commit()
     conn.close()
+    
+    jobs_conn = sqlite3.connect(JOBS_DATABASE)
+    jobs_conn.execute('PRAGMA journal_mode=WAL')
+    create_jobs_table(jobs_conn)
+    adopt_jobs(jobs_conn, MAIN_DATABASE)
+    jobs_conn.close()
+
+def checkout_connection(db_path):
+    """Check out a pooled connection, released at the latest when the request ends"""
+    conn = db_pool.connect(db_path)
+    if has_app_context():
+        g.setdefault('pooled_connections', []).append(conn)
+    return conn
+
+def partition_reader(conn, db_path, first_month=None, last_month=None, columns=None):
+    """Connection to read months of a client database from, closed years included
+    
+    conn is returned unless some of the months are in a closed financial
+    year; then it is closed and a year file connection is returned in its
+    place (see partitions.py), which is also closed when the request ends.
+    columns limits what is read of archived years.
+    """
+    reader = reader_for(conn, db_path, first_month, last_month, columns, STORAGE_PROFILE)
+    if reader is not conn and has_app_context():
+        g.setdefault('pooled_connections', []).append(reader)
+    return reader
+
+@app.teardown_appcontext
+def release_pooled_connections(exc):
+    """Return connections a route did not close (e.g. on an error path) to the pool"""
+    for conn in g.pop('pooled_connections', []):
+        conn.close()
 
 def get_db_connection():
     """Get main database connection"""
-    conn = sqlite3.connect(MAIN_DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return checkout_connection(MAIN_DATABASE)
+
+def get_jobs_connection():
+    """Connection to the background jobs database"""
+    return checkout_connection(JOBS_DATABASE)
+
+def json_response(body, conn):
+    """Response for JSON from list_query_json/serializers, closing conn when done
+    
+    body is bytes, or a generator of byte chunks that is streamed while
+    the connection is still open.
+    """
+    if isinstance(body, bytes):
+        conn.close()
+        return Response(body, mimetype='application/json')
+    
+    def generate():
+        try:
+            yield from body
+        finally:
+            conn.close()
+    
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+def data_validators(conn, tables, first_month=None, last_month=None):
+    """ETag and Last-Modified of a GET that reads tables over a month range
+    
+    Taken before the data is read, so a write that lands in between makes
+    the tag stale rather than wrong.
+    """
+    version, changed_at = table_versions(conn, tables, first_month, last_month)
+    etag = version_etag(version, changed_at, request.full_path)
+    last_modified = datetime.fromtimestamp(changed_at, timezone.utc) if changed_at else None
+    return etag, last_modified
+
+def not_modified(validators):
+    """A 304 response if the request's If-None-Match/If-Modified-Since still match"""
+    etag, last_modified = validators
+    if request.if_none_match:
+        matched = request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since and last_modified is not None:
+        matched = last_modified <= request.if_modified_since
+    else:
+        matched = False
+    return with_validators(Response(status=304), validators) if matched else None
+
+def with_validators(response, validators):
+    """Add ETag/Last-Modified; browsers keep the body but revalidate before reuse"""
+    etag, last_modified = validators
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 def sanitize_filename(name):
     """Sanitize client name for use as filename"""
@@ -62,127 +215,40 @@ def get_client_db_path(client_name):
 def init_client_db(client_name):
     """Initialize a new SQLite database for a specific client"""
     db_path = get_client_db_path(client_name)
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    # Create purchases table for the client
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS purchases (
-            id TEXT PRIMARY KEY,
-            supplier_gstin TEXT NOT NULL,
-            supplier_name TEXT NOT NULL,
-            invoice_number TEXT NOT NULL,
-            invoice_type TEXT NOT NULL,
-            invoice_date TEXT NOT NULL,
-            invoice_value REAL NOT NULL,
-            place_of_supply TEXT NOT NULL,
-            reverse_charge TEXT NOT NULL,
-            taxable_value REAL NOT NULL,
-            integrated_tax REAL NOT NULL,
-            central_tax REAL NOT NULL,
-            state_tax REAL NOT NULL,
-            cess REAL NOT NULL,
-            itc_available TEXT NOT NULL,
-            tax_rate TEXT NOT NULL,
-            month TEXT NOT NULL,
-            status TEXT DEFAULT 'active',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Create sales table for the client
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS sales (
-            id TEXT PRIMARY KEY,
-            customer_gstin TEXT NOT NULL,
-            customer_name TEXT NOT NULL,
-            invoice_number TEXT NOT NULL,
-            invoice_type TEXT NOT NULL,
-            invoice_date TEXT NOT NULL,
-            invoice_value REAL NOT NULL,
-            place_of_supply TEXT NOT NULL,
-            reverse_charge TEXT NOT NULL,
-            taxable_value REAL NOT NULL,
-            integrated_tax REAL NOT NULL,
-            central_tax REAL NOT NULL,
-            state_tax REAL NOT NULL,
-            cess REAL NOT NULL,
-            tax_rate TEXT NOT NULL,
-            month TEXT NOT NULL,
-            transaction_type TEXT DEFAULT 'B2B',
-            hsn_code TEXT,
-            quantity REAL,
-            unit_price REAL,
-            ecommerce_gstin TEXT,
-            status TEXT DEFAULT 'active',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Create B2C sales table for the client
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS b2c_sales (
-            id TEXT PRIMARY KEY,
-            month TEXT NOT NULL,
-            supply_type TEXT NOT NULL,
-            place_of_supply TEXT,
-            gst_rate TEXT NOT NULL,
-            taxable_value REAL NOT NULL,
-            central_tax REAL NOT NULL,
-            state_tax REAL NOT NULL,
-            integrated_tax REAL NOT NULL,
-            invoice_value REAL NOT NULL,
-            hsn_code TEXT,
-            quantity REAL,
-            unit_price REAL,
-            status TEXT DEFAULT 'active',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Create sundry debtors table for the client
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS sundry_debtors (
-            id TEXT PRIMARY KEY,
-            debtor_name TEXT NOT NULL,
-            gstin TEXT NOT NULL UNIQUE,
-            address TEXT,
-            contact TEXT,
-            email TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Create GST returns table for the client
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS gst_returns (
-            id TEXT PRIMARY KEY,
-            return_type TEXT NOT NULL,
-            period TEXT NOT NULL,
-            filing_date TEXT,
-            status TEXT DEFAULT 'pending',
-            total_taxable_value REAL DEFAULT 0,
-            total_tax_payable REAL DEFAULT 0,
-            total_tax_paid REAL DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
+    migrate_database(db_path)
     return db_path
 
 def get_client_db_connection(client_name):
     """Get database connection for a specific client"""
-    db_path = get_client_db_path(client_name)
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return checkout_connection(get_client_db_path(client_name))
+
+# Cached clients table; the client routes below resolve clients through it
+client_registry = ClientRegistry(MAIN_DATABASE, get_db_connection, get_client_db_path)
+
+# Computed ITC ledgers per client database and month
+ledger_cache = LedgerCache()
+
+# Wakes up change streams when a client database is written
+change_notifier = ChangeNotifier()
+
+def client_data_changed(db_path):
+    """Drop cached results derived from a client database after a write"""
+    ledger_cache.invalidate(db_path)
+    change_notifier.notify(db_path)
+
+def client_rows_imported(db_path):
+    """client_data_changed after an import, which also trims the change log it filled"""
+    client_data_changed(db_path)
+    # Queued behind the waiting writes; nobody waits for the result
+    write_queues.submit(db_path, lambda conn: prune(conn, CHANGE_LOG_RETENTION))
+
+# Per-database portfolio results, rescanned only when a file changes
+portfolio_cache = PortfolioCache()
+
+# Runs ?async=1 bulk imports in the background
+job_manager = JobManager(get_jobs_connection, db_pool.connect, JOB_PAYLOAD_DIR,
+                         workers=JOB_WORKERS, on_change=client_rows_imported,
+                         writer_lock=write_queues.writer_lock)
 
 def generate_client_id():
     """Generate unique client ID"""
@@ -250,6 +316,7 @@ def add_client():
         ))
         
         conn.commit()
+        client_registry.invalidate()
         conn.close()
         
         # Create client-specific database
@@ -310,6 +377,7 @@ def update_client(client_id):
         ))
         
         conn.commit()
+        client_registry.invalidate()
         conn.close()
         
         return jsonify({'message': 'Client updated successfully'})
@@ -334,6 +402,9 @@ def delete_client(client_id):
         cursor.execute('DELETE FROM clients WHERE id = ?', (client_id,))
         conn.commit()
         conn.close()
+        client_registry.invalidate()
+        # Nothing reads the client's database any more
+        db_pool.close_client(get_client_db_path(client['client_name']))
         
         return jsonify({'message': 'Client deleted successfully'})
         
@@ -344,14 +415,12 @@ def delete_client(client_id):
 def get_client_database_info(client_id):
     """Get information about a client's database"""
     try:
-        conn = get_db_connection()
-        client = conn.execute('SELECT * FROM clients WHERE id = ?', (client_id,)).fetchone()
-        conn.close()
+        client = client_registry.get(client_id)
         
         if not client:
             return jsonify({'error': 'Client not found'}), 404
         
-        db_path = get_client_db_path(client['client_name'])
+        db_path = client['db_path']
         db_exists = os.path.exists(db_path)
         
         return jsonify({
@@ -369,9 +438,7 @@ def get_client_database_info(client_id):
 def create_client_database(client_id):
     """Create database for an existing client"""
     try:
-        conn = get_db_connection()
-        client = conn.execute('SELECT * FROM clients WHERE id = ?', (client_id,)).fetchone()
-        conn.close()
+        client = client_registry.get(client_id)
         
         if not client:
             return jsonify({'error': 'Client not found'}), 404
@@ -388,57 +455,35 @@ def create_client_database(client_id):
 
 @app.route('/api/clients/<client_id>/purchases', methods=['GET'])
 def get_client_purchases(client_id):
-    """Get purchases for a specific client, optionally filtered by month"""
+    """Get purchases for a specific client, optionally filtered by month
+
+    Supports fields=, sort=/order=, column filters and keyset pagination
+    with limit=/cursor= (see list_queries.py).
+    """
     try:
-        conn = get_db_connection()
-        client = conn.execute('SELECT * FROM clients WHERE id = ?', (client_id,)).fetchone()
-        conn.close()
+        client = client_registry.get(client_id)
         
         if not client:
             return jsonify({'error': 'Client not found'}), 404
         
         # Get month filter from query params
         month = request.args.get('month')
+        filters = {'month': month} if month else {}
         
-        client_conn = get_client_db_connection(client['client_name'])
-        
-        if month:
-            purchases = client_conn.execute(
-                'SELECT * FROM purchases WHERE month = ? ORDER BY invoice_date DESC, created_at DESC',
-                (month,)
-            ).fetchall()
-        else:
-            purchases = client_conn.execute('SELECT * FROM purchases ORDER BY invoice_date DESC, created_at DESC').fetchall()
-        
-        client_conn.close()
-        
-        purchases_list = []
-        for purchase in purchases:
-            purchases_list.append({
-                'id': purchase['id'],
-                'supplierGSTIN': purchase['supplier_gstin'],
-                'supplierName': purchase['supplier_name'],
-                'invoiceNumber': purchase['invoice_number'],
-                'invoiceType': purchase['invoice_type'],
-                'invoiceDate': purchase['invoice_date'],
-                'invoiceValue': purchase['invoice_value'],
-                'placeOfSupply': purchase['place_of_supply'],
-                'reverseCharge': purchase['reverse_charge'],
-                'taxableValue': purchase['taxable_value'],
-                'integratedTax': purchase['integrated_tax'],
-                'centralTax': purchase['central_tax'],
-                'stateTax': purchase['state_tax'],
-                'cess': purchase['cess'],
-                'itcAvailable': purchase['itc_available'],
-                'taxRate': purchase['tax_rate'],
-                'month': purchase['month'],
-                'status': purchase['status'],
-                'createdAt': purchase['created_at'],
-                'updatedAt': purchase['updated_at']
-            })
+        client_conn = checkout_connection(client['db_path'])
+        validators = data_validators(client_conn, [PURCHASES.name], month, month)
+        unchanged = not_modified(validators)
+        if unchanged is not None:
+            client_conn.close()
+            return unchanged
+        columns = query_columns(PURCHASES, request.args, filters)
+        client_conn = partition_reader(client_conn, client['db_path'], month, month, columns)
+        body = list_query_json(client_conn, PURCHASES, request.args, filters)
         
-        return jsonify(purchases_list)
+        return with_validators(json_response(body, client_conn), validators)
         
+    except ListQueryError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -446,9 +491,7 @@ def get_client_purchases(client_id):
 def add_client_purchase(client_id):
     """Add a new purchase entry for a client"""
     try:
-        conn = get_db_connection()
-        client = conn.execute('SELECT * FROM clients WHERE id = ?', (client_id,)).fetchone()
-        conn.close()
+        client = client_registry.get(client_id)
         
         if not client:
             return jsonify({'error': 'Client not found'}), 404
@@ -463,45 +506,47 @@ def add_client_purchase(client_id):
         
         purchase_id = f"PUR_{int(datetime.now().timestamp())}_{str(uuid.uuid4())[:8].upper()}"
         
-        client_conn = get_client_db_connection(client['client_name'])
-        cursor = client_conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO purchases (
-                id, supplier_gstin, supplier_name, invoice_number, invoice_type, 
-                invoice_date, invoice_value, place_of_supply, reverse_charge, 
-                taxable_value, integrated_tax, central_tax, state_tax, cess, 
-                itc_available, tax_rate, month, status
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            purchase_id,
-            data['supplierGSTIN'],
-            data['supplierName'],
-            data['invoiceNumber'],
-            data.get('invoiceType', 'Regular'),
-            data.get('invoiceDate', ''),
-            float(data.get('invoiceValue', 0)),
-            data.get('placeOfSupply', ''),
-            data.get('reverseCharge', 'No'),
-            float(data.get('taxableValue', 0)),
-            float(data.get('integratedTax', 0)),
-            float(data.get('centralTax', 0)),
-            float(data.get('stateTax', 0)),
-            float(data.get('cess', 0)),
-            data.get('itcAvailable', 'Yes'),
-            data.get('calculatedTaxRate', '0'),
-            data['month'],
-            data.get('status', 'active')
-        ))
-        
-        client_conn.commit()
-        client_conn.close()
+        def add(conn):
+            conn.execute('''
+                INSERT INTO purchases (
+                    id, supplier_gstin, supplier_name, invoice_number, invoice_type, 
+                    invoice_date, invoice_value, place_of_supply, reverse_charge, 
+                    taxable_value, integrated_tax, central_tax, state_tax, cess, 
+                    itc_available, tax_rate, month, status
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                purchase_id,
+                data['supplierGSTIN'],
+                data['supplierName'],
+                data['invoiceNumber'],
+                data.get('invoiceType', 'Regular'),
+                data.get('invoiceDate', ''),
+                to_paise(data.get('invoiceValue')),
+                data.get('placeOfSupply', ''),
+                data.get('reverseCharge', 'No'),
+                to_paise(data.get('taxableValue')),
+                to_paise(data.get('integratedTax')),
+                to_paise(data.get('centralTax')),
+                to_paise(data.get('stateTax')),
+                to_paise(data.get('cess')),
+                data.get('itcAvailable', 'Yes'),
+                data.get('calculatedTaxRate', '0'),
+                data['month'],
+                data.get('status', 'active')
+            ))
+        
+        write_queues.run(client['db_path'], add)
+        client_data_changed(client['db_path'])
         
         return jsonify({
             'id': purchase_id,
             'message': 'Purchase added successfully'
         }), 201
         
+    except sqlite3.IntegrityError as e:
+        if is_duplicate_error(e, PURCHASES):
+            return jsonify({'error': duplicate_message(PURCHASES)}), 409
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -509,59 +554,61 @@ def add_client_purchase(client_id):
 def update_client_purchase(client_id, purchase_id):
     """Update a purchase entry for a client"""
     try:
-        conn = get_db_connection()
-        client = conn.execute('SELECT * FROM clients WHERE id = ?', (client_id,)).fetchone()
-        conn.close()
+        client = client_registry.get(client_id)
         
         if not client:
             return jsonify({'error': 'Client not found'}), 404
         
         data = request.get_json()
         
-        client_conn = get_client_db_connection(client['client_name'])
-        cursor = client_conn.cursor()
-        
-        # Check if purchase exists
-        purchase = cursor.execute('SELECT * FROM purchases WHERE id = ?', (purchase_id,)).fetchone()
-        if not purchase:
-            client_conn.close()
+        def update(conn):
+            # Check if purchase exists
+            purchase = conn.execute('SELECT * FROM purchases WHERE id = ?', (purchase_id,)).fetchone()
+            if not purchase:
+                return None
+            
+            conn.execute('''
+                UPDATE purchases SET
+                    supplier_gstin = ?, supplier_name = ?, invoice_number = ?, 
+                    invoice_type = ?, invoice_date = ?, invoice_value = ?, 
+                    place_of_supply = ?, reverse_charge = ?, taxable_value = ?, 
+                    integrated_tax = ?, central_tax = ?, state_tax = ?, cess = ?, 
+                    itc_available = ?, tax_rate = ?, month = ?, status = ?,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (
+                data.get('supplierGSTIN', purchase['supplier_gstin']),
+                data.get('supplierName', purchase['supplier_name']),
+                data.get('invoiceNumber', purchase['invoice_number']),
+                data.get('invoiceType', purchase['invoice_type']),
+                data.get('invoiceDate', purchase['invoice_date']),
+                to_paise(data.get('invoiceValue'), purchase['invoice_value']),
+                data.get('placeOfSupply', purchase['place_of_supply']),
+                data.get('reverseCharge', purchase['reverse_charge']),
+                to_paise(data.get('taxableValue'), purchase['taxable_value']),
+                to_paise(data.get('integratedTax'), purchase['integrated_tax']),
+                to_paise(data.get('centralTax'), purchase['central_tax']),
+                to_paise(data.get('stateTax'), purchase['state_tax']),
+                to_paise(data.get('cess'), purchase['cess']),
+                data.get('itcAvailable', purchase['itc_available']),
+                data.get('calculatedTaxRate', purchase['tax_rate']),
+                data.get('month', purchase['month']),
+                data.get('status', purchase['status']),
+                purchase_id
+            ))
+            
+            return True
+        
+        if not write_queues.run(client['db_path'], update):
             return jsonify({'error': 'Purchase not found'}), 404
-        
-        cursor.execute('''
-            UPDATE purchases SET
-                supplier_gstin = ?, supplier_name = ?, invoice_number = ?, 
-                invoice_type = ?, invoice_date = ?, invoice_value = ?, 
-                place_of_supply = ?, reverse_charge = ?, taxable_value = ?, 
-                integrated_tax = ?, central_tax = ?, state_tax = ?, cess = ?, 
-                itc_available = ?, tax_rate = ?, month = ?, status = ?,
-                updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        ''', (
-            data.get('supplierGSTIN', purchase['supplier_gstin']),
-            data.get('supplierName', purchase['supplier_name']),
-            data.get('invoiceNumber', purchase['invoice_number']),
-            data.get('invoiceType', purchase['invoice_type']),
-            data.get('invoiceDate', purchase['invoice_date']),
-            float(data.get('invoiceValue', purchase['invoice_value'])),
-            data.get('placeOfSupply', purchase['place_of_supply']),
-            data.get('reverseCharge', purchase['reverse_charge']),
-            float(data.get('taxableValue', purchase['taxable_value'])),
-            float(data.get('integratedTax', purchase['integrated_tax'])),
-            float(data.get('centralTax', purchase['central_tax'])),
-            float(data.get('stateTax', purchase['state_tax'])),
-            float(data.get('cess', purchase['cess'])),
-            data.get('itcAvailable', purchase['itc_available']),
-            data.get('calculatedTaxRate', purchase['tax_rate']),
-            data.get('month', purchase['month']),
-            data.get('status', purchase['status']),
-            purchase_id
-        ))
-        
-        client_conn.commit()
-        client_conn.close()
+        client_data_changed(client['db_path'])
         
         return jsonify({'message': 'Purchase updated successfully'})
         
+    except sqlite3.IntegrityError as e:
+        if is_duplicate_error(e, PURCHASES):
+            return jsonify({'error': duplicate_message(PURCHASES)}), 409
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -569,26 +616,24 @@ def update_client_purchase(client_id, purchase_id):
 def delete_client_purchase(client_id, purchase_id):
     """Delete a purchase entry for a client"""
     try:
-        conn = get_db_connection()
-        client = conn.execute('SELECT * FROM clients WHERE id = ?', (client_id,)).fetchone()
-        conn.close()
+        client = client_registry.get(client_id)
         
         if not client:
             return jsonify({'error': 'Client not found'}), 404
         
-        client_conn = get_client_db_connection(client['client_name'])
-        cursor = client_conn.cursor()
-        
-        # Check if purchase exists
-        purchase = cursor.execute('SELECT * FROM purchases WHERE id = ?', (purchase_id,)).fetchone()
-        if not purchase:
-            client_conn.close()
+        def delete(conn):
+            # Check if purchase exists
+            purchase = conn.execute('SELECT * FROM purchases WHERE id = ?', (purchase_id,)).fetchone()
+            if not purchase:
+                return None
+            
+            conn.execute('DELETE FROM purchases WHERE id = ?', (purchase_id,))
+            
+            return True
+        
+        if not write_queues.run(client['db_path'], delete):
             return jsonify({'error': 'Purchase not found'}), 404
-        
-        cursor.execute('DELETE FROM purchases WHERE id = ?', (purchase_id,))
-        
-        client_conn.commit()
-        client_conn.close()
+        client_data_changed(client['db_path'])
         
         return jsonify({'message': 'Purchase deleted successfully'})
         
@@ -599,66 +644,36 @@ def delete_client_purchase(client_id, purchase_id):
 def bulk_add_client_purchases(client_id):
     """Bulk add purchase entries for a client"""
     try:
-        conn = get_db_connection()
-        client = conn.execute('SELECT * FROM clients WHERE id = ?', (client_id,)).fetchone()
-        conn.close()
+        client = client_registry.get(client_id)
         
         if not client:
             return jsonify({'error': 'Client not found'}), 404
         
+        # ?mode=skip|upsert|replace decides what happens to invoices already present
+        try:
+            mode = parse_mode(PURCHASES, request.args.get('mode'))
+        except ImportModeError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # ?async=1 answers at once with a job id; poll /api/jobs/<id> for progress
+        if request.args.get('async') == '1':
+            job = job_manager.submit_bulk_import(client_id, client['db_path'], PURCHASES, request.stream, mode=mode)
+            return jsonify(job), 202
+        
         data = request.get_json()
         purchases = data.get('purchases', [])
         
         if not purchases:
             return jsonify({'error': 'No purchases provided'}), 400
         
-        client_conn = get_client_db_connection(client['client_name'])
-        cursor = client_conn.cursor()
-        
-        added_count = 0
-        for purchase_data in purchases:
-            try:
-                purchase_id = f"PUR_{int(datetime.now().timestamp())}_{str(uuid.uuid4())[:8].upper()}"
-                
-                cursor.execute('''
-                    INSERT INTO purchases (
-                        id, supplier_gstin, supplier_name, invoice_number, invoice_type, 
-                        invoice_date, invoice_value, place_of_supply, reverse_charge, 
-                        taxable_value, integrated_tax, central_tax, state_tax, cess, 
-                        itc_available, tax_rate, month, status
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    purchase_id,
-                    purchase_data.get('supplierGSTIN', ''),
-                    purchase_data.get('supplierName', ''),
-                    purchase_data.get('invoiceNumber', ''),
-                    purchase_data.get('invoiceType', 'Regular'),
-                    purchase_data.get('invoiceDate', ''),
-                    float(purchase_data.get('invoiceValue', 0)),
-                    purchase_data.get('placeOfSupply', ''),
-                    purchase_data.get('reverseCharge', 'No'),
-                    float(purchase_data.get('taxableValue', 0)),
-                    float(purchase_data.get('integratedTax', 0)),
-                    float(purchase_data.get('centralTax', 0)),
-                    float(purchase_data.get('stateTax', 0)),
-                    float(purchase_data.get('cess', 0)),
-                    purchase_data.get('itcAvailable', 'Yes'),
-                    purchase_data.get('calculatedTaxRate', '0'),
-                    purchase_data.get('month', ''),
-                    purchase_data.get('status', 'active')
-                ))
-                added_count += 1
-            except Exception as e:
-                print(f"Error adding purchase: {e}")
-                continue
-        
-        client_conn.commit()
+        client_conn = checkout_connection(client['db_path'])
+        result = import_rows(client_conn, PURCHASES, purchases, mode=mode,
+                             lock=write_queues.writer_lock(client['db_path']))
+        client_rows_imported(client['db_path'])
         client_conn.close()
         
-        return jsonify({
-            'message': f'Successfully added {added_count} purchases',
-            'count': added_count
-        }), 201
+        status = 201 if result['count'] or result['updated'] or not result['errorCount'] else 400
+        return jsonify(result), status
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -667,11 +682,13 @@ def bulk_add_client_purchases(client_id):
 
 @app.route('/api/clients/<client_id>/sales', methods=['GET'])
 def get_client_sales(client_id):
-    """Get sales for a specific client, optionally filtered by month and transaction type"""
+    """Get sales for a specific client, optionally filtered by month and transaction type
+
+    Supports fields=, sort=/order=, column filters and keyset pagination
+    with limit=/cursor= (see list_queries.py).
+    """
     try:
-        conn = get_db_connection()
-        client = conn.execute('SELECT * FROM clients WHERE id = ?', (client_id,)).fetchone()
-        conn.close()
+        client = client_registry.get(client_id)
         
         if not client:
             return jsonify({'error': 'Client not found'}), 404
@@ -679,60 +696,26 @@ def get_client_sales(client_id):
         # Get filters from query params
         month = request.args.get('month')
         transaction_type = request.args.get('transaction_type', 'B2B')
+        filters = {}
+        if month:
+            filters['month'] = month
+        if transaction_type:
+            filters['transaction_type'] = transaction_type
+        
+        client_conn = checkout_connection(client['db_path'])
+        validators = data_validators(client_conn, [SALES.name], month, month)
+        unchanged = not_modified(validators)
+        if unchanged is not None:
+            client_conn.close()
+            return unchanged
+        columns = query_columns(SALES, request.args, filters)
+        client_conn = partition_reader(client_conn, client['db_path'], month, month, columns)
+        body = list_query_json(client_conn, SALES, request.args, filters)
         
-        client_conn = get_client_db_connection(client['client_name'])
-        
-        if month and transaction_type:
-            sales = client_conn.execute(
-                'SELECT * FROM sales WHERE month = ? AND transaction_type = ? ORDER BY invoice_date DESC, created_at DESC',
-                (month, transaction_type)
-            ).fetchall()
-        elif month:
-            sales = client_conn.execute(
-                'SELECT * FROM sales WHERE month = ? ORDER BY invoice_date DESC, created_at DESC',
-                (month,)
-            ).fetchall()
-        elif transaction_type:
-            sales = client_conn.execute(
-                'SELECT * FROM sales WHERE transaction_type = ? ORDER BY invoice_date DESC, created_at DESC',
-                (transaction_type,)
-            ).fetchall()
-        else:
-            sales = client_conn.execute('SELECT * FROM sales ORDER BY invoice_date DESC, created_at DESC').fetchall()
-        
-        client_conn.close()
-        
-        sales_list = []
-        for sale in sales:
-            sales_list.append({
-                'id': sale['id'],
-                'customerGSTIN': sale['customer_gstin'],
-                'customerName': sale['customer_name'],
-                'invoiceNumber': sale['invoice_number'],
-                'invoiceType': sale['invoice_type'],
-                'invoiceDate': sale['invoice_date'],
-                'invoiceValue': sale['invoice_value'],
-                'placeOfSupply': sale['place_of_supply'],
-                'reverseCharge': sale['reverse_charge'],
-                'taxableValue': sale['taxable_value'],
-                'integratedTax': sale['integrated_tax'],
-                'centralTax': sale['central_tax'],
-                'stateTax': sale['state_tax'],
-                'cess': sale['cess'],
-                'taxRate': sale['tax_rate'],
-                'month': sale['month'],
-                'transactionType': sale['transaction_type'],
-                'hsnCode': sale['hsn_code'],
-                'quantity': sale['quantity'],
-                'unitPrice': sale['unit_price'],
-                'ecommerceGSTIN': sale['ecommerce_gstin'],
-                'status': sale['status'],
-                'createdAt': sale['created_at'],
-                'updatedAt': sale['updated_at']
-            })
-        
-        return jsonify(sales_list)
+        return with_validators(json_response(body, client_conn), validators)
         
+    except ListQueryError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -740,9 +723,7 @@ def get_client_sales(client_id):
 def add_client_sale(client_id):
     """Add a new sale entry for a client"""
     try:
-        conn = get_db_connection()
-        client = conn.execute('SELECT * FROM clients WHERE id = ?', (client_id,)).fetchone()
-        conn.close()
+        client = client_registry.get(client_id)
         
         if not client:
             return jsonify({'error': 'Client not found'}), 404
@@ -761,50 +742,52 @@ def add_client_sale(client_id):
         
         sale_id = f"SAL_{int(datetime.now().timestamp())}_{str(uuid.uuid4())[:8].upper()}"
         
-        client_conn = get_client_db_connection(client['client_name'])
-        cursor = client_conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO sales (
-                id, customer_gstin, customer_name, invoice_number, invoice_type, 
-                invoice_date, invoice_value, place_of_supply, reverse_charge, 
-                taxable_value, integrated_tax, central_tax, state_tax, cess, 
-                tax_rate, month, transaction_type, hsn_code, quantity, 
-                unit_price, ecommerce_gstin, status
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            sale_id,
-            data['customerGSTIN'],
-            data['customerName'],
-            data['invoiceNumber'],
-            data.get('invoiceType', 'Regular'),
-            data.get('invoiceDate', ''),
-            float(data.get('invoiceValue', 0)),
-            data.get('placeOfSupply', ''),
-            data.get('reverseCharge', 'No'),
-            float(data.get('taxableValue', 0)),
-            float(data.get('integratedTax', 0)),
-            float(data.get('centralTax', 0)),
-            float(data.get('stateTax', 0)),
-            float(data.get('cess', 0)),
-            data.get('taxRate', '0'),
-            data['month'],
-            data.get('transactionType', 'B2B'),
-            data.get('hsnCode', ''),
-            float(data.get('quantity', 0)) if data.get('quantity') else None,
-            float(data.get('unitPrice', 0)) if data.get('unitPrice') else None,
-            data.get('ecommerceGSTIN', ''),
-            data.get('status', 'active')
-        ))
-        
-        client_conn.commit()
-        client_conn.close()
+        def add(conn):
+            conn.execute('''
+                INSERT INTO sales (
+                    id, customer_gstin, customer_name, invoice_number, invoice_type, 
+                    invoice_date, invoice_value, place_of_supply, reverse_charge, 
+                    taxable_value, integrated_tax, central_tax, state_tax, cess, 
+                    tax_rate, month, transaction_type, hsn_code, quantity, 
+                    unit_price, ecommerce_gstin, status
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                sale_id,
+                data['customerGSTIN'],
+                data['customerName'],
+                data['invoiceNumber'],
+                data.get('invoiceType', 'Regular'),
+                data.get('invoiceDate', ''),
+                to_paise(data.get('invoiceValue')),
+                data.get('placeOfSupply', ''),
+                data.get('reverseCharge', 'No'),
+                to_paise(data.get('taxableValue')),
+                to_paise(data.get('integratedTax')),
+                to_paise(data.get('centralTax')),
+                to_paise(data.get('stateTax')),
+                to_paise(data.get('cess')),
+                data.get('taxRate', '0'),
+                data['month'],
+                data.get('transactionType', 'B2B'),
+                data.get('hsnCode', ''),
+                float(data.get('quantity', 0)) if data.get('quantity') else None,
+                float(data.get('unitPrice', 0)) if data.get('unitPrice') else None,
+                data.get('ecommerceGSTIN', ''),
+                data.get('status', 'active')
+            ))
+        
+        write_queues.run(client['db_path'], add)
+        client_data_changed(client['db_path'])
         
         return jsonify({
             'id': sale_id,
             'message': 'Sale added successfully'
         }), 201
         
+    except sqlite3.IntegrityError as e:
+        if is_duplicate_error(e, SALES):
+            return jsonify({'error': duplicate_message(SALES)}), 409
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -812,64 +795,66 @@ def add_client_sale(client_id):
 def update_client_sale(client_id, sale_id):
     """Update a sale entry for a client"""
     try:
-        conn = get_db_connection()
-        client = conn.execute('SELECT * FROM clients WHERE id = ?', (client_id,)).fetchone()
-        conn.close()
+        client = client_registry.get(client_id)
         
         if not client:
             return jsonify({'error': 'Client not found'}), 404
         
         data = request.get_json()
         
-        client_conn = get_client_db_connection(client['client_name'])
-        cursor = client_conn.cursor()
-        
-        # Check if sale exists
-        sale = cursor.execute('SELECT * FROM sales WHERE id = ?', (sale_id,)).fetchone()
-        if not sale:
-            client_conn.close()
+        def update(conn):
+            # Check if sale exists
+            sale = conn.execute('SELECT * FROM sales WHERE id = ?', (sale_id,)).fetchone()
+            if not sale:
+                return None
+            
+            conn.execute('''
+                UPDATE sales SET
+                    customer_gstin = ?, customer_name = ?, invoice_number = ?, 
+                    invoice_type = ?, invoice_date = ?, invoice_value = ?, 
+                    place_of_supply = ?, reverse_charge = ?, taxable_value = ?, 
+                    integrated_tax = ?, central_tax = ?, state_tax = ?, cess = ?, 
+                    tax_rate = ?, month = ?, transaction_type = ?, hsn_code = ?, 
+                    quantity = ?, unit_price = ?, ecommerce_gstin = ?, status = ?,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (
+                data.get('customerGSTIN', sale['customer_gstin']),
+                data.get('customerName', sale['customer_name']),
+                data.get('invoiceNumber', sale['invoice_number']),
+                data.get('invoiceType', sale['invoice_type']),
+                data.get('invoiceDate', sale['invoice_date']),
+                to_paise(data.get('invoiceValue'), sale['invoice_value']),
+                data.get('placeOfSupply', sale['place_of_supply']),
+                data.get('reverseCharge', sale['reverse_charge']),
+                to_paise(data.get('taxableValue'), sale['taxable_value']),
+                to_paise(data.get('integratedTax'), sale['integrated_tax']),
+                to_paise(data.get('centralTax'), sale['central_tax']),
+                to_paise(data.get('stateTax'), sale['state_tax']),
+                to_paise(data.get('cess'), sale['cess']),
+                data.get('taxRate', sale['tax_rate']),
+                data.get('month', sale['month']),
+                data.get('transactionType', sale['transaction_type']),
+                data.get('hsnCode', sale['hsn_code']),
+                float(data.get('quantity', sale['quantity'])) if data.get('quantity') else sale['quantity'],
+                float(data.get('unitPrice', sale['unit_price'])) if data.get('unitPrice') else sale['unit_price'],
+                data.get('ecommerceGSTIN', sale['ecommerce_gstin']),
+                data.get('status', sale['status']),
+                sale_id
+            ))
+            
+            return True
+        
+        if not write_queues.run(client['db_path'], update):
             return jsonify({'error': 'Sale not found'}), 404
-        
-        cursor.execute('''
-            UPDATE sales SET
-                customer_gstin = ?, customer_name = ?, invoice_number = ?, 
-                invoice_type = ?, invoice_date = ?, invoice_value = ?, 
-                place_of_supply = ?, reverse_charge = ?, taxable_value = ?, 
-                integrated_tax = ?, central_tax = ?, state_tax = ?, cess = ?, 
-                tax_rate = ?, month = ?, transaction_type = ?, hsn_code = ?, 
-                quantity = ?, unit_price = ?, ecommerce_gstin = ?, status = ?,
-                updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        ''', (
-            data.get('customerGSTIN', sale['customer_gstin']),
-            data.get('customerName', sale['customer_name']),
-            data.get('invoiceNumber', sale['invoice_number']),
-            data.get('invoiceType', sale['invoice_type']),
-            data.get('invoiceDate', sale['invoice_date']),
-            float(data.get('invoiceValue', sale['invoice_value'])),
-            data.get('placeOfSupply', sale['place_of_supply']),
-            data.get('reverseCharge', sale['reverse_charge']),
-            float(data.get('taxableValue', sale['taxable_value'])),
-            float(data.get('integratedTax', sale['integrated_tax'])),
-            float(data.get('centralTax', sale['central_tax'])),
-            float(data.get('stateTax', sale['state_tax'])),
-            float(data.get('cess', sale['cess'])),
-            data.get('taxRate', sale['tax_rate']),
-            data.get('month', sale['month']),
-            data.get('transactionType', sale['transaction_type']),
-            data.get('hsnCode', sale['hsn_code']),
-            float(data.get('quantity', sale['quantity'])) if data.get('quantity') else sale['quantity'],
-            float(data.get('unitPrice', sale['unit_price'])) if data.get('unitPrice') else sale['unit_price'],
-            data.get('ecommerceGSTIN', sale['ecommerce_gstin']),
-            data.get('status', sale['status']),
-            sale_id
-        ))
-        
-        client_conn.commit()
-        client_conn.close()
+        client_data_changed(client['db_path'])
         
         return jsonify({'message': 'Sale updated successfully'})
         
+    except sqlite3.IntegrityError as e:
+        if is_duplicate_error(e, SALES):
+            return jsonify({'error': duplicate_message(SALES)}), 409
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -877,26 +862,24 @@ def update_client_sale(client_id, sale_id):
 def delete_client_sale(client_id, sale_id):
     """Delete a sale entry for a client"""
     try:
-        conn = get_db_connection()
-        client = conn.execute('SELECT * FROM clients WHERE id = ?', (client_id,)).fetchone()
-        conn.close()
+        client = client_registry.get(client_id)
         
         if not client:
             return jsonify({'error': 'Client not found'}), 404
         
-        client_conn = get_client_db_connection(client['client_name'])
-        cursor = client_conn.cursor()
-        
-        # Check if sale exists
-        sale = cursor.execute('SELECT * FROM sales WHERE id = ?', (sale_id,)).fetchone()
-        if not sale:
-            client_conn.close()
+        def delete(conn):
+            # Check if sale exists
+            sale = conn.execute('SELECT * FROM sales WHERE id = ?', (sale_id,)).fetchone()
+            if not sale:
+                return None
+            
+            conn.execute('DELETE FROM sales WHERE id = ?', (sale_id,))
+            
+            return True
+        
+        if not write_queues.run(client['db_path'], delete):
             return jsonify({'error': 'Sale not found'}), 404
-        
-        cursor.execute('DELETE FROM sales WHERE id = ?', (sale_id,))
-        
-        client_conn.commit()
-        client_conn.close()
+        client_data_changed(client['db_path'])
         
         return jsonify({'message': 'Sale deleted successfully'})
         
@@ -907,71 +890,36 @@ def delete_client_sale(client_id, sale_id):
 def bulk_add_client_sales(client_id):
     """Bulk add sale entries for a client"""
     try:
-        conn = get_db_connection()
-        client = conn.execute('SELECT * FROM clients WHERE id = ?', (client_id,)).fetchone()
-        conn.close()
+        client = client_registry.get(client_id)
         
         if not client:
             return jsonify({'error': 'Client not found'}), 404
         
+        # ?mode=skip|upsert|replace decides what happens to invoices already present
+        try:
+            mode = parse_mode(SALES, request.args.get('mode'))
+        except ImportModeError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # ?async=1 answers at once with a job id; poll /api/jobs/<id> for progress
+        if request.args.get('async') == '1':
+            job = job_manager.submit_bulk_import(client_id, client['db_path'], SALES, request.stream, mode=mode)
+            return jsonify(job), 202
+        
         data = request.get_json()
         sales = data.get('sales', [])
         
         if not sales:
             return jsonify({'error': 'No sales provided'}), 400
         
-        client_conn = get_client_db_connection(client['client_name'])
-        cursor = client_conn.cursor()
-        
-        added_count = 0
-        for sale_data in sales:
-            try:
-                sale_id = f"SAL_{int(datetime.now().timestamp())}_{str(uuid.uuid4())[:8].upper()}"
-                
-                cursor.execute('''
-                    INSERT INTO sales (
-                        id, customer_gstin, customer_name, invoice_number, invoice_type, 
-                        invoice_date, invoice_value, place_of_supply, reverse_charge, 
-                        taxable_value, integrated_tax, central_tax, state_tax, cess, 
-                        tax_rate, month, transaction_type, hsn_code, quantity, 
-                        unit_price, ecommerce_gstin, status
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    sale_id,
-                    sale_data.get('customerGSTIN', ''),
-                    sale_data.get('customerName', ''),
-                    sale_data.get('invoiceNumber', ''),
-                    sale_data.get('invoiceType', 'Regular'),
-                    sale_data.get('invoiceDate', ''),
-                    float(sale_data.get('invoiceValue', 0)),
-                    sale_data.get('placeOfSupply', ''),
-                    sale_data.get('reverseCharge', 'No'),
-                    float(sale_data.get('taxableValue', 0)),
-                    float(sale_data.get('integratedTax', 0)),
-                    float(sale_data.get('centralTax', 0)),
-                    float(sale_data.get('stateTax', 0)),
-                    float(sale_data.get('cess', 0)),
-                    sale_data.get('taxRate', '0'),
-                    sale_data.get('month', ''),
-                    sale_data.get('transactionType', 'B2B'),
-                    sale_data.get('hsnCode', ''),
-                    float(sale_data.get('quantity', 0)) if sale_data.get('quantity') else None,
-                    float(sale_data.get('unitPrice', 0)) if sale_data.get('unitPrice') else None,
-                    sale_data.get('ecommerceGSTIN', ''),
-                    sale_data.get('status', 'active')
-                ))
-                added_count += 1
-            except Exception as e:
-                print(f"Error adding sale: {e}")
-                continue
-        
-        client_conn.commit()
+        client_conn = checkout_connection(client['db_path'])
+        result = import_rows(client_conn, SALES, sales, mode=mode,
+                             lock=write_queues.writer_lock(client['db_path']))
+        client_rows_imported(client['db_path'])
         client_conn.close()
         
-        return jsonify({
-            'message': f'Successfully added {added_count} sales',
-            'count': added_count
-        }), 201
+        status = 201 if result['count'] or result['updated'] or not result['errorCount'] else 400
+        return jsonify(result), status
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -980,53 +928,35 @@ def bulk_add_client_sales(client_id):
 
 @app.route('/api/clients/<client_id>/b2c-sales', methods=['GET'])
 def get_client_b2c_sales(client_id):
-    """Get B2C sales for a specific client, optionally filtered by month"""
+    """Get B2C sales for a specific client, optionally filtered by month
+
+    Supports fields=, sort=/order=, column filters and keyset pagination
+    with limit=/cursor= (see list_queries.py).
+    """
     try:
-        conn = get_db_connection()
-        client = conn.execute('SELECT * FROM clients WHERE id = ?', (client_id,)).fetchone()
-        conn.close()
+        client = client_registry.get(client_id)
         
         if not client:
             return jsonify({'error': 'Client not found'}), 404
         
         # Get month filter from query params
         month = request.args.get('month')
+        filters = {'month': month} if month else {}
         
-        client_conn = get_client_db_connection(client['client_name'])
-        
-        if month:
-            b2c_sales = client_conn.execute(
-                'SELECT * FROM b2c_sales WHERE month = ? ORDER BY created_at DESC',
-                (month,)
-            ).fetchall()
-        else:
-            b2c_sales = client_conn.execute('SELECT * FROM b2c_sales ORDER BY created_at DESC').fetchall()
-        
-        client_conn.close()
-        
-        b2c_sales_list = []
-        for sale in b2c_sales:
-            b2c_sales_list.append({
-                'id': sale['id'],
-                'month': sale['month'],
-                'supplyType': sale['supply_type'],
-                'placeOfSupply': sale['place_of_supply'],
-                'gstRate': sale['gst_rate'],
-                'taxableValue': sale['taxable_value'],
-                'centralTax': sale['central_tax'],
-                'stateTax': sale['state_tax'],
-                'integratedTax': sale['integrated_tax'],
-                'invoiceValue': sale['invoice_value'],
-                'hsnCode': sale['hsn_code'],
-                'quantity': sale['quantity'],
-                'unitPrice': sale['unit_price'],
-                'status': sale['status'],
-                'createdAt': sale['created_at'],
-                'updatedAt': sale['updated_at']
-            })
+        client_conn = checkout_connection(client['db_path'])
+        validators = data_validators(client_conn, [B2C_SALES.name], month, month)
+        unchanged = not_modified(validators)
+        if unchanged is not None:
+            client_conn.close()
+            return unchanged
+        columns = query_columns(B2C_SALES, request.args, filters)
+        client_conn = partition_reader(client_conn, client['db_path'], month, month, columns)
+        body = list_query_json(client_conn, B2C_SALES, request.args, filters)
         
-        return jsonify(b2c_sales_list)
+        return with_validators(json_response(body, client_conn), validators)
         
+    except ListQueryError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -1034,9 +964,7 @@ def get_client_b2c_sales(client_id):
 def add_client_b2c_sale(client_id):
     """Add a new B2C sale entry for a client"""
     try:
-        conn = get_db_connection()
-        client = conn.execute('SELECT * FROM clients WHERE id = ?', (client_id,)).fetchone()
-        conn.close()
+        client = client_registry.get(client_id)
         
         if not client:
             return jsonify({'error': 'Client not found'}), 404
@@ -1051,34 +979,32 @@ def add_client_b2c_sale(client_id):
         
         b2c_sale_id = f"B2C_{int(datetime.now().timestamp())}_{str(uuid.uuid4())[:8].upper()}"
         
-        client_conn = get_client_db_connection(client['client_name'])
-        cursor = client_conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO b2c_sales (
-                id, month, supply_type, place_of_supply, gst_rate, 
-                taxable_value, central_tax, state_tax, integrated_tax, 
-                invoice_value, hsn_code, quantity, unit_price, status
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            b2c_sale_id,
-            data['month'],
-            data['supplyType'],
-            data.get('placeOfSupply', ''),
-            data['gstRate'],
-            float(data['taxableValue']),
-            float(data.get('centralTax', 0)),
-            float(data.get('stateTax', 0)),
-            float(data.get('integratedTax', 0)),
-            float(data.get('invoiceValue', data['taxableValue'])),
-            data.get('hsnCode', ''),
-            float(data.get('quantity', 0)) if data.get('quantity') else None,
-            float(data.get('unitPrice', 0)) if data.get('unitPrice') else None,
-            data.get('status', 'active')
-        ))
-        
-        client_conn.commit()
-        client_conn.close()
+        def add(conn):
+            conn.execute('''
+                INSERT INTO b2c_sales (
+                    id, month, supply_type, place_of_supply, gst_rate, 
+                    taxable_value, central_tax, state_tax, integrated_tax, 
+                    invoice_value, hsn_code, quantity, unit_price, status
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                b2c_sale_id,
+                data['month'],
+                data['supplyType'],
+                data.get('placeOfSupply', ''),
+                data['gstRate'],
+                to_paise(data['taxableValue']),
+                to_paise(data.get('centralTax')),
+                to_paise(data.get('stateTax')),
+                to_paise(data.get('integratedTax')),
+                to_paise(data.get('invoiceValue', data['taxableValue'])),
+                data.get('hsnCode', ''),
+                float(data.get('quantity', 0)) if data.get('quantity') else None,
+                float(data.get('unitPrice', 0)) if data.get('unitPrice') else None,
+                data.get('status', 'active')
+            ))
+        
+        write_queues.run(client['db_path'], add)
+        client_data_changed(client['db_path'])
         
         return jsonify({
             'id': b2c_sale_id,
@@ -1092,50 +1018,48 @@ def add_client_b2c_sale(client_id):
 def update_client_b2c_sale(client_id, b2c_sale_id):
     """Update a B2C sale entry for a client"""
     try:
-        conn = get_db_connection()
-        client = conn.execute('SELECT * FROM clients WHERE id = ?', (client_id,)).fetchone()
-        conn.close()
+        client = client_registry.get(client_id)
         
         if not client:
             return jsonify({'error': 'Client not found'}), 404
         
         data = request.get_json()
         
-        client_conn = get_client_db_connection(client['client_name'])
-        cursor = client_conn.cursor()
-        
-        # Check if B2C sale exists
-        b2c_sale = cursor.execute('SELECT * FROM b2c_sales WHERE id = ?', (b2c_sale_id,)).fetchone()
-        if not b2c_sale:
-            client_conn.close()
+        def update(conn):
+            # Check if B2C sale exists
+            b2c_sale = conn.execute('SELECT * FROM b2c_sales WHERE id = ?', (b2c_sale_id,)).fetchone()
+            if not b2c_sale:
+                return None
+            
+            conn.execute('''
+                UPDATE b2c_sales SET
+                    month = ?, supply_type = ?, place_of_supply = ?, gst_rate = ?, 
+                    taxable_value = ?, central_tax = ?, state_tax = ?, integrated_tax = ?, 
+                    invoice_value = ?, hsn_code = ?, quantity = ?, unit_price = ?, 
+                    status = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (
+                data.get('month', b2c_sale['month']),
+                data.get('supplyType', b2c_sale['supply_type']),
+                data.get('placeOfSupply', b2c_sale['place_of_supply']),
+                data.get('gstRate', b2c_sale['gst_rate']),
+                to_paise(data.get('taxableValue'), b2c_sale['taxable_value']),
+                to_paise(data.get('centralTax'), b2c_sale['central_tax']),
+                to_paise(data.get('stateTax'), b2c_sale['state_tax']),
+                to_paise(data.get('integratedTax'), b2c_sale['integrated_tax']),
+                to_paise(data.get('invoiceValue'), b2c_sale['invoice_value']),
+                data.get('hsnCode', b2c_sale['hsn_code']),
+                float(data.get('quantity', b2c_sale['quantity'])) if data.get('quantity') else b2c_sale['quantity'],
+                float(data.get('unitPrice', b2c_sale['unit_price'])) if data.get('unitPrice') else b2c_sale['unit_price'],
+                data.get('status', b2c_sale['status']),
+                b2c_sale_id
+            ))
+            
+            return True
+        
+        if not write_queues.run(client['db_path'], update):
             return jsonify({'error': 'B2C sale not found'}), 404
-        
-        cursor.execute('''
-            UPDATE b2c_sales SET
-                month = ?, supply_type = ?, place_of_supply = ?, gst_rate = ?, 
-                taxable_value = ?, central_tax = ?, state_tax = ?, integrated_tax = ?, 
-                invoice_value = ?, hsn_code = ?, quantity = ?, unit_price = ?, 
-                status = ?, updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        ''', (
-            data.get('month', b2c_sale['month']),
-            data.get('supplyType', b2c_sale['supply_type']),
-            data.get('placeOfSupply', b2c_sale['place_of_supply']),
-            data.get('gstRate', b2c_sale['gst_rate']),
-            float(data.get('taxableValue', b2c_sale['taxable_value'])),
-            float(data.get('centralTax', b2c_sale['central_tax'])),
-            float(data.get('stateTax', b2c_sale['state_tax'])),
-            float(data.get('integratedTax', b2c_sale['integrated_tax'])),
-            float(data.get('invoiceValue', b2c_sale['invoice_value'])),
-            data.get('hsnCode', b2c_sale['hsn_code']),
-            float(data.get('quantity', b2c_sale['quantity'])) if data.get('quantity') else b2c_sale['quantity'],
-            float(data.get('unitPrice', b2c_sale['unit_price'])) if data.get('unitPrice') else b2c_sale['unit_price'],
-            data.get('status', b2c_sale['status']),
-            b2c_sale_id
-        ))
-        
-        client_conn.commit()
-        client_conn.close()
+        client_data_changed(client['db_path'])
         
         return jsonify({'message': 'B2C sale updated successfully'})
         
@@ -1146,26 +1070,24 @@ def update_client_b2c_sale(client_id, b2c_sale_id):
 def delete_client_b2c_sale(client_id, b2c_sale_id):
     """Delete a B2C sale entry for a client"""
     try:
-        conn = get_db_connection()
-        client = conn.execute('SELECT * FROM clients WHERE id = ?', (client_id,)).fetchone()
-        conn.close()
+        client = client_registry.get(client_id)
         
         if not client:
             return jsonify({'error': 'Client not found'}), 404
         
-        client_conn = get_client_db_connection(client['client_name'])
-        cursor = client_conn.cursor()
-        
-        # Check if B2C sale exists
-        b2c_sale = cursor.execute('SELECT * FROM b2c_sales WHERE id = ?', (b2c_sale_id,)).fetchone()
-        if not b2c_sale:
-            client_conn.close()
+        def delete(conn):
+            # Check if B2C sale exists
+            b2c_sale = conn.execute('SELECT * FROM b2c_sales WHERE id = ?', (b2c_sale_id,)).fetchone()
+            if not b2c_sale:
+                return None
+            
+            conn.execute('DELETE FROM b2c_sales WHERE id = ?', (b2c_sale_id,))
+            
+            return True
+        
+        if not write_queues.run(client['db_path'], delete):
             return jsonify({'error': 'B2C sale not found'}), 404
-        
-        cursor.execute('DELETE FROM b2c_sales WHERE id = ?', (b2c_sale_id,))
-        
-        client_conn.commit()
-        client_conn.close()
+        client_data_changed(client['db_path'])
         
         return jsonify({'message': 'B2C sale deleted successfully'})
         
@@ -1176,61 +1098,641 @@ def delete_client_b2c_sale(client_id, b2c_sale_id):
 def bulk_add_client_b2c_sales(client_id):
     """Bulk add B2C sale entries for a client"""
     try:
-        conn = get_db_connection()
-        client = conn.execute('SELECT * FROM clients WHERE id = ?', (client_id,)).fetchone()
-        conn.close()
+        client = client_registry.get(client_id)
         
         if not client:
             return jsonify({'error': 'Client not found'}), 404
         
+        # ?mode=skip|upsert|replace decides what happens to invoices already present
+        try:
+            mode = parse_mode(B2C_SALES, request.args.get('mode'))
+        except ImportModeError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # ?async=1 answers at once with a job id; poll /api/jobs/<id> for progress
+        if request.args.get('async') == '1':
+            job = job_manager.submit_bulk_import(client_id, client['db_path'], B2C_SALES, request.stream, mode=mode)
+            return jsonify(job), 202
+        
         data = request.get_json()
         b2c_sales = data.get('b2cSales', [])
         
         if not b2c_sales:
             return jsonify({'error': 'No B2C sales provided'}), 400
         
-        client_conn = get_client_db_connection(client['client_name'])
-        cursor = client_conn.cursor()
+        client_conn = checkout_connection(client['db_path'])
+        result = import_rows(client_conn, B2C_SALES, b2c_sales, mode=mode,
+                             lock=write_queues.writer_lock(client['db_path']))
+        client_rows_imported(client['db_path'])
+        client_conn.close()
+        
+        status = 201 if result['count'] or result['updated'] or not result['errorCount'] else 400
+        return jsonify(result), status
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Return summaries
+
+# Tables whose data versions the summary endpoints depend on
+SUMMARY_TABLES = [PURCHASES.name, SALES.name, B2C_SALES.name]
+
+@app.route('/api/clients/<client_id>/versions', methods=['GET'])
+def get_client_data_versions(client_id):
+    """Data version counters per table, for one month or every month
+    
+    A counter changes whenever a row of that table and month is written,
+    so the frontend can compare it with what it last loaded and skip the
+    reload. The list and summary endpoints derive their ETags from it.
+    """
+    try:
+        client = client_registry.get(client_id)
+        
+        if not client:
+            return jsonify({'error': 'Client not found'}), 404
+        
+        month = request.args.get('month')
+        client_conn = checkout_connection(client['db_path'])
+        data_versions = month_versions(client_conn, month)
+        client_conn.close()
+        
+        return jsonify({'month': month, 'versions': data_versions})
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/clients/<client_id>/gstr3b', methods=['GET'])
+def get_client_gstr3b(client_id):
+    """GSTR-3B tables 3.1, 3.2 and 4 for a month, aggregated in SQLite"""
+    try:
+        client = client_registry.get(client_id)
+        
+        if not client:
+            return jsonify({'error': 'Client not found'}), 404
+        
+        month = request.args.get('month')
+        if not month:
+            return jsonify({'error': 'month is required'}), 400
+        
+        client_conn = checkout_connection(client['db_path'])
+        validators = data_validators(client_conn, SUMMARY_TABLES, month, month)
+        unchanged = not_modified(validators)
+        if unchanged is not None:
+            client_conn.close()
+            return unchanged
+        client_conn = partition_reader(client_conn, client['db_path'], month, month, GSTR3B_COLUMNS)
+        summary = gstr3b_summary(client_conn, month)
+        client_conn.close()
+        
+        return with_validators(jsonify(summary), validators)
         
-        added_count = 0
-        for sale_data in b2c_sales:
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/clients/<client_id>/summary', methods=['GET'])
+def get_client_month_summary(client_id):
+    """Monthly totals, ITC and liability read from the monthly_totals rollup"""
+    try:
+        client = client_registry.get(client_id)
+        
+        if not client:
+            return jsonify({'error': 'Client not found'}), 404
+        
+        month = request.args.get('month')
+        if not month:
+            return jsonify({'error': 'month is required'}), 400
+        
+        client_conn = checkout_connection(client['db_path'])
+        validators = data_validators(client_conn, SUMMARY_TABLES, month, month)
+        unchanged = not_modified(validators)
+        if unchanged is not None:
+            client_conn.close()
+            return unchanged
+        client_conn = partition_reader(client_conn, client['db_path'], month, month, {'monthly_totals': None})
+        summary = month_summary(client_conn, month)
+        client_conn.close()
+        
+        return with_validators(jsonify(summary), validators)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/clients/<client_id>/itc-ledger', methods=['GET'])
+def get_client_itc_ledger(client_id):
+    """Opening, input, output and closing ITC per tax head for a month
+    
+    Balances are carried forward from the client's first month, or from
+    ?from=YYYY-MM when given.
+    """
+    try:
+        client = client_registry.get(client_id)
+        
+        if not client:
+            return jsonify({'error': 'Client not found'}), 404
+        
+        month = request.args.get('month')
+        if not month:
+            return jsonify({'error': 'month is required'}), 400
+        
+        first_month = request.args.get('from')
+        client_conn = checkout_connection(client['db_path'])
+        validators = data_validators(client_conn, SUMMARY_TABLES, first_month, month)
+        unchanged = not_modified(validators)
+        if unchanged is not None:
+            client_conn.close()
+            return unchanged
+        client_conn = partition_reader(client_conn, client['db_path'], first_month, month, {'monthly_totals': None})
+        ledger = ledger_cache.get(client_conn, client['db_path'], month, first_month, signature=validators[0])
+        client_conn.close()
+        
+        return with_validators(jsonify(ledger), validators)
+        
+    except SpanError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/clients/<client_id>/gstr1', methods=['GET'])
+def export_client_gstr1(client_id):
+    """GSTR-1 for a month as JSON, CSV or Excel, streamed from the database
+    
+    Query parameters: month=YYYY-MM; format=json|csv|xlsx (default json);
+    sections=b2b,b2cl,b2cs,hsn,docs (default all, CSV takes exactly one).
+    """
+    try:
+        client = client_registry.get(client_id)
+        
+        if not client:
+            return jsonify({'error': 'Client not found'}), 404
+        
+        month = request.args.get('month')
+        if not month:
+            return jsonify({'error': 'month is required'}), 400
+        try:
+            export_format = parse_format(request.args.get('format'))
+            sections = parse_sections(request.args.get('sections'), export_format)
+            filename = export_filename(client['gst_no'], month, export_format, sections)
+        except Gstr1Error as e:
+            return jsonify({'error': str(e)}), 400
+        
+        client_conn = checkout_connection(client['db_path'])
+        validators = data_validators(client_conn, [SALES.name, B2C_SALES.name], month, month)
+        unchanged = not_modified(validators)
+        if unchanged is not None:
+            client_conn.close()
+            return unchanged
+        client_conn = partition_reader(client_conn, client['db_path'], month, month)
+        chunks = iter_export(client_conn, export_format, client['gst_no'], month, sections)
+        
+        def generate():
             try:
-                b2c_sale_id = f"B2C_{int(datetime.now().timestamp())}_{str(uuid.uuid4())[:8].upper()}"
-                
-                cursor.execute('''
-                    INSERT INTO b2c_sales (
-                        id, month, supply_type, place_of_supply, gst_rate, 
-                        taxable_value, central_tax, state_tax, integrated_tax, 
-                        invoice_value, hsn_code, quantity, unit_price, status
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    b2c_sale_id,
-                    sale_data.get('month', ''),
-                    sale_data.get('supplyType', ''),
-                    sale_data.get('placeOfSupply', ''),
-                    sale_data.get('gstRate', ''),
-                    float(sale_data.get('taxableValue', 0)),
-                    float(sale_data.get('centralTax', 0)),
-                    float(sale_data.get('stateTax', 0)),
-                    float(sale_data.get('integratedTax', 0)),
-                    float(sale_data.get('invoiceValue', 0)),
-                    sale_data.get('hsnCode', ''),
-                    float(sale_data.get('quantity', 0)) if sale_data.get('quantity') else None,
-                    float(sale_data.get('unitPrice', 0)) if sale_data.get('unitPrice') else None,
-                    sale_data.get('status', 'active')
-                ))
-                added_count += 1
+                yield from chunks
+            finally:
+                client_conn.close()
+        
+        response = Response(stream_with_context(generate()), mimetype=GSTR1_FORMATS[export_format])
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return with_validators(response, validators)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/clients/<client_id>/rate-summary', methods=['GET'])
+def get_client_rate_summary(client_id):
+    """Purchase or sales totals per GST rate for an invoice date range
+    
+    Query parameters: table=purchases|sales (default sales) and
+    from/to invoice dates (YYYY-MM-DD or DD-MM-YYYY, inclusive).
+    """
+    try:
+        client = client_registry.get(client_id)
+        
+        if not client:
+            return jsonify({'error': 'Client not found'}), 404
+        
+        table = request.args.get('table', 'sales')
+        if table not in RATE_SUMMARY_TABLES:
+            return jsonify({'error': 'table must be purchases or sales'}), 400
+        if not request.args.get('from') or not request.args.get('to'):
+            return jsonify({'error': 'from and to are required'}), 400
+        try:
+            first_date = parse_date(request.args['from'])
+            last_date = parse_date(request.args['to'])
+        except ValueError:
+            return jsonify({'error': 'from and to must be dates (YYYY-MM-DD or DD-MM-YYYY)'}), 400
+        
+        client_conn = checkout_connection(client['db_path'])
+        # Invoice dates are not tied to the month a row is filed under
+        validators = data_validators(client_conn, [table])
+        unchanged = not_modified(validators)
+        if unchanged is not None:
+            client_conn.close()
+            return unchanged
+        # Invoices are filed in the month they are dated or a later one
+        client_conn = partition_reader(client_conn, client['db_path'], f'{first_date:%Y-%m}')
+        summary = rate_summary(client_conn, table, first_date, last_date)
+        client_conn.close()
+        
+        return with_validators(jsonify(summary), validators)
+        
+    except SpanError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/clients/<client_id>/hsn-summary', methods=['GET'])
+def get_client_hsn_summary(client_id):
+    """HSN-wise totals for a month, month range or financial year, streamed as JSON
+    
+    Query parameters: month=YYYY-MM, or from=YYYY-MM&to=YYYY-MM, or
+    financialYear=2024-25; sources=sales,b2c (B2B sales and B2C sales);
+    byRate=false to group by HSN code only.
+    """
+    try:
+        client = client_registry.get(client_id)
+        
+        if not client:
+            return jsonify({'error': 'Client not found'}), 404
+        
+        if request.args.get('financialYear'):
+            try:
+                first_month, last_month = financial_year_months(request.args['financialYear'])
+            except ValueError:
+                return jsonify({'error': 'financialYear must look like 2024-25'}), 400
+        else:
+            first_month = request.args.get('from') or request.args.get('month')
+            last_month = request.args.get('to') or request.args.get('month')
+            if not first_month or not last_month:
+                return jsonify({'error': 'month, from/to or financialYear is required'}), 400
+        
+        sources = [source.strip() for source in request.args.get('sources', 'sales,b2c').split(',') if source.strip()]
+        unknown = [source for source in sources if source not in HSN_SOURCES_SQL]
+        if unknown or not sources:
+            return jsonify({'error': 'sources must be sales, b2c or both'}), 400
+        by_rate = request.args.get('byRate', 'true').lower() not in ('0', 'false', 'no')
+        
+        client_conn = checkout_connection(client['db_path'])
+        validators = data_validators(client_conn, [SALES.name, B2C_SALES.name], first_month, last_month)
+        unchanged = not_modified(validators)
+        if unchanged is not None:
+            client_conn.close()
+            return unchanged
+        client_conn = partition_reader(client_conn, client['db_path'], first_month, last_month)
+        chunks = iter_hsn_summary_json(client_conn, first_month, last_month, sources, by_rate)
+        
+        def generate():
+            try:
+                yield from chunks
+            finally:
+                client_conn.close()
+        
+        response = Response(stream_with_context(generate()), mimetype='application/json')
+        return with_validators(response, validators)
+        
+    except SpanError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Streaming file import
+
+IMPORT_TABLES = {
+    'purchases': PURCHASES,
+    'sales': SALES,
+    'b2c-sales': B2C_SALES
+}
+
+@app.route('/api/clients/<client_id>/<any(purchases, sales, "b2c-sales"):kind>/import', methods=['POST'])
+def stream_import_client_file(client_id, kind):
+    """Import a CSV/Excel upload in chunks, streaming NDJSON progress events"""
+    try:
+        client = client_registry.get(client_id)
+        
+        if not client:
+            return jsonify({'error': 'Client not found'}), 404
+        
+        try:
+            mode = parse_mode(IMPORT_TABLES[kind], request.args.get('mode'))
+        except ImportModeError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        client_conn = checkout_connection(client['db_path'])
+        importer = BulkImporter(client_conn, IMPORT_TABLES[kind], mode=mode,
+                                lock=write_queues.writer_lock(client['db_path']))
+        events = stream_import(importer, request, request.args.get('month'))
+        
+        # Parse up to the first committed chunk here so format errors get a plain 400
+        try:
+            first_event = next(events)
+        except ImportFormatError as e:
+            client_conn.close()
+            return jsonify({'error': str(e)}), 400
+        
+        def generate():
+            try:
+                yield json.dumps(first_event) + '\n'
+                for event in events:
+                    yield json.dumps(event) + '\n'
             except Exception as e:
-                print(f"Error adding B2C sale: {e}")
-                continue
+                yield json.dumps({'event': 'error', 'error': str(e), **importer.result()}) + '\n'
+            finally:
+                client_conn.close()
+                client_rows_imported(client['db_path'])
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Search
+
+@app.route('/api/clients/<client_id>/search', methods=['GET'])
+def search_client_rows(client_id):
+    """Ranked prefix search over names, invoice numbers and GSTINs
+    
+    q is required; tables=purchases,sales,sundryDebtors,
+    fields=name,invoiceNumber,gstin and month=YYYY-MM narrow it, and
+    limit=/offset= page through the results.
+    """
+    try:
+        client = client_registry.get(client_id)
         
-        client_conn.commit()
+        if not client:
+            return jsonify({'error': 'Client not found'}), 404
+        
+        try:
+            text = request.args.get('q', '')
+            tables = None
+            if request.args.get('tables'):
+                names = {'purchases': 'purchases', 'sales': 'sales', 'sundryDebtors': 'sundry_debtors'}
+                keys = [key.strip() for key in request.args['tables'].split(',') if key.strip()]
+                if not all(key in names for key in keys):
+                    raise SearchError('tables must be purchases, sales and/or sundryDebtors')
+                tables = [names[key] for key in keys]
+            fields = None
+            if request.args.get('fields'):
+                keys = [key.strip() for key in request.args['fields'].split(',') if key.strip()]
+                if not all(key in FIELD_NAMES for key in keys):
+                    raise SearchError('fields must be name, invoiceNumber and/or gstin')
+                fields = [FIELD_NAMES[key] for key in keys]
+            limit = min(max(int(request.args.get('limit', 20)), 1), SEARCH_MAX_LIMIT)
+            offset = max(int(request.args.get('offset', 0)), 0)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        month = request.args.get('month')
+        client_conn = checkout_connection(client['db_path'])
+        year_conns = []
+        try:
+            # Closed years hold purchases and sales, never sundry debtors
+            if tables is None or set(tables) - {'sundry_debtors'}:
+                year_conns = search_readers(client_conn, client['db_path'], month, month)
+            result = search(client_conn, text, tables, fields, month, limit, offset, year_conns)
+        except SearchError as e:
+            return jsonify({'error': str(e)}), 400
+        finally:
+            for year_conn in year_conns:
+                year_conn.close()
+            client_conn.close()
+        
+        return jsonify(dict(result, query=text))
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Batch update and delete
+
+BATCH_TABLES = dict(IMPORT_TABLES, **{'sundry-debtors': SUNDRY_DEBTORS})
+
+# One static rule per table, so DELETE .../batch is not taken for a row id
+@app.route('/api/clients/<client_id>/purchases/batch', defaults={'kind': 'purchases'}, methods=['PATCH', 'DELETE'])
+@app.route('/api/clients/<client_id>/sales/batch', defaults={'kind': 'sales'}, methods=['PATCH', 'DELETE'])
+@app.route('/api/clients/<client_id>/b2c-sales/batch', defaults={'kind': 'b2c-sales'}, methods=['PATCH', 'DELETE'])
+@app.route('/api/clients/<client_id>/sundry-debtors/batch', defaults={'kind': 'sundry-debtors'}, methods=['PATCH', 'DELETE'])
+def batch_edit_client_rows(client_id, kind):
+    """Update or delete many rows in one transaction
+    
+    The body names the rows with "ids" or "filter"; PATCH also takes the
+    camelCase fields to "set". The response has an outcome per id; with
+    "atomic": true any missing or failing row rolls back the batch (409).
+    """
+    try:
+        client = client_registry.get(client_id)
+        
+        if not client:
+            return jsonify({'error': 'Client not found'}), 404
+        
+        table = BATCH_TABLES[kind]
+        data = request.get_json(silent=True)
+        updating = request.method == 'PATCH'
+        try:
+            validate_request(table, data, updating)
+        except BatchError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        def apply(conn):
+            if updating:
+                return batch_update(conn, table, data)
+            return batch_delete(conn, table, data)
+        
+        try:
+            result = write_queues.run(client['db_path'], apply)
+        except BatchAborted as e:
+            return jsonify(dict(e.result, error=str(e))), 409
+        except sqlite3.IntegrityError as e:
+            return jsonify({'error': str(e)}), 409
+        client_data_changed(client['db_path'])
+        
+        return jsonify(result)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Change feed
+
+def parse_change_params():
+    """since, tables and month of a change feed request"""
+    try:
+        since = int(request.headers.get('Last-Event-ID') or request.args.get('since', 0))
+    except ValueError:
+        raise ValueError('since must be a sequence number')
+    tables = None
+    if request.args.get('tables'):
+        names = {api_name: table for table, api_name in API_NAMES.items()}
+        keys = [key.strip() for key in request.args['tables'].split(',') if key.strip()]
+        unknown = [key for key in keys if key not in names]
+        if unknown:
+            raise ValueError(f"Unknown table: {', '.join(unknown)}")
+        tables = [names[key] for key in keys]
+    return since, tables, request.args.get('month')
+
+@app.route('/api/clients/<client_id>/changes', methods=['GET'])
+def get_client_changes(client_id):
+    """Rows added, updated or deleted after ?since=<seq>
+    
+    Without since only the current sequence number is returned, to be
+    taken before loading the lists. Optional month= and
+    tables=purchases,sales,b2cSales,sundryDebtors narrow the feed.
+    """
+    try:
+        client = client_registry.get(client_id)
+        
+        if not client:
+            return jsonify({'error': 'Client not found'}), 404
+        
+        try:
+            since, tables, month = parse_change_params()
+            limit = min(int(request.args.get('limit', 1000)), MAX_LIMIT)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        client_conn = checkout_connection(client['db_path'])
+        if 'since' not in request.args:
+            result = {'latest': latest_sequence(client_conn)}
+        else:
+            result = read_changes(client_conn, since, tables, month, max(limit, 1))
         client_conn.close()
         
-        return jsonify({
-            'message': f'Successfully added {added_count} B2C sales',
-            'count': added_count
-        }), 201
+        return jsonify(result)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/clients/<client_id>/changes/stream', methods=['GET'])
+def stream_client_changes(client_id):
+    """Server-Sent Events feed of the changes after ?since=<seq>
+    
+    Sends a 'changes' event (the /changes response, with the sequence as
+    the event id) whenever rows change, so EventSource reconnects resume
+    from Last-Event-ID. A 'reset' event means the client must reload.
+    The stream ends after CHANGE_STREAM_LIFETIME seconds to free its
+    server thread; the browser reconnects on its own.
+    """
+    try:
+        client = client_registry.get(client_id)
+        
+        if not client:
+            return jsonify({'error': 'Client not found'}), 404
+        
+        try:
+            since, tables, month = parse_change_params()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        db_path = client['db_path']
+        
+        def generate():
+            position = since
+            deadline = time.monotonic() + CHANGE_STREAM_LIFETIME
+            yield 'retry: 3000\n\n'
+            while time.monotonic() < deadline:
+                # Taken before reading, so a write committed meanwhile is not missed
+                seen = change_notifier.current(db_path)
+                conn = db_pool.connect(db_path)
+                try:
+                    result = read_changes(conn, position, tables, month)
+                finally:
+                    conn.close()
+                
+                if result['reset']:
+                    yield f"event: reset\ndata: {json.dumps({'latest': result['latest']})}\n\n"
+                elif result['changes']:
+                    yield f"id: {result['latest']}\nevent: changes\ndata: {json.dumps(result)}\n\n"
+                position = result['latest']
+                if result['hasMore']:
+                    continue
+                
+                # Comment lines keep proxies from closing the idle stream and
+                # let the server notice clients that went away
+                timeout = min(CHANGE_STREAM_POLL, max(deadline - time.monotonic(), 0))
+                if change_notifier.wait(db_path, seen, timeout) == seen:
+                    yield ': keepalive\n\n'
+            
+            # An id without data still becomes the Last-Event-ID of the reconnect
+            yield f'id: {position}\n\n'
+        
+        return Response(generate(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Portfolio
+
+@app.route('/api/portfolio/summary', methods=['GET'])
+def get_portfolio_summary():
+    """Sales, purchases, ITC and liability of every client for a month
+    
+    Streams one NDJSON event per client database as its scan completes,
+    then a 'done' event with the totals. ?stream=false returns one JSON
+    document instead.
+    """
+    try:
+        month = request.args.get('month')
+        if not month:
+            return jsonify({'error': 'month is required'}), 400
+        
+        clients = {os.path.normpath(client['db_path']): client for client in client_registry.all()}
+        events = iter_portfolio(CLIENT_DB_DIR, month, clients, portfolio_cache, PORTFOLIO_WORKERS)
+        
+        if request.args.get('stream', 'true').lower() in ('0', 'false', 'no'):
+            results = list(events)
+            summary = results.pop()
+            del summary['event']
+            for result in results:
+                del result['event']
+            summary['results'] = sorted(results, key=lambda result: result['database'])
+            return jsonify(summary)
+        
+        def generate():
+            for event in events:
+                yield json.dumps(event) + '\n'
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Background jobs
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Status and progress of a background job"""
+    try:
+        job = job_manager.get(job_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel a queued or running job; rows it already imported are removed"""
+    try:
+        job = job_manager.cancel(job_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        if not job['cancelRequested'] and job['status'] == 'running':
+            return jsonify({'error': f"A running {job['mode']} import cannot be cancelled", 'job': job}), 409
+        if not job['cancelRequested']:
+            return jsonify({'error': f"Job is already {job['status']}", 'job': job}), 409
+        return jsonify(job)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/clients/<client_id>/jobs', methods=['GET'])
+def get_client_jobs(client_id):
+    """Most recent background jobs of a client"""
+    try:
+        client = client_registry.get(client_id)
+        
+        if not client:
+            return jsonify({'error': 'Client not found'}), 404
+        
+        return jsonify(job_manager.list(client_id))
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1242,44 +1744,33 @@ def get_sundry_debtors(client_id):
     """Get all sundry debtors for a specific client"""
     try:
         # Get client details
-        conn = get_db_connection()
-        client = conn.execute('SELECT * FROM clients WHERE id = ?', (client_id,)).fetchone()
-        conn.close()
+        client = client_registry.get(client_id)
         
         if not client:
             return jsonify({'error': 'Client not found'}), 404
         
         # Get client database
-        client_db_path = get_client_db_path(client['client_name'])
+        client_db_path = client['db_path']
         if not os.path.exists(client_db_path):
             return jsonify({'error': 'Client database not found'}), 404
         
-        client_conn = sqlite3.connect(client_db_path)
-        client_conn.row_factory = sqlite3.Row
-        cursor = client_conn.cursor()
+        client_conn = checkout_connection(client_db_path)
+        validators = data_validators(client_conn, [SUNDRY_DEBTORS.name])
+        unchanged = not_modified(validators)
+        if unchanged is not None:
+            client_conn.close()
+            return unchanged
+        cursor = plain_cursor(client_conn)
         
         # Get all debtors
-        debtors = cursor.execute('''
-            SELECT * FROM sundry_debtors 
+        columns = SUNDRY_DEBTORS.columns
+        cursor.execute('''
+            SELECT {} FROM sundry_debtors 
             ORDER BY debtor_name ASC
-        ''').fetchall()
-        
-        client_conn.close()
+        '''.format(', '.join(column.name for column in columns)))
         
-        debtors_list = []
-        for debtor in debtors:
-            debtors_list.append({
-                'id': debtor['id'],
-                'debtorName': debtor['debtor_name'],
-                'gstin': debtor['gstin'],
-                'address': debtor['address'],
-                'contact': debtor['contact'],
-                'email': debtor['email'],
-                'createdAt': debtor['created_at'],
-                'updatedAt': debtor['updated_at']
-            })
-        
-        return jsonify(debtors_list), 200
+        response = json_response(iter_json_array(table_serializer(columns), cursor), client_conn)
+        return with_validators(response, validators)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1291,38 +1782,34 @@ def add_sundry_debtor(client_id):
         data = request.json
         
         # Get client details
-        conn = get_db_connection()
-        client = conn.execute('SELECT * FROM clients WHERE id = ?', (client_id,)).fetchone()
-        conn.close()
+        client = client_registry.get(client_id)
         
         if not client:
             return jsonify({'error': 'Client not found'}), 404
         
         # Get client database
-        client_db_path = get_client_db_path(client['client_name'])
+        client_db_path = client['db_path']
         if not os.path.exists(client_db_path):
             return jsonify({'error': 'Client database not found'}), 404
         
-        client_conn = sqlite3.connect(client_db_path)
-        cursor = client_conn.cursor()
-        
         debtor_id = str(uuid.uuid4())
         
-        cursor.execute('''
-            INSERT INTO sundry_debtors (
-                id, debtor_name, gstin, address, contact, email
-            ) VALUES (?, ?, ?, ?, ?, ?)
-        ''', (
-            debtor_id,
-            data.get('debtorName', ''),
-            data.get('gstin', ''),
-            data.get('address', ''),
-            data.get('contact', ''),
-            data.get('email', '')
-        ))
-        
-        client_conn.commit()
-        client_conn.close()
+        def add(conn):
+            conn.execute('''
+                INSERT INTO sundry_debtors (
+                    id, debtor_name, gstin, address, contact, email
+                ) VALUES (?, ?, ?, ?, ?, ?)
+            ''', (
+                debtor_id,
+                data.get('debtorName', ''),
+                data.get('gstin', ''),
+                data.get('address', ''),
+                data.get('contact', ''),
+                data.get('email', '')
+            ))
+        
+        write_queues.run(client_db_path, add)
+        client_data_changed(client_db_path)
         
         return jsonify({
             'message': 'Sundry debtor added successfully',
@@ -1341,42 +1828,34 @@ def update_sundry_debtor(client_id, debtor_id):
         data = request.json
         
         # Get client details
-        conn = get_db_connection()
-        client = conn.execute('SELECT * FROM clients WHERE id = ?', (client_id,)).fetchone()
-        conn.close()
+        client = client_registry.get(client_id)
         
         if not client:
             return jsonify({'error': 'Client not found'}), 404
         
         # Get client database
-        client_db_path = get_client_db_path(client['client_name'])
+        client_db_path = client['db_path']
         if not os.path.exists(client_db_path):
             return jsonify({'error': 'Client database not found'}), 404
         
-        client_conn = sqlite3.connect(client_db_path)
-        cursor = client_conn.cursor()
-        
-        cursor.execute('''
-            UPDATE sundry_debtors 
-            SET debtor_name = ?, gstin = ?, address = ?, contact = ?, email = ?, 
-                updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        ''', (
-            data.get('debtorName', ''),
-            data.get('gstin', ''),
-            data.get('address', ''),
-            data.get('contact', ''),
-            data.get('email', ''),
-            debtor_id
-        ))
-        
-        client_conn.commit()
-        
-        if cursor.rowcount == 0:
-            client_conn.close()
+        def update(conn):
+            return conn.execute('''
+                UPDATE sundry_debtors 
+                SET debtor_name = ?, gstin = ?, address = ?, contact = ?, email = ?, 
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (
+                data.get('debtorName', ''),
+                data.get('gstin', ''),
+                data.get('address', ''),
+                data.get('contact', ''),
+                data.get('email', ''),
+                debtor_id
+            )).rowcount
+        
+        if not write_queues.run(client_db_path, update):
             return jsonify({'error': 'Sundry debtor not found'}), 404
-        
-        client_conn.close()
+        client_data_changed(client_db_path)
         
         return jsonify({'message': 'Sundry debtor updated successfully'}), 200
         
@@ -1390,30 +1869,22 @@ def delete_sundry_debtor(client_id, debtor_id):
     """Delete a sundry debtor"""
     try:
         # Get client details
-        conn = get_db_connection()
-        client = conn.execute('SELECT * FROM clients WHERE id = ?', (client_id,)).fetchone()
-        conn.close()
+        client = client_registry.get(client_id)
         
         if not client:
             return jsonify({'error': 'Client not found'}), 404
         
         # Get client database
-        client_db_path = get_client_db_path(client['client_name'])
+        client_db_path = client['db_path']
         if not os.path.exists(client_db_path):
             return jsonify({'error': 'Client database not found'}), 404
         
-        client_conn = sqlite3.connect(client_db_path)
-        cursor = client_conn.cursor()
-        
-        cursor.execute('DELETE FROM sundry_debtors WHERE id = ?', (debtor_id,))
+        def delete(conn):
+            return conn.execute('DELETE FROM sundry_debtors WHERE id = ?', (debtor_id,)).rowcount
         
-        client_conn.commit()
-        
-        if cursor.rowcount == 0:
-            client_conn.close()
+        if not write_queues.run(client_db_path, delete):
             return jsonify({'error': 'Sundry debtor not found'}), 404
-        
-        client_conn.close()
+        client_data_changed(client_db_path)
         
         return jsonify({'message': 'Sundry debtor deleted successfully'}), 200
         
@@ -1423,10 +1894,46 @@ def delete_sundry_debtor(client_id, debtor_id):
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({'status': 'healthy', 'message': 'GST Software Backend is running'})
+    return jsonify({
+        'status': 'healthy',
+        'message': 'GST Software Backend is running',
+        'connectionPool': db_pool.stats(),
+        'clientRegistry': client_registry.stats(),
+        'ledgerCache': ledger_cache.stats(),
+        'writeQueues': write_queues.stats(),
+        'storageProfile': STORAGE_PROFILE
+    })
 
-if __name__ == '__main__':
+def prepare_databases():
+    """Create the main database and bring every client database up to date"""
     init_db()
     print("Database initialized successfully!")
-    print("Starting Flask server...")
-    app.run(debug=True, host='127.0.0.1', port=5001)
+    for db_path, applied, error in migrate_all(CLIENT_DB_DIR):
+        if error is not None:
+            print(f"Warning: Could not migrate {db_path}: {error}")
+        elif applied:
+            print(f"Migrated {db_path} to schema version {applied[-1]}")
+    for client in client_registry.all():
+        if os.path.exists(client['db_path']):
+            conn = db_pool.connect(client['db_path'])
+            try:
+                prune(conn, CHANGE_LOG_RETENTION)
+                conn.commit()
+            finally:
+                conn.close()
+
+def resume_jobs():
+    """Pick up the background jobs of server processes that no longer exist"""
+    for job_id in job_manager.resume():
+        print(f"Resuming interrupted job {job_id}")
+
+if __name__ == '__main__':
+    if os.environ.get('GST_DEBUG') == '1':
+        # Development server with the reloader and debugger, opt-in only
+        prepare_databases()
+        resume_jobs()
+        print("Starting Flask development server...")
+        app.run(debug=True, host='127.0.0.1', port=5001)
+    else:
+        from serve import serve
+        serve(app, db_pool, prepare_databases, resume_jobs)
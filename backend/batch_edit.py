@@ -0,0 +1,191 @@
+"""
+Batch update and batch delete for the client tables.
+
+A batch request names its rows either by id or by a filter and runs as
+one job on the client's write queue, so every row is changed inside a
+single transaction:
+
+    {"ids": ["PUR_...", ...], "set": {"itcAvailable": "No"}}
+    {"filter": {"month": "2024-04", "invoiceType": "Regular"}, "set": {...}}
+    {"ids": [...]}                                   (delete)
+
+Rows are changed with one statement per chunk of ids. If a chunk hits a
+constraint (e.g. a duplicate GSTIN) it is retried row by row, so only
+the offending rows fail. The result lists an outcome for every id:
+updated/deleted, not_found or error. With "atomic": true a single
+missing or failing row rolls the whole batch back instead.
+"""
+
+import sqlite3
+
+from bulk_import import to_optional_number
+from list_queries import ListQueryError, column_filter, date_filter
+from money import to_paise
+
+# Ids per statement, well below SQLite's variable limit
+CHUNK_SIZE = 500
+
+MAX_IDS = 50000
+
+
+class BatchError(ValueError):
+    """Raised for an invalid batch request; the route answers with a 400"""
+
+
+class BatchAborted(Exception):
+    """Raised inside the write job to roll back an atomic batch"""
+
+    def __init__(self, result):
+        super().__init__('Batch rolled back: not every row could be changed')
+        self.result = result
+
+
+def parse_assignments(table, values):
+    """Column assignments from a camelCase "set" object"""
+    if not isinstance(values, dict) or not values:
+        raise BatchError('set must be an object with at least one field')
+    by_input = {column.source: column for column in table.input_columns}
+    assignments = []
+    for key, value in values.items():
+        column = table.by_key.get(key) or by_input.get(key)
+        if column is None or column.kind == 'generated':
+            raise BatchError(f'Cannot set field: {key}')
+        try:
+            if column.kind == 'amount':
+                value = to_paise(value, to_paise(column.default))
+            elif column.kind == 'optional':
+                value = to_optional_number(value)
+            elif value is None:
+                value = column.default
+            else:
+                value = str(value)
+        except (TypeError, ValueError):
+            raise BatchError(f'{key} must be a number')
+        assignments.append((column.name, value))
+    return assignments
+
+
+def parse_selection(table, data):
+    """(ids, None) or (None, (where, params)) from a batch request body"""
+    ids = data.get('ids')
+    filters = data.get('filter')
+    if (ids is None) == (filters is None):
+        raise BatchError('Give either ids or filter')
+
+    if ids is not None:
+        if not isinstance(ids, list) or not ids or not all(isinstance(row_id, str) for row_id in ids):
+            raise BatchError('ids must be a non-empty list of ids')
+        if len(ids) > MAX_IDS:
+            raise BatchError(f'At most {MAX_IDS} ids per batch')
+        return list(dict.fromkeys(ids)), None
+
+    if not isinstance(filters, dict) or not filters:
+        raise BatchError('filter must name at least one field')
+    where, params = [], []
+    for key, value in filters.items():
+        try:
+            if key in ('invoiceDateFrom', 'invoiceDateTo') and 'invoice_date' in table.by_name:
+                where.append('invoice_day >= ?' if key == 'invoiceDateFrom' else 'invoice_day <= ?')
+                value = date_filter(key, value)
+            else:
+                column = table.by_key.get(key)
+                if column is None:
+                    raise BatchError(f'Unknown filter: {key}')
+                condition, value = column_filter(table, column, value)
+                where.append(condition)
+        except ListQueryError as e:
+            raise BatchError(str(e))
+        params.append(value)
+    return None, (' AND '.join(where), params)
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _existing_ids(conn, table, ids):
+    found = set()
+    for chunk in _chunks(ids):
+        found.update(row[0] for row in conn.execute(
+            f"SELECT id FROM {table.name} WHERE id IN ({', '.join('?' * len(chunk))})", chunk
+        ))
+    return found
+
+
+def _run_batch(conn, table, data, statement, params, done_status):
+    """Apply statement (ending in "WHERE id IN ") to the selected rows"""
+    ids, condition = parse_selection(table, data)
+    if ids is not None:
+        found = _existing_ids(conn, table, ids)
+        targets = [row_id for row_id in ids if row_id in found]
+    else:
+        where, where_params = condition
+        ids = targets = [row[0] for row in conn.execute(f'SELECT id FROM {table.name} WHERE {where}', where_params)]
+        found = set(targets)
+
+    errors = {}
+    for chunk in _chunks(targets):
+        conn.execute('SAVEPOINT batch_chunk')
+        try:
+            conn.execute(f"{statement}({', '.join('?' * len(chunk))})", params + chunk)
+            conn.execute('RELEASE batch_chunk')
+            continue
+        except sqlite3.IntegrityError:
+            conn.execute('ROLLBACK TO batch_chunk')
+            conn.execute('RELEASE batch_chunk')
+
+        # Retry the chunk one row at a time to find the rows that fail
+        for row_id in chunk:
+            conn.execute('SAVEPOINT batch_row')
+            try:
+                conn.execute(f'{statement}(?)', params + [row_id])
+            except sqlite3.IntegrityError as e:
+                conn.execute('ROLLBACK TO batch_row')
+                errors[row_id] = str(e)
+            conn.execute('RELEASE batch_row')
+
+    outcomes = []
+    for row_id in ids:
+        if row_id not in found:
+            outcomes.append({'id': row_id, 'status': 'not_found'})
+        elif row_id in errors:
+            outcomes.append({'id': row_id, 'status': 'error', 'error': errors[row_id]})
+        else:
+            outcomes.append({'id': row_id, 'status': done_status})
+
+    changed = len(targets) - len(errors)
+    result = {
+        'matched': len(targets),
+        done_status: changed,
+        'notFound': len(ids) - len(targets),
+        'failed': len(errors),
+        'outcomes': outcomes,
+    }
+    if data.get('atomic') and changed != len(ids):
+        raise BatchAborted(result)
+    return result
+
+
+def batch_update(conn, table, data):
+    """Apply data['set'] to the selected rows; returns the per-id result"""
+    assignments = parse_assignments(table, data.get('set'))
+    updates = [f'{name} = ?' for name, _value in assignments]
+    if 'updated_at' in table.by_name:
+        updates.append('updated_at = CURRENT_TIMESTAMP')
+    statement = f"UPDATE {table.name} SET {', '.join(updates)} WHERE id IN "
+    return _run_batch(conn, table, data, statement, [value for _name, value in assignments], 'updated')
+
+
+def batch_delete(conn, table, data):
+    """Delete the selected rows; returns the per-id result"""
+    return _run_batch(conn, table, data, f'DELETE FROM {table.name} WHERE id IN ', [], 'deleted')
+
+
+def validate_request(table, data, update):
+    """Check a request body before it is queued; raises BatchError"""
+    if not isinstance(data, dict):
+        raise BatchError('Request body must be a JSON object')
+    parse_selection(table, data)
+    if update:
+        parse_assignments(table, data.get('set'))
@@ -0,0 +1,128 @@
+"""
+Size and read times of a closed financial year kept as a year file and
+as a columnar archive.
+
+Builds a synthetic client with a year of sales, closes the year (see
+partitions.py) and times month reads through partitions.reader_for the
+way the routes do: a page of a month's sales with three fields, the
+month summary from the rollup and GSTR-3B. The year is then archived
+and the same reads are timed again, reading only the columns each query
+needs from the memory-mapped archive.
+
+Usage (from the backend directory):
+    python benchmarks/bench_archive.py --rows 120000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from bulk_import import BulkImporter  # noqa: E402
+from connection_pool import default_connection_factory  # noqa: E402
+from list_queries import list_query_json, query_columns  # noqa: E402
+from migrations import migrate_database  # noqa: E402
+from partitions import archive_path, archive_year, close_year, reader_for, year_path  # noqa: E402
+from reports import GSTR3B_COLUMNS, gstr3b_summary  # noqa: E402
+from rollups import month_summary  # noqa: E402
+from schema import SALES  # noqa: E402
+
+FINANCIAL_YEAR = '2023-24'
+MONTHS = [f'2023-{month:02d}' for month in range(4, 13)] + [f'2024-{month:02d}' for month in range(1, 4)]
+MONTH = '2023-09'
+RATES = ('5', '12', '18', '28')
+LIST_ARGS = {'fields': 'invoiceNumber,customerName,taxableValue', 'limit': '100'}
+
+
+def populate(conn, rows):
+    sales = (
+        {
+            'customerGSTIN': f'27AAAPL{i % 10000:05d}C1ZV',
+            'customerName': f'Customer {i % 997}',
+            'invoiceNumber': f'INV/{i:08d}',
+            'invoiceDate': f'{MONTHS[i % 12]}-{(i % 28) + 1:02d}',
+            'invoiceValue': 1180 + i % 100,
+            'taxableValue': 1000 + i % 100,
+            'centralTax': 90,
+            'stateTax': 90,
+            'taxRate': RATES[i % len(RATES)],
+            'hsnCode': f'{8400 + i % 50}',
+            'month': MONTHS[i % 12],
+            'transactionType': 'B2B',
+        }
+        for i in range(rows)
+    )
+    BulkImporter(conn, SALES).import_rows(sales)
+
+
+def read_list(db_path):
+    filters = {'month': MONTH, 'transaction_type': 'B2B'}
+    conn = reader_for(default_connection_factory(db_path), db_path, MONTH, MONTH,
+                      query_columns(SALES, LIST_ARGS, filters))
+    try:
+        return list_query_json(conn, SALES, LIST_ARGS, filters)
+    finally:
+        conn.close()
+
+
+def read_summary(db_path):
+    conn = reader_for(default_connection_factory(db_path), db_path, MONTH, MONTH, {'monthly_totals': None})
+    try:
+        return month_summary(conn, MONTH)
+    finally:
+        conn.close()
+
+
+def read_gstr3b(db_path):
+    conn = reader_for(default_connection_factory(db_path), db_path, MONTH, MONTH, GSTR3B_COLUMNS)
+    try:
+        return gstr3b_summary(conn, MONTH)
+    finally:
+        conn.close()
+
+
+def timed(fn, db_path, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(db_path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[12000, 120000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    reads = (('list page', read_list), ('summary', read_summary), ('gstr3b', read_gstr3b))
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in args.rows:
+            db_path = os.path.join(workdir, f'archive_{rows}.db')
+            migrate_database(db_path)
+            conn = default_connection_factory(db_path)
+            populate(conn, rows)
+            conn.close()
+
+            close_year(db_path, FINANCIAL_YEAR)
+            year_size = os.path.getsize(year_path(db_path, FINANCIAL_YEAR))
+            year_times = {name: timed(fn, db_path, args.repeat) for name, fn in reads}
+            archive_year(db_path, FINANCIAL_YEAR)
+            archive_size = os.path.getsize(archive_path(db_path, FINANCIAL_YEAR))
+            archive_times = {name: timed(fn, db_path, args.repeat) for name, fn in reads}
+
+            print(f'{rows:>9,} sales  year file {year_size / 1e6:6.1f} MB  |  archive {archive_size / 1e6:6.1f} MB')
+            for name, _fn in reads:
+                (year_time, year_result), (archive_time, archive_result) = year_times[name], archive_times[name]
+                assert year_result == archive_result, name
+                print(f'    {name:<10} year file {year_time * 1000:7.1f} ms  |  archive {archive_time * 1000:7.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""
+Benchmark the bulk import engine against the old row-by-row insert loop.
+
+Usage (from the backend directory):
+    python benchmarks/bench_bulk_import.py                  # 1k, 100k and 1M rows
+    python benchmarks/bench_bulk_import.py --sizes 1000 10000 --legacy
+    python benchmarks/bench_bulk_import.py --sizes 100000 --reimport   # skip/upsert/replace
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from bulk_import import BulkImporter  # noqa: E402
+from connection_pool import default_connection_factory  # noqa: E402
+from schema import PURCHASES  # noqa: E402
+
+
+def make_purchases(count):
+    """Synthetic purchase rows shaped like the PurchasePage payload"""
+    for i in range(count):
+        taxable = 1000 + (i % 5000)
+        yield {
+            'supplierGSTIN': f'27AAAPL{i % 10000:04d}C1ZV',
+            'supplierName': f'Supplier {i % 997}',
+            'invoiceNumber': f'INV/{i:08d}',
+            'invoiceType': 'Regular',
+            'invoiceDate': f'2024-{(i % 12) + 1:02d}-{(i % 28) + 1:02d}',
+            'invoiceValue': str(taxable * 1.18),
+            'placeOfSupply': '27-Maharashtra',
+            'reverseCharge': 'No',
+            'taxableValue': str(taxable),
+            'integratedTax': 0,
+            'centralTax': taxable * 0.09,
+            'stateTax': taxable * 0.09,
+            'cess': 0,
+            'itcAvailable': 'Yes',
+            'calculatedTaxRate': '18',
+            'month': f'2024-{(i % 12) + 1:02d}',
+        }
+
+
+def legacy_import(conn, purchases):
+    """The per-row loop the bulk route used before the import engine"""
+    cursor = conn.cursor()
+    for purchase_data in purchases:
+        try:
+            purchase_id = f"PUR_{int(datetime.now().timestamp())}_{str(uuid.uuid4())[:8].upper()}"
+            cursor.execute('''
+                INSERT INTO purchases (
+                    id, supplier_gstin, supplier_name, invoice_number, invoice_type,
+                    invoice_date, invoice_value, place_of_supply, reverse_charge,
+                    taxable_value, integrated_tax, central_tax, state_tax, cess,
+                    itc_available, tax_rate, month, status
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                purchase_id,
+                purchase_data.get('supplierGSTIN', ''),
+                purchase_data.get('supplierName', ''),
+                purchase_data.get('invoiceNumber', ''),
+                purchase_data.get('invoiceType', 'Regular'),
+                purchase_data.get('invoiceDate', ''),
+                float(purchase_data.get('invoiceValue', 0)),
+                purchase_data.get('placeOfSupply', ''),
+                purchase_data.get('reverseCharge', 'No'),
+                float(purchase_data.get('taxableValue', 0)),
+                float(purchase_data.get('integratedTax', 0)),
+                float(purchase_data.get('centralTax', 0)),
+                float(purchase_data.get('stateTax', 0)),
+                float(purchase_data.get('cess', 0)),
+                purchase_data.get('itcAvailable', 'Yes'),
+                purchase_data.get('calculatedTaxRate', '0'),
+                purchase_data.get('month', ''),
+                purchase_data.get('status', 'active')
+            ))
+        except Exception:
+            continue
+    conn.commit()
+
+
+def fresh_client_db(workdir, name):
+    """Create an empty client database with the application schema"""
+    import app
+    app.CLIENT_DB_DIR = workdir
+    db_path = app.init_client_db(name)
+    return default_connection_factory(db_path)
+
+
+def reimport(conn, rows, chunk_size):
+    """Import the same rows again in each duplicate mode"""
+    for mode in ('skip', 'upsert', 'replace'):
+        start = time.perf_counter()
+        importer = BulkImporter(conn, PURCHASES, chunk_size, mode=mode).import_rows(rows)
+        elapsed = time.perf_counter() - start
+        result = importer.result()
+        assert result['errorCount'] == 0 and importer.inserted == (len(rows) if mode == 'replace' else 0), result
+        print(f'{"":>9}       re-import {mode:<7} {len(rows) / elapsed:>11,.0f} rows/s ({elapsed:.2f}s)')
+
+
+def run(size, legacy, chunk_size, workdir, reimport_modes=False):
+    rows = list(make_purchases(size))
+
+    conn = fresh_client_db(workdir, f'bulk_{size}')
+    start = time.perf_counter()
+    importer = BulkImporter(conn, PURCHASES, chunk_size).import_rows(rows)
+    elapsed = time.perf_counter() - start
+    line = f'{size:>9,} rows  engine {size / elapsed:>11,.0f} rows/s ({elapsed:.2f}s)'
+    assert importer.inserted == size, importer.result()
+    if reimport_modes:
+        print(line)
+        line = None
+        reimport(conn, rows, chunk_size)
+    conn.close()
+
+    if legacy:
+        conn = fresh_client_db(workdir, f'legacy_{size}')
+        start = time.perf_counter()
+        legacy_import(conn, rows)
+        legacy_elapsed = time.perf_counter() - start
+        conn.close()
+        line += (f'  legacy {size / legacy_elapsed:>11,.0f} rows/s ({legacy_elapsed:.2f}s)'
+                 f'  speedup {legacy_elapsed / elapsed:.1f}x')
+    if line:
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--legacy', action='store_true', help='also time the old per-row loop')
+    parser.add_argument('--reimport', action='store_true',
+                        help='time importing the same rows again with mode skip, upsert and replace')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # app.py creates its data directories relative to the working directory
+        os.chdir(workdir)
+        for size in args.sizes:
+            run(size, args.legacy, args.chunk_size, workdir, args.reimport)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Throughput and memory of the streamed GSTR-1 export.
+
+Builds a synthetic client with one month of B2B sales (plus B2C sales
+for the B2CL/B2CS sections), then generates the full GSTR-1 export in
+each format without keeping it, reporting invoices per second, output
+size and the peak Python memory of a second, traced pass. The peak stays
+flat as the invoice count grows.
+
+Usage (from the backend directory):
+    python benchmarks/bench_gstr1.py --rows 100000
+    python benchmarks/bench_gstr1.py --rows 1000000 --formats json csv
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from bulk_import import BulkImporter  # noqa: E402
+from connection_pool import default_connection_factory  # noqa: E402
+from gstr1 import FORMATS, SECTIONS, iter_export, parse_format  # noqa: E402
+from migrations import migrate_database  # noqa: E402
+from schema import B2C_SALES, SALES  # noqa: E402
+
+MONTH = '2024-05'
+GSTIN = '27AAAPL1234C1ZV'
+RATES = ('5', '12', '18', '28')
+STATES = ('27-Maharashtra', '29-Karnataka', '24-Gujarat', '07-Delhi')
+
+
+def populate(conn, rows):
+    sales = (
+        {
+            'customerGSTIN': f'27AAAPL{i % 20000:05d}C1ZV',
+            'customerName': f'Customer {i % 20000}',
+            'invoiceNumber': f'INV/{i:08d}',
+            'invoiceDate': f'{MONTH}-{(i % 28) + 1:02d}',
+            'invoiceValue': 1180 + i % 100,
+            'taxableValue': 1000 + i % 100,
+            'centralTax': 90,
+            'stateTax': 90,
+            'taxRate': RATES[i % len(RATES)],
+            'placeOfSupply': STATES[i % len(STATES)],
+            'hsnCode': f'{8400 + i % 50}',
+            'quantity': 1 + i % 5,
+            'month': MONTH,
+            # One in ten is a B2C invoice, some of them large and inter-state
+            'transactionType': 'B2C' if i % 10 == 0 else 'B2B',
+            'integratedTax': 180 if i % 20 == 0 else 0,
+        }
+        for i in range(rows)
+    )
+    BulkImporter(conn, SALES).import_rows(sales)
+    b2c_sales = (
+        {
+            'month': MONTH,
+            'supplyType': 'inter' if i % 3 == 0 else 'intra',
+            'placeOfSupply': STATES[i % len(STATES)],
+            'gstRate': RATES[i % len(RATES)],
+            'taxableValue': 500,
+            'centralTax': 45,
+            'stateTax': 45,
+            'invoiceValue': 590,
+            'hsnCode': '2002',
+        }
+        for i in range(rows // 10)
+    )
+    BulkImporter(conn, B2C_SALES).import_rows(b2c_sales)
+
+
+def export(conn, export_format):
+    """Generate the export and return its size in bytes"""
+    sections = ('b2b',) if export_format == 'csv' else SECTIONS
+    size = 0
+    for chunk in iter_export(conn, export_format, GSTIN, MONTH, sections):
+        size += len(chunk)
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--formats', nargs='+', default=list(FORMATS), choices=list(FORMATS))
+    args = parser.parse_args()
+
+    formats = []
+    for export_format in args.formats:
+        try:
+            formats.append(parse_format(export_format))
+        except ValueError as e:
+            print(f'skipping {export_format}: {e}')
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in args.rows:
+            db_path = os.path.join(workdir, f'gstr1_{rows}.db')
+            migrate_database(db_path)
+            conn = default_connection_factory(db_path)
+            populate(conn, rows)
+
+            for export_format in formats:
+                start = time.perf_counter()
+                size = export(conn, export_format)
+                elapsed = time.perf_counter() - start
+
+                tracemalloc.start()
+                export(conn, export_format)
+                _current, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+                label = 'csv (b2b)' if export_format == 'csv' else export_format
+                print(f'{rows:>9,} invoices  {label:<9} {elapsed:7.2f}s {rows / elapsed:>9,.0f} invoices/s'
+                      f'  {size / 1e6:8.1f} MB  peak {peak / 1e6:5.1f} MB')
+            conn.close()
+
+
+if __name__ == '__main__':
+    main()
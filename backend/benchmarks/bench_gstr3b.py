@@ -0,0 +1,140 @@
+"""
+Compare the SQL GSTR-3B aggregation with the old client-side approach.
+
+The client-side path is reproduced as the browser experienced it: fetch
+every sales and B2C sales row for the month as camelCase JSON, then add
+the rows up one by one like 3BSales.js. The server-side path runs
+reports.gstr3b_summary and serializes its result.
+
+Usage (from the backend directory):
+    python benchmarks/bench_gstr3b.py --rows 10000 100000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from bulk_import import BulkImporter  # noqa: E402
+from connection_pool import default_connection_factory  # noqa: E402
+from list_queries import list_query_json  # noqa: E402
+from migrations import migrate_database  # noqa: E402
+from reports import gstr3b_summary  # noqa: E402
+from schema import B2C_SALES, SALES  # noqa: E402
+
+MONTH = '2024-05'
+RATES = ('0', '5', '12', '18', '28')
+
+
+def populate(conn, rows):
+    sales = (
+        {
+            'customerGSTIN': f'27AAAPL{i % 10000:04d}C1ZV',
+            'customerName': f'Customer {i % 997}',
+            'invoiceNumber': f'INV/{i:08d}',
+            'invoiceDate': f'{MONTH}-{(i % 28) + 1:02d}',
+            'invoiceValue': 1180 + i % 100,
+            'taxableValue': 1000 + i % 100,
+            'centralTax': 90,
+            'stateTax': 90,
+            'taxRate': RATES[i % len(RATES)],
+            'month': MONTH,
+            'transactionType': 'B2B' if i % 4 else 'B2C',
+        }
+        for i in range(rows)
+    )
+    BulkImporter(conn, SALES).import_rows(sales)
+    b2c_sales = (
+        {
+            'month': MONTH,
+            'supplyType': 'inter' if i % 3 == 0 else 'intra',
+            'placeOfSupply': f'{(i % 37) + 1:02d}',
+            'gstRate': RATES[i % len(RATES)],
+            'taxableValue': 500 + i % 50,
+            'integratedTax': 90 if i % 3 == 0 else 0,
+            'centralTax': 0 if i % 3 == 0 else 45,
+            'stateTax': 0 if i % 3 == 0 else 45,
+            'invoiceValue': 590,
+        }
+        for i in range(rows // 2)
+    )
+    BulkImporter(conn, B2C_SALES).import_rows(b2c_sales)
+
+
+def client_side(conn):
+    """Download both lists as JSON, then sum them like the React page"""
+    responses = [
+        b''.join(list_query_json(conn, SALES, {}, {'month': MONTH})),
+        b''.join(list_query_json(conn, B2C_SALES, {}, {'month': MONTH})),
+    ]
+
+    summary = {'totalInvoices': 0, 'totalTaxableValue': 0.0, 'totalCGST': 0.0,
+               'totalSGST': 0.0, 'totalIGST': 0.0, 'totalInvoiceValue': 0.0,
+               'b2bSales': 0.0, 'b2cSales': 0.0, 'nilRatedSales': 0.0, 'exemptSales': 0.0}
+    for entries in map(json.loads, responses):
+        for entry in entries:
+            taxable_value = float(entry['taxableValue'] or 0)
+            summary['totalInvoices'] += 1
+            summary['totalTaxableValue'] += taxable_value
+            summary['totalCGST'] += float(entry['centralTax'] or 0)
+            summary['totalSGST'] += float(entry['stateTax'] or 0)
+            summary['totalIGST'] += float(entry['integratedTax'] or 0)
+            summary['totalInvoiceValue'] += float(entry['invoiceValue'] or 0)
+            if entry.get('transactionType', 'B2C') == 'B2B':
+                summary['b2bSales'] += taxable_value
+            else:
+                summary['b2cSales'] += taxable_value
+            if float(entry.get('taxRate', entry.get('gstRate')) or 0) == 0:
+                if taxable_value > 0:
+                    summary['nilRatedSales'] += taxable_value
+                else:
+                    summary['exemptSales'] += taxable_value
+    return summary, sum(map(len, responses))
+
+
+def server_side(conn):
+    payload = json.dumps(gstr3b_summary(conn, MONTH))
+    return json.loads(payload)['summary'], len(payload)
+
+
+def timed(fn, conn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(conn)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in args.rows:
+            db_path = os.path.join(workdir, f'gstr3b_{rows}.db')
+            migrate_database(db_path)
+            conn = default_connection_factory(db_path)
+            populate(conn, rows)
+
+            client_time, (client_summary, client_bytes) = timed(client_side, conn, args.repeat)
+            server_time, (server_summary, server_bytes) = timed(server_side, conn, args.repeat)
+            conn.close()
+
+            assert client_summary['totalInvoices'] == server_summary['totalInvoices']
+            assert round(client_summary['totalTaxableValue'], 2) == server_summary['totalTaxableValue']
+            print(f'{rows:>9,} sales  client-side {client_time * 1000:9.1f} ms {client_bytes:>12,} bytes'
+                  f'  |  SQL {server_time * 1000:7.1f} ms {server_bytes:>6,} bytes'
+                  f'  |  {client_time / server_time:.1f}x faster')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Compare per-rate totals over an invoice date range on the raw text
+columns with the same report on the generated tax_rate_bp/invoice_day
+columns.
+
+The raw path is what a date-range report had to do before: read every
+row, parse invoice_date in Python (it is stored as YYYY-MM-DD,
+DD-MM-YYYY or DD/MM/YYYY) and group on the rate cast from text. The
+indexed path is reports.rate_summary, a range scan on invoice_day.
+
+Usage (from the backend directory):
+    python benchmarks/bench_rate_summary.py --rows 10000 100000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from bulk_import import BulkImporter  # noqa: E402
+from connection_pool import default_connection_factory  # noqa: E402
+from migrations import migrate_database  # noqa: E402
+from normalized import parse_date  # noqa: E402
+from reports import rate_summary  # noqa: E402
+from schema import SALES  # noqa: E402
+
+RATES = ('0', '5', '12', '12.00', '18', '18.00', '28')
+FIRST, LAST = date(2024, 7, 1), date(2024, 7, 31)
+
+
+def invoice_date(i):
+    month, day = (i % 12) + 1, (i % 28) + 1
+    year = 2024 if month >= 4 else 2025
+    # Half the rows in the day-first format of Excel exports
+    return f'{year}-{month:02d}-{day:02d}' if i % 2 else f'{day:02d}/{month:02d}/{year}'
+
+
+def populate(conn, rows):
+    sales = (
+        {
+            'customerGSTIN': f'27AAAPL{i % 10000:04d}C1ZV',
+            'customerName': f'Customer {i % 997}',
+            'invoiceNumber': f'INV/{i:08d}',
+            'invoiceDate': invoice_date(i),
+            'invoiceValue': 1180 + i % 100,
+            'taxableValue': 1000 + i % 100,
+            'centralTax': 90,
+            'stateTax': 90,
+            'taxRate': RATES[i % len(RATES)],
+            'month': invoice_date(i)[:7],
+            'transactionType': 'B2B',
+        }
+        for i in range(rows)
+    )
+    BulkImporter(conn, SALES).import_rows(sales)
+
+
+def raw_columns(conn):
+    """Scan every row, parse the date text and group on the cast rate"""
+    totals = {}
+    rows = conn.execute('SELECT invoice_date, CAST(tax_rate AS REAL), taxable_value FROM sales')
+    for text, rate, taxable_value in rows:
+        try:
+            day = parse_date(text)
+        except ValueError:
+            continue
+        if FIRST <= day <= LAST:
+            totals[rate] = totals.get(rate, 0) + taxable_value
+    return sum(totals.values()), len(totals)
+
+
+def generated_columns(conn):
+    summary = rate_summary(conn, 'sales', FIRST, LAST)
+    return round(summary['totals']['taxableValue'] * 100), len(summary['rates'])
+
+
+def timed(fn, conn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(conn)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in args.rows:
+            db_path = os.path.join(workdir, f'rates_{rows}.db')
+            migrate_database(db_path)
+            conn = default_connection_factory(db_path)
+            populate(conn, rows)
+
+            raw_time, raw_result = timed(raw_columns, conn, args.repeat)
+            indexed_time, indexed_result = timed(generated_columns, conn, args.repeat)
+            conn.close()
+
+            assert raw_result == indexed_result, (raw_result, indexed_result)
+            print(f'{rows:>9,} sales  raw text {raw_time * 1000:8.1f} ms'
+                  f'  |  invoice_day/tax_rate_bp {indexed_time * 1000:6.1f} ms'
+                  f'  |  {raw_time / indexed_time:.1f}x faster')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Time search.search against a LIKE scan of the same columns.
+
+A client database is filled with purchases and sales (half each), then
+typical lookups are run: an exact invoice number, invoice number and
+GSTIN prefixes, a supplier name prefix and a very broad two-letter
+prefix. The median of several runs is printed per query.
+
+Usage (from the backend directory):
+    python benchmarks/bench_search.py --rows 1000000
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from bulk_import import BulkImporter  # noqa: E402
+from connection_pool import default_connection_factory  # noqa: E402
+from migrations import migrate_database  # noqa: E402
+from schema import PURCHASES, SALES  # noqa: E402
+from search import search  # noqa: E402
+
+WORDS = ('Shree', 'Ganesh', 'Traders', 'Enterprises', 'Steel', 'Textiles', 'Agro', 'Pharma',
+         'Motors', 'Electricals', 'Foods', 'Logistics', 'Polymers', 'Infotech', 'Chemicals')
+
+
+def party(i):
+    return f'{WORDS[i % 15]} {WORDS[(i // 15) % 15]} {WORDS[(i // 225) % 15]} {i % 5000}'
+
+
+def gstin(i):
+    return f'{27 + i % 9:02d}AAAP{chr(65 + i % 26)}{i % 10000:04d}C1Z{i % 10}'
+
+
+def populate(conn, rows):
+    half = rows // 2
+    BulkImporter(conn, PURCHASES).import_rows(
+        {
+            'supplierGSTIN': gstin(i),
+            'supplierName': party(i),
+            'invoiceNumber': f'PINV/{i:08d}',
+            'invoiceDate': f'2024-{i % 12 + 1:02d}-15',
+            'invoiceValue': 1180,
+            'taxableValue': 1000,
+            'centralTax': 90,
+            'stateTax': 90,
+            'month': f'2024-{i % 12 + 1:02d}',
+        }
+        for i in range(half)
+    )
+    BulkImporter(conn, SALES).import_rows(
+        {
+            'customerGSTIN': gstin(i + 7),
+            'customerName': party(i + 11),
+            'invoiceNumber': f'INV/{i:08d}',
+            'invoiceDate': f'2024-{i % 12 + 1:02d}-15',
+            'invoiceValue': 1180,
+            'taxableValue': 1000,
+            'centralTax': 90,
+            'stateTax': 90,
+            'month': f'2024-{i % 12 + 1:02d}',
+        }
+        for i in range(rows - half)
+    )
+
+
+def like_scan(conn, text):
+    pattern = f'%{text}%'
+    return conn.execute('''
+        SELECT id FROM purchases
+        WHERE supplier_name LIKE ? OR invoice_number LIKE ? OR supplier_gstin LIKE ?
+        UNION ALL
+        SELECT id FROM sales
+        WHERE customer_name LIKE ? OR invoice_number LIKE ? OR customer_gstin LIKE ?
+        LIMIT 21
+    ''', (pattern,) * 6).fetchall()
+
+
+def median_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=15)
+    args = parser.parse_args()
+
+    rows = args.rows
+    queries = [
+        ('exact invoice number', f'INV/{rows // 3:08d}'),
+        ('invoice number prefix', f'PINV/{rows // 7:08d}'[:-2]),
+        ('GSTIN prefix', gstin(1234)[:9]),
+        ('name and prefix', 'pharma moto'),
+        ('broad prefix', 'sh'),
+    ]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'search.db')
+        migrate_database(db_path)
+        conn = default_connection_factory(db_path)
+        started = time.perf_counter()
+        populate(conn, rows)
+        print(f'{rows:,} rows imported and indexed in {time.perf_counter() - started:.1f}s')
+
+        print(f"{'query':<24} {'text':<16} {'search ms':>10} {'ranked':>7} {'LIKE ms':>9}")
+        for name, text in queries:
+            search_ms, result = median_ms(lambda: search(conn, text), args.repeat)
+            like_ms, _rows = median_ms(lambda: like_scan(conn, text), max(1, args.repeat // 5))
+            print(f"{name:<24} {text:<16} {search_ms:>10.2f} {str(result['ranked']):>7} {like_ms:>9.1f}")
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Compare the list-route JSON encoders on one month of sales.
+
+    dicts      a dict per sqlite3.Row, then json.dumps with sorted keys as
+               Flask's jsonify does (the old list routes)
+    template   serializers.RowSerializer on plain tuples, standard library
+    orjson     serializers.RowSerializer on plain tuples, orjson (if installed)
+    streamed   list_query_json end to end, query included, as the routes
+               send it
+
+The first three time the encoding only, on rows fetched beforehand; the
+query time is printed for comparison. Each output is parsed back and
+checked against the dict path.
+
+Usage (from the backend directory):
+    python benchmarks/bench_serializers.py --rows 10000 100000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import serializers  # noqa: E402
+from bulk_import import BulkImporter  # noqa: E402
+from connection_pool import default_connection_factory  # noqa: E402
+from list_queries import build_list_query, list_query_json  # noqa: E402
+from migrations import migrate_database  # noqa: E402
+from schema import SALES  # noqa: E402
+
+MONTH = '2024-05'
+RATES = ('0', '5', '12', '18', '28')
+
+
+def populate(conn, rows):
+    sales = (
+        {
+            'customerGSTIN': f'27AAAPL{i % 10000:04d}C1ZV',
+            'customerName': f'Customer {i % 997} & Sons',
+            'invoiceNumber': f'INV/{i:08d}',
+            'invoiceDate': f'{MONTH}-{(i % 28) + 1:02d}',
+            'invoiceValue': 1180 + i % 100,
+            'placeOfSupply': '27-Maharashtra',
+            'taxableValue': 1000 + i % 100 + 0.25,
+            'centralTax': 90.5,
+            'stateTax': 90.5,
+            'taxRate': RATES[i % len(RATES)],
+            'month': MONTH,
+            'hsnCode': f'{8471 + i % 50}',
+            'quantity': i % 7 or None,
+        }
+        for i in range(rows)
+    )
+    BulkImporter(conn, SALES).import_rows(sales)
+
+
+def fetch(conn, plain):
+    """The month's rows as the routes fetch them, with the output keys"""
+    sql, params, columns, _order, _limit = build_list_query(SALES, {}, {'month': MONTH})
+    cursor = serializers.plain_cursor(conn) if plain else conn.cursor()
+    return cursor.execute(sql, params).fetchall(), [column.key for column in columns]
+
+
+def encode_dicts(fetched):
+    rows, keys = fetched
+    width = len(keys)
+    items = [dict(zip(keys, tuple(row)[:width])) for row in rows]
+    return json.dumps(items, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def encode_template(use_orjson):
+    def encode(fetched):
+        rows, keys = fetched
+        return serializers.RowSerializer(keys, use_orjson).encode_rows(rows)
+    return encode
+
+
+def encode_streamed(conn):
+    return b''.join(list_query_json(conn, SALES, {}, {'month': MONTH}))
+
+
+def timed(fn, arg, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(arg)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    encoders = [('dicts', encode_dicts), ('template', encode_template(False))]
+    if serializers.orjson is not None:
+        encoders.append(('orjson', encode_template(True)))
+    encoders.append(('streamed', encode_streamed))
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in args.rows:
+            db_path = os.path.join(workdir, f'serializers_{rows}.db')
+            migrate_database(db_path)
+            conn = default_connection_factory(db_path)
+            populate(conn, rows)
+
+            query_time, _rows = timed(lambda conn: fetch(conn, True), conn, args.repeat)
+            print(f'{rows:,} sales rows, query {query_time * 1000:.1f} ms')
+            inputs = {'dicts': fetch(conn, False), 'template': fetch(conn, True), 'streamed': conn}
+            inputs['orjson'] = inputs['template']
+            baseline = None
+            expected = None
+            for name, encode in encoders:
+                elapsed, payload = timed(encode, inputs[name], args.repeat)
+                decoded = json.loads(payload)
+                if expected is None:
+                    baseline, expected = elapsed, decoded
+                assert decoded == expected, f'{name} output differs from the dict path'
+                print(f'  {name:<9} {elapsed * 1000:9.1f} ms {len(payload):>13,} bytes'
+                      f'  {baseline / elapsed:5.1f}x')
+            conn.close()
+
+
+if __name__ == '__main__':
+    main()
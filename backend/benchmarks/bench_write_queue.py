@@ -0,0 +1,144 @@
+"""
+Mixed read/write throughput for the storage profiles and the write queue.
+
+Writer threads insert single sales rows (one request each, as the add
+route does) while reader threads page through the month's sales list.
+Three setups are compared on a fresh client database:
+
+    legacy     rollback journal, synchronous=FULL, commit per write
+    tuned      storage.DEFAULT_PROFILE (WAL, NORMAL, ...), commit per write
+    queued     tuned profile, writes batched by write_queue.WriteQueues
+
+Usage (from the backend directory):
+    python benchmarks/bench_write_queue.py --writers 16 --readers 4 --duration 10
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from connection_pool import ConnectionPool  # noqa: E402
+from list_queries import list_query_json  # noqa: E402
+from migrations import migrate_database  # noqa: E402
+from schema import SALES  # noqa: E402
+from storage import DEFAULT_PROFILE, connection_factory  # noqa: E402
+from write_queue import WriteQueues  # noqa: E402
+
+MONTH = '2024-05'
+
+LEGACY_PROFILE = dict(DEFAULT_PROFILE, journal_mode='DELETE', synchronous='FULL',
+                      cache_kb=2000, mmap_mb=0, temp_store='DEFAULT')
+
+INSERT_SQL = '''
+    INSERT INTO sales (id, customer_gstin, customer_name, invoice_number, invoice_type,
+                       invoice_date, invoice_value, place_of_supply, reverse_charge,
+                       taxable_value, integrated_tax, central_tax, state_tax, cess,
+                       tax_rate, month, transaction_type)
+    VALUES (?, '27AAAPL1234C1ZV', 'Customer', ?, 'Regular', ?, 1180, '27', 'No',
+            1000, 0, 90, 90, 0, '18', ?, 'B2B')
+'''
+
+
+def insert_sale(conn, number):
+    conn.execute(INSERT_SQL, (f'SAL_{uuid.uuid4().hex}', f'INV/{number:08d}', f'{MONTH}-15', MONTH))
+
+
+def run(setup, db_path, writers, readers, duration):
+    profile = LEGACY_PROFILE if setup == 'legacy' else DEFAULT_PROFILE
+    pool = ConnectionPool(max_per_client=writers + readers + 1, max_open=writers + readers + 4,
+                          factory=connection_factory(profile))
+    queues = WriteQueues(pool.connect) if setup == 'queued' else None
+    counts = {'writes': 0, 'reads': 0, 'errors': 0}
+    write_latencies = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def write_loop(worker):
+        number = worker * 10_000_000
+        done, errors, latencies = 0, 0, []
+        while time.monotonic() < deadline:
+            number += 1
+            started = time.perf_counter()
+            try:
+                if queues is not None:
+                    queues.run(db_path, lambda conn, n=number: insert_sale(conn, n))
+                else:
+                    conn = pool.connect(db_path)
+                    try:
+                        insert_sale(conn, number)
+                        conn.commit()
+                    finally:
+                        conn.close()
+                done += 1
+                latencies.append(time.perf_counter() - started)
+            except sqlite3.OperationalError:
+                errors += 1
+        with lock:
+            counts['writes'] += done
+            counts['errors'] += errors
+            write_latencies.extend(latencies)
+
+    def read_loop():
+        done, errors = 0, 0
+        while time.monotonic() < deadline:
+            conn = pool.connect(db_path)
+            try:
+                list_query_json(conn, SALES, {'limit': '100'}, {'month': MONTH})
+                done += 1
+            except sqlite3.OperationalError:
+                errors += 1
+            finally:
+                conn.close()
+        with lock:
+            counts['reads'] += done
+            counts['errors'] += errors
+
+    threads = [threading.Thread(target=write_loop, args=(i,)) for i in range(writers)]
+    threads += [threading.Thread(target=read_loop) for _ in range(readers)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    pool.close_all()
+
+    write_latencies.sort()
+    p99 = write_latencies[int(len(write_latencies) * 0.99)] if write_latencies else 0.0
+    batches = queues.stats()['averageBatch'] if queues is not None else 1.0
+    return counts, elapsed, p99, batches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--writers', type=int, default=16)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--setups', nargs='+', default=['legacy', 'tuned', 'queued'])
+    args = parser.parse_args()
+
+    print(f"{args.writers} writer and {args.readers} reader threads, {args.duration:g}s per setup")
+    print(f"{'setup':<8} {'writes/s':>10} {'reads/s':>10} {'errors':>7} {'write p99 ms':>13} {'avg batch':>10}")
+    for setup in args.setups:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'bench.db')
+            migrate_database(db_path)
+            if setup == 'legacy':
+                conn = sqlite3.connect(db_path)
+                conn.execute('PRAGMA journal_mode=DELETE')
+                conn.close()
+            counts, elapsed, p99, batch = run(setup, db_path, args.writers, args.readers, args.duration)
+        print(f"{setup:<8} {counts['writes'] / elapsed:>10.0f} {counts['reads'] / elapsed:>10.0f} "
+              f"{counts['errors']:>7} {p99 * 1000:>13.2f} {batch:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Concurrent load test against a running backend.
+
+Each worker thread plays one Electron window: it requests the main read
+routes for a client in a loop for the given duration. Latencies are
+reported per route as p50/p90/p99 together with the request rate.
+
+Usage (start the server first, e.g. python serve.py):
+    python benchmarks/load_test.py --client-id CLI_... --month 2024-05 \
+        --concurrency 16 --duration 30
+
+Without --client-id the first client returned by /api/clients is used.
+"""
+
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+
+ROUTES = (
+    ('health', '/health'),
+    ('clients', '/clients'),
+    ('purchases', '/clients/{client}/purchases?month={month}&limit=100'),
+    ('sales', '/clients/{client}/sales?month={month}&limit=100'),
+    ('b2c-sales', '/clients/{client}/b2c-sales?month={month}&limit=100'),
+    ('summary', '/clients/{client}/summary?month={month}'),
+    ('itc-ledger', '/clients/{client}/itc-ledger?month={month}'),
+    ('gstr3b', '/clients/{client}/gstr3b?month={month}'),
+)
+
+
+def fetch(url, timeout):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        response.read()
+        return response.status
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def worker(base_url, paths, deadline, timeout, latencies, errors, lock):
+    local = defaultdict(list)
+    local_errors = defaultdict(int)
+    while time.monotonic() < deadline:
+        for name, path in paths:
+            started = time.perf_counter()
+            try:
+                fetch(base_url + path, timeout)
+            except (urllib.error.URLError, OSError):
+                local_errors[name] += 1
+                continue
+            local[name].append(time.perf_counter() - started)
+    with lock:
+        for name, values in local.items():
+            latencies[name].extend(values)
+        for name, count in local_errors.items():
+            errors[name] += count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--url', default='http://127.0.0.1:5001/api')
+    parser.add_argument('--client-id')
+    parser.add_argument('--month', default=time.strftime('%Y-%m'))
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=15.0)
+    parser.add_argument('--timeout', type=float, default=30.0)
+    args = parser.parse_args()
+
+    base_url = args.url.rstrip('/')
+    client_id = args.client_id
+    if not client_id:
+        with urllib.request.urlopen(base_url + '/clients', timeout=args.timeout) as response:
+            clients = json.load(response)
+        if not clients:
+            parser.error('no clients exist; create one or pass --client-id')
+        client_id = clients[0]['id']
+
+    paths = [(name, path.format(client=client_id, month=args.month)) for name, path in ROUTES]
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.duration
+
+    started = time.monotonic()
+    threads = [
+        threading.Thread(target=worker, args=(base_url, paths, deadline, args.timeout,
+                                              latencies, errors, lock))
+        for _ in range(args.concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    print(f"client {client_id}, month {args.month}, "
+          f"{args.concurrency} concurrent clients for {elapsed:.1f}s")
+    print(f"{'route':<12} {'requests':>9} {'errors':>7} {'req/s':>8} "
+          f"{'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8}")
+    total = 0
+    for name, _path in ROUTES:
+        values = sorted(latencies[name])
+        total += len(values)
+        print(f"{name:<12} {len(values):>9} {errors[name]:>7} {len(values) / elapsed:>8.1f} "
+              f"{percentile(values, 0.50) * 1000:>8.2f} {percentile(values, 0.90) * 1000:>8.2f} "
+              f"{percentile(values, 0.99) * 1000:>8.2f}")
+    print(f"{'total':<12} {total:>9} {sum(errors.values()):>7} {total / elapsed:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,365 @@
+"""
+Batched bulk import for purchases, sales and B2C sales.
+
+Rows are validated and coerced a column at a time for each chunk, then
+inserted with executemany inside one explicit transaction per chunk.
+Rows that fail validation or violate a constraint are reported back by
+position instead of being skipped silently.
+
+Purchases and sales can be imported with a mode that decides what
+happens to invoices that are already present (see natural_keys.py).
+
+The per-row triggers that keep the monthly rollups, data versions, change
+log and search index in step would run several statements for every
+imported row. A chunk drops them inside its own transaction,
+does their work with one statement per set of rows (deleted, updated,
+inserted) and recreates them before the commit, so no other connection
+ever sees the table without its triggers. The triggers rejecting rows of
+closed financial years are replaced by one check of the chunk's months. The row-by-row retry after a
+constraint failure runs with the triggers in place.
+"""
+
+import secrets
+import sqlite3
+import time
+from contextlib import nullcontext
+from operator import itemgetter
+
+import changes
+import partitions
+import rollups
+import search
+import versions
+from money import to_paise
+from natural_keys import (NATURAL_KEYS, delete_sql, duplicate_message, insert_sql,
+                          is_duplicate_error, match_sql, parse_mode, upsert_columns)
+
+DEFAULT_CHUNK_SIZE = 5000
+
+# Keep the error report bounded for very large, very broken files
+MAX_REPORTED_ERRORS = 1000
+
+# Trigger group -> function doing its work for a set of rows, called as
+# (conn, table, rows_sql, params, old=prefix, new=prefix)
+SUSPENDED_TRIGGERS = {
+    'rollup': rollups.apply_rows,
+    'version': versions.bump_rows,
+    'changes': changes.log_rows,
+    'search': search.index_rows,
+}
+
+# Suspended too; _reject_closed_months checks the whole chunk instead
+CHECK_TRIGGERS = ('closed_year',)
+
+TRIGGER_EVENTS = ('insert', 'update', 'delete')
+
+
+def to_optional_number(value):
+    """Coerce an optional quantity/price; blanks are stored as NULL"""
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = value.replace(',', '').strip()
+        if not value:
+            return None
+    return float(value)
+
+
+def new_id_stem(table):
+    """Random id stem shared by the rows of one import"""
+    return f"{table.id_prefix}_{int(time.time())}_{secrets.token_hex(4).upper()}"
+
+
+def row_id(id_stem, position):
+    """Id of the row at position in an import with id_stem"""
+    return f'{id_stem}_{position:07d}'
+
+
+class BulkImporter:
+    """Import rows for one table through a single client connection
+
+    lock, if given, is held around each chunk's transaction (see
+    WriteQueues.writer_lock).
+    """
+
+    def __init__(self, conn, table, chunk_size=DEFAULT_CHUNK_SIZE, id_stem=None, mode='insert', lock=None):
+        self.conn = conn
+        self.lock = lock or nullcontext()
+        self.table = table
+        self.chunk_size = chunk_size
+        self.mode = parse_mode(table, mode)
+        self.received = 0
+        self.inserted = 0
+        self.updated = 0
+        self.replaced = 0
+        self.skipped = 0
+        self.error_count = 0
+        self.errors = []
+
+        columns = ['id'] + [column.name for column in table.input_columns]
+        self._month = columns.index('month')
+        self._sql = insert_sql(table, columns, self.mode)
+        if self.mode in ('replace', 'upsert'):
+            self._key = itemgetter(*(columns.index(name) for name in NATURAL_KEYS[table.name]))
+            self._match_sql = match_sql(table)
+        if self.mode == 'replace':
+            self._delete_sql = delete_sql(table)
+        if self.mode == 'upsert':
+            self._changed = ' OR '.join(f'n.{name} IS NOT o.{name}' for name in upsert_columns(table, columns))
+        # One random stem per import plus a sequence number keeps ids unique
+        # without generating a uuid for every row. A resumed import passes
+        # its original stem so the ids of committed rows can be recognised.
+        self.id_stem = id_stem or new_id_stem(table)
+
+    def import_rows(self, rows):
+        """Import an iterable of row dicts, one transaction per chunk"""
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                self.import_chunk(chunk)
+                chunk = []
+        if chunk:
+            self.import_chunk(chunk)
+        return self
+
+    def import_chunk(self, rows):
+        """Validate, coerce and insert one chunk of row dicts"""
+        offset = self.received
+        self.received += len(rows)
+
+        params, positions = self._coerce(rows, offset)
+        if params:
+            with self.lock:
+                self._insert(params, positions)
+        return self
+
+    def result(self):
+        """Summary of the import for the JSON response"""
+        if self.inserted or self.updated or not self.error_count:
+            message = f'Successfully added {self.inserted} {self.table.label}'
+            # Rows upsert leaves alone are identical to the stored ones
+            skipped = 'unchanged' if self.mode == 'upsert' else 'skipped as duplicates'
+            for count, verb in ((self.replaced, 'replaced'), (self.updated, 'updated'), (self.skipped, skipped)):
+                if count:
+                    message += f', {count} {verb}'
+        else:
+            message = f'No {self.table.label} were added'
+        return {
+            'message': message,
+            'mode': self.mode,
+            'count': self.inserted,
+            'updated': self.updated,
+            'replaced': self.replaced,
+            'skipped': self.skipped,
+            'received': self.received,
+            'errorCount': self.error_count,
+            'errors': sorted(self.errors, key=lambda error: error['row']),
+        }
+
+    def _error(self, position, field, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': position, 'field': field, 'error': message})
+
+    def _coerce(self, rows, offset):
+        """Column-wise coercion; returns the insert parameters and their row positions"""
+        failed = set()
+        for index, row in enumerate(rows):
+            if not isinstance(row, dict):
+                failed.add(index)
+                self._error(offset + index, None, 'Row must be an object')
+        if failed:
+            rows = [row if isinstance(row, dict) else {} for row in rows]
+
+        for key in self.table.required:
+            for index, row in enumerate(rows):
+                if index not in failed and not row.get(key):
+                    failed.add(index)
+                    self._error(offset + index, key, f'{key} is required')
+
+        columns = []
+        for column in self.table.input_columns:
+            key, default = column.source, column.default
+            values = [row.get(key) for row in rows]
+
+            if column.kind == 'text':
+                if None in values:
+                    values = [default if value is None else value for value in values]
+                columns.append(values)
+                continue
+
+            convert = to_optional_number if column.kind == 'optional' else (
+                lambda value, default=to_paise(default): to_paise(value, default)
+            )
+            try:
+                columns.append(list(map(convert, values)))
+            except (TypeError, ValueError):
+                # Only a bad value somewhere in the column pays for the slow path
+                coerced = []
+                for index, value in enumerate(values):
+                    try:
+                        coerced.append(convert(value))
+                    except (TypeError, ValueError):
+                        coerced.append(None)
+                        if index not in failed:
+                            failed.add(index)
+                            self._error(offset + index, key, f'{key} must be a number, got {value!r}')
+                columns.append(coerced)
+
+        positions = [offset + index for index in range(len(rows)) if index not in failed]
+        records = zip(*columns)
+        if failed:
+            records = (record for index, record in enumerate(records) if index not in failed)
+        params = [
+            (row_id(self.id_stem, position),) + record
+            for position, record in zip(positions, records)
+        ]
+        return params, positions
+
+    def _write(self, params):
+        """Run the mode's statements for params; returns (inserted, updated, replaced, skipped)"""
+        conn = self.conn
+        replaced = 0
+        if self.mode == 'replace':
+            replaced = conn.executemany(self._delete_sql, map(self._key, params)).rowcount
+        written = conn.executemany(self._sql, params).rowcount
+        if self.mode != 'upsert':
+            return written, 0, replaced, len(params) - written
+
+        # Updated rows keep their old ids; new ones carry this import's ids,
+        # which are consecutive within a chunk
+        inserted = conn.execute(
+            f'SELECT COUNT(*) FROM {self.table.name} WHERE id BETWEEN ? AND ?',
+            (params[0][0], params[-1][0])
+        ).fetchone()[0]
+        return inserted, written - inserted, replaced, len(params) - written
+
+    def _count(self, counts):
+        inserted, updated, replaced, skipped = counts
+        self.inserted += inserted
+        self.updated += updated
+        self.replaced += replaced
+        self.skipped += skipped
+
+    def _suspend_triggers(self):
+        """Drop the table's SUSPENDED_TRIGGERS; returns {group: [CREATE statement]}"""
+        conn = self.conn
+        names = {
+            f'trg_{self.table.name}_{group}_{event}': group
+            for group in tuple(SUSPENDED_TRIGGERS) + CHECK_TRIGGERS for event in TRIGGER_EVENTS
+        }
+        triggers = conn.execute(
+            f"SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name IN ({', '.join('?' * len(names))})",
+            list(names)
+        ).fetchall()
+        suspended = {}
+        for name, sql in triggers:
+            conn.execute(f'DROP TRIGGER {name}')
+            suspended.setdefault(names[name], []).append(sql)
+        return suspended
+
+    def _reject_closed_months(self, params, positions):
+        """Report the rows in a closed financial year as the closed_year triggers would; returns the others"""
+        ranges = partitions.closed_month_ranges(self.conn)
+        if not ranges:
+            return params, positions
+        kept_params, kept_positions = [], []
+        for record, position in zip(params, positions):
+            month = record[self._month]
+            # Like SQLite, never place a number between two text months
+            if isinstance(month, str) and any(first <= month <= last for first, last in ranges):
+                self._error(position, None, partitions.CLOSED_MONTH_MESSAGE)
+            else:
+                kept_params.append(record)
+                kept_positions.append(position)
+        return kept_params, kept_positions
+
+    def _save_existing(self, params):
+        """Copy the stored rows the chunk's invoices match, before replace or upsert changes them"""
+        conn = self.conn
+        conn.execute('DROP TABLE IF EXISTS temp.bulk_existing')
+        # The rowid column keeps the rowids the search index is keyed by
+        conn.execute(f'CREATE TEMP TABLE bulk_existing AS SELECT rowid, * FROM main.{self.table.name} WHERE 0')
+        conn.execute('CREATE UNIQUE INDEX temp.bulk_existing_rowid ON bulk_existing (rowid)')
+        conn.executemany(
+            f'INSERT OR IGNORE INTO temp.bulk_existing '
+            f'SELECT rowid, * FROM main.{self.table.name} WHERE {self._match_sql}',
+            map(self._key, params)
+        )
+
+    def _maintain(self, suspended, params):
+        """Do the suspended triggers' work for the chunk, a statement per set of rows"""
+        table = self.table.name
+        # (rows_sql, params, old prefix, new prefix), deleted rows first:
+        # a replacement may reuse the rowid of the row it replaces
+        row_sets = []
+        if self.mode == 'replace':
+            row_sets.append(('FROM temp.bulk_existing WHERE 1', (), '', None))
+        elif self.mode == 'upsert':
+            row_sets.append((
+                f'FROM temp.bulk_existing AS o JOIN {table} AS n ON n.rowid = o.rowid WHERE ({self._changed})',
+                (), 'o.', 'n.'
+            ))
+        row_sets.append((f'FROM {table} WHERE id BETWEEN ? AND ?', (params[0][0], params[-1][0]), None, ''))
+
+        for group, apply in SUSPENDED_TRIGGERS.items():
+            if group in suspended:
+                for rows_sql, rows_params, old, new in row_sets:
+                    apply(self.conn, table, rows_sql, rows_params, old=old, new=new)
+        if self.mode in ('replace', 'upsert'):
+            self.conn.execute('DROP TABLE temp.bulk_existing')
+
+    def _insert(self, params, positions):
+        conn = self.conn
+        counts = (0, 0, 0, 0)
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            suspended = self._suspend_triggers()
+            if 'closed_year' in suspended:
+                params, positions = self._reject_closed_months(params, positions)
+            if params:
+                maintained = suspended.keys() & SUSPENDED_TRIGGERS.keys()
+                if maintained and self.mode in ('replace', 'upsert'):
+                    self._save_existing(params)
+                counts = self._write(params)
+                if maintained:
+                    self._maintain(suspended, params)
+            for statements in suspended.values():
+                for sql in statements:
+                    conn.execute(sql)
+            conn.commit()
+            self._count(counts)
+            return
+        except sqlite3.IntegrityError:
+            conn.rollback()
+        except Exception:
+            # Never leave the triggers dropped in an open transaction
+            conn.rollback()
+            raise
+
+        # A constraint failed somewhere in the chunk: redo it row by row so
+        # the good rows still go in and the bad ones are reported
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for position, record in zip(positions, params):
+                conn.execute('SAVEPOINT import_row')
+                try:
+                    self._count(self._write([record]))
+                except sqlite3.IntegrityError as e:
+                    conn.execute('ROLLBACK TO import_row')
+                    if is_duplicate_error(e, self.table):
+                        self._error(position, None, duplicate_message(self.table) +
+                                    '; import with mode=skip, upsert or replace')
+                    else:
+                        self._error(position, None, str(e))
+                conn.execute('RELEASE import_row')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+def import_rows(conn, table, rows, chunk_size=DEFAULT_CHUNK_SIZE, mode='insert', lock=None):
+    """Import rows into table and return the result summary"""
+    return BulkImporter(conn, table, chunk_size, mode=mode, lock=lock).import_rows(rows).result()
@@ -0,0 +1,234 @@
+"""
+Append-only change log of a client database, for incremental sync.
+
+Triggers on purchases, sales, b2c_sales and sundry_debtors append one
+change_log row per inserted, updated or deleted row, inside the same
+transaction as the write, so every write path is recorded (bulk
+imports suspend the triggers and log each chunk with log_rows). Each entry
+carries a sequence number; a client that remembers the last sequence it
+has seen asks for the changes after it and applies them to the rows it
+already holds instead of downloading the month again.
+
+The log stores which row changed, not the row itself. read_changes
+collapses the entries after a sequence to the latest one per row and
+attaches the row's current values, so a burst of edits to one invoice
+is sent once. Only the newest entries are kept (see prune); a client
+whose sequence is older than the log is told to reload.
+
+ChangeNotifier wakes up Server-Sent Events streams in this process as
+soon as a write commits; writes from other processes are picked up by
+the streams' periodic poll.
+"""
+
+import threading
+
+from schema import TABLES
+
+# Month expression per logged table; '{p}' is NEW. or OLD. inside triggers
+LOGGED_TABLES = {
+    'purchases': '{p}month',
+    'sales': '{p}month',
+    'b2c_sales': '{p}month',
+    'sundry_debtors': 'NULL',
+}
+
+API_NAMES = {
+    'purchases': 'purchases',
+    'sales': 'sales',
+    'b2c_sales': 'b2cSales',
+    'sundry_debtors': 'sundryDebtors',
+}
+
+DEFAULT_RETENTION = 50000
+DEFAULT_LIMIT = 1000
+MAX_LIMIT = 10000
+
+
+def _log_sql(table, op, prefix, month, old_month='NULL'):
+    return (
+        f'INSERT INTO change_log (table_name, row_id, op, month, old_month) '
+        f"VALUES ('{table}', {prefix}id, '{op}', {month}, {old_month});"
+    )
+
+
+def log_rows(conn, table, rows_sql, params=(), old=None, new=None):
+    """Set-based counterpart of the triggers, for writes that suspend them
+
+    rows_sql is the FROM ... WHERE clause selecting the written rows; old
+    and new are the prefixes of their old and new values in it, as OLD.
+    and NEW. are in the triggers (see bulk_import.py).
+    """
+    month = LOGGED_TABLES[table]
+    if old is None:
+        op, prefix, old_month = 'insert', new, 'NULL'
+    elif new is None:
+        op, prefix, old_month = 'delete', old, 'NULL'
+    else:
+        op, prefix, old_month = 'update', new, month.format(p=old)
+    conn.execute(
+        f'INSERT INTO change_log (table_name, row_id, op, month, old_month) '
+        f"SELECT '{table}', {prefix}id, '{op}', {month.format(p=prefix)}, {old_month} {rows_sql} "
+        f'ORDER BY {prefix}rowid',
+        params
+    )
+
+
+def create_triggers(conn):
+    """(Re)create the triggers that append to change_log"""
+    for table, month in LOGGED_TABLES.items():
+        for event in ('insert', 'update', 'delete'):
+            conn.execute(f'DROP TRIGGER IF EXISTS trg_{table}_changes_{event}')
+        new_month, old_month = month.format(p='NEW.'), month.format(p='OLD.')
+        conn.execute(
+            f'CREATE TRIGGER trg_{table}_changes_insert AFTER INSERT ON {table} '
+            f"BEGIN {_log_sql(table, 'insert', 'NEW.', new_month)} END"
+        )
+        # old_month lets a client showing the old month drop a row that moved away
+        conn.execute(
+            f'CREATE TRIGGER trg_{table}_changes_update AFTER UPDATE ON {table} '
+            f"BEGIN {_log_sql(table, 'update', 'NEW.', new_month, old_month)} END"
+        )
+        conn.execute(
+            f'CREATE TRIGGER trg_{table}_changes_delete AFTER DELETE ON {table} '
+            f"BEGIN {_log_sql(table, 'delete', 'OLD.', old_month)} END"
+        )
+
+
+def create_change_log(conn):
+    """Create change_log with its triggers"""
+    # AUTOINCREMENT so sequence numbers are never reused after pruning
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id TEXT NOT NULL,
+            op TEXT NOT NULL,
+            month TEXT,
+            old_month TEXT,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    create_triggers(conn)
+
+
+def latest_sequence(conn):
+    """Sequence number of the newest change, 0 if there is none"""
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+    return row[0] if row else 0
+
+
+def oldest_sequence(conn):
+    row = conn.execute('SELECT MIN(seq) FROM change_log').fetchone()
+    return row[0]
+
+
+def read_changes(conn, since, tables=None, month=None, limit=DEFAULT_LIMIT):
+    """Changes after sequence number since, latest per row, with current row values
+
+    Returns {'since', 'latest', 'hasMore', 'reset', 'changes'}. 'latest'
+    is the sequence to ask from next time. 'reset' is true when entries
+    after since have been pruned, and the client must reload instead.
+    month keeps rows in that month or moved out of it; tables restricts
+    the change_log tables.
+    """
+    latest = latest_sequence(conn)
+    oldest = oldest_sequence(conn)
+    pruned = since < latest and (oldest is None or since + 1 < oldest)
+    if pruned or since > latest:
+        # Entries after since are gone, or since comes from another database
+        return {'since': since, 'latest': latest, 'hasMore': False, 'reset': True, 'changes': []}
+
+    where = ['seq > ?']
+    params = [since]
+    if tables:
+        where.append(f"table_name IN ({', '.join('?' * len(tables))})")
+        params.extend(tables)
+    if month:
+        where.append('(month = ? OR old_month = ?)')
+        params.extend((month, month))
+    entries = conn.execute(
+        f"SELECT seq, table_name, row_id, op, month, old_month FROM change_log "
+        f"WHERE {' AND '.join(where)} ORDER BY seq LIMIT ?",
+        params + [limit + 1]
+    ).fetchall()
+
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    if has_more:
+        latest = entries[-1][0]
+    elif entries:
+        # Writes committed since latest was read may already be included
+        latest = max(latest, entries[-1][0])
+
+    # Latest entry per row; the row's current values are read afterwards
+    last_entries = {}
+    for entry in entries:
+        last_entries[(entry[1], entry[2])] = entry
+
+    rows = _current_rows(conn, last_entries)
+    changes = []
+    for seq, table_name, row_id, op, row_month, old_month in sorted(last_entries.values(), key=lambda entry: entry[0]):
+        row = rows.get((table_name, row_id))
+        change = {
+            'seq': seq,
+            'table': API_NAMES[table_name],
+            'id': row_id,
+            'op': 'delete' if row is None else op,
+            'month': row_month,
+        }
+        if old_month is not None and old_month != row_month:
+            change['oldMonth'] = old_month
+        if row is not None:
+            change['row'] = row
+        changes.append(change)
+
+    return {'since': since, 'latest': latest, 'hasMore': has_more, 'reset': False, 'changes': changes}
+
+
+def _current_rows(conn, entries):
+    """Current values of the rows named by entries, as camelCase dicts"""
+    ids_by_table = {}
+    for table_name, row_id in entries:
+        ids_by_table.setdefault(table_name, []).append(row_id)
+
+    rows = {}
+    for table_name, ids in ids_by_table.items():
+        table = TABLES[table_name]
+        names = ', '.join(column.select_sql for column in table.columns)
+        keys = [column.key for column in table.columns]
+        # Stay well below SQLite's variable limit
+        for start in range(0, len(ids), 500):
+            batch = ids[start:start + 500]
+            for row in conn.execute(
+                f"SELECT {names} FROM {table_name} WHERE id IN ({', '.join('?' * len(batch))})", batch
+            ):
+                rows[(table_name, row[0])] = dict(zip(keys, tuple(row)))
+    return rows
+
+
+def prune(conn, keep=DEFAULT_RETENTION):
+    """Drop all but the newest keep entries in the caller's transaction; returns how many were removed"""
+    return conn.execute('DELETE FROM change_log WHERE seq <= ?', (latest_sequence(conn) - keep,)).rowcount
+
+
+class ChangeNotifier:
+    """Wakes up threads waiting for writes to a client database"""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._counters = {}  # db_path -> number of notifications
+
+    def notify(self, db_path):
+        with self._condition:
+            self._counters[db_path] = self._counters.get(db_path, 0) + 1
+            self._condition.notify_all()
+
+    def current(self, db_path):
+        with self._condition:
+            return self._counters.get(db_path, 0)
+
+    def wait(self, db_path, seen, timeout):
+        """Block until db_path is notified after seen, or timeout; returns the new counter"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._counters.get(db_path, 0) != seen, timeout)
+            return self._counters.get(db_path, 0)
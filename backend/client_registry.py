@@ -0,0 +1,85 @@
+"""
+In-memory cache of the clients table in gst_clients.db.
+
+Every client route needs the client row (mostly to find the client's
+database file). The registry keeps all rows in memory keyed by client id,
+together with the resolved database path. The file signature of the
+main database is checked on every lookup, so that writes from any process
+trigger a reload; the client routes also invalidate it after a write.
+"""
+
+import os
+import threading
+
+
+class ClientRegistry:
+    """Cache of client rows, keyed by client id"""
+
+    def __init__(self, database, connect, resolve_db_path):
+        self.database = database
+        self._connect = connect
+        self._resolve_db_path = resolve_db_path
+        self._lock = threading.Lock()
+        self._clients = None
+        self._signature = None
+        self._stats = {'lookups': 0, 'hits': 0, 'misses': 0, 'reloads': 0}
+
+    def get(self, client_id):
+        """Return the client record (a dict with 'db_path') or None"""
+        with self._lock:
+            self._stats['lookups'] += 1
+            if self._clients is None or self._signature != self._file_signature():
+                self._reload()
+                self._stats['misses'] += 1
+            else:
+                self._stats['hits'] += 1
+            return self._clients.get(client_id)
+
+    def invalidate(self):
+        """Force a reload on the next lookup"""
+        with self._lock:
+            self._clients = None
+
+    def all(self):
+        """Every cached client record"""
+        with self._lock:
+            if self._clients is None or self._signature != self._file_signature():
+                self._reload()
+            return list(self._clients.values())
+
+    def stats(self):
+        """Lookup counters for the health endpoint"""
+        with self._lock:
+            lookups = self._stats['lookups']
+            snapshot = dict(self._stats)
+            snapshot['hitRate'] = round(self._stats['hits'] / lookups, 4) if lookups else 0.0
+            snapshot['clients'] = len(self._clients) if self._clients is not None else 0
+            return snapshot
+
+    def _reload(self):
+        signature = self._file_signature()
+        conn = self._connect()
+        try:
+            rows = conn.execute('SELECT * FROM clients').fetchall()
+        finally:
+            conn.close()
+        self._clients = {row['id']: self._make_record(row) for row in rows}
+        self._signature = signature
+        self._stats['reloads'] += 1
+
+    def _make_record(self, row):
+        record = dict(row)
+        record['db_path'] = self._resolve_db_path(record['client_name'])
+        return record
+
+    def _file_signature(self):
+        """Modification time and size of the database and its WAL file"""
+        signature = []
+        for path in (self.database, self.database + '-wal'):
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                signature.append(None)
+            else:
+                signature.append((st.st_mtime_ns, st.st_size))
+        return tuple(signature)
@@ -0,0 +1,198 @@
+"""
+Compressed columnar files for archived financial years.
+
+A closed financial year (see partitions.py) is read for audits and
+trend reports but never written. Archiving stores its tables column by
+column, one zlib-compressed chunk per column and month:
+
+    MAGIC
+    chunk, chunk, ...           zlib(JSON array of one column's values)
+    directory                   zlib(JSON): tables, columns, months and
+                                the offset and length of every chunk
+    directory offset, length    two little-endian unsigned 64-bit ints
+    MAGIC
+
+Values of one column sit together, so amounts, rates and month names
+that repeat compress far better than SQLite pages. The file is
+memory-mapped, and a read only inflates the chunks of the columns and
+months it asks for: a month summary reads the monthly_totals chunks of
+that month, a list that selects three fields reads those three columns
+(plus the ones it filters and sorts on).
+
+load_into copies the chunks a query needs into tables of an in-memory
+SQLite database, so the existing report and list SQL runs on archived
+months unchanged. Files are opened once and shared between threads;
+they are replaced, never modified.
+"""
+
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import zlib
+
+MAGIC = b'GSTCOLS1'
+_TRAILER = struct.Struct('<QQ')
+
+# Column kinds: stored columns are written back on restore, generated
+# ones are recomputed by SQLite, rowid keeps search index entries valid
+STORED, GENERATED, ROWID = 'stored', 'generated', 'rowid'
+
+COMPRESSION_LEVEL = 6
+
+_IDENTIFIER = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+
+
+class ColumnarError(ValueError):
+    """A file that is not a (complete) columnar archive"""
+
+
+def _encode(values):
+    return zlib.compress(json.dumps(values, separators=(',', ':')).encode('utf-8'), COMPRESSION_LEVEL)
+
+
+def write_columnar(path, tables, meta=None):
+    """Write tables to a columnar file at path, replacing it atomically
+
+    tables maps a table name to (columns, months): columns is a list of
+    (name, declared type, kind) and months yields (month, rows) with the
+    rows as tuples in column order. Returns the size of the file.
+    """
+    directory = {'meta': meta or {}, 'tables': {}}
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(MAGIC)
+        for table, (columns, months) in tables.items():
+            entry = {'columns': [list(column) for column in columns], 'months': {}}
+            for month, rows in months:
+                rows = list(rows)
+                if not rows:
+                    continue
+                chunks = {}
+                for (name, _type, _kind), values in zip(columns, zip(*rows)):
+                    data = _encode(list(values))
+                    chunks[name] = [f.tell(), len(data)]
+                    f.write(data)
+                entry['months'][month] = {'rows': len(rows), 'chunks': chunks}
+            directory['tables'][table] = entry
+
+        data = zlib.compress(json.dumps(directory, separators=(',', ':')).encode('utf-8'), COMPRESSION_LEVEL)
+        offset = f.tell()
+        f.write(data)
+        f.write(_TRAILER.pack(offset, len(data)))
+        f.write(MAGIC)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+    return os.path.getsize(path)
+
+
+class ColumnarFile:
+    """Read-only, memory-mapped view of a columnar file"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        end = len(self._map) - len(MAGIC)
+        if self._map[:len(MAGIC)] != MAGIC or self._map[end:] != MAGIC:
+            raise ColumnarError(f'{path} is not a columnar archive')
+        offset, length = _TRAILER.unpack(self._map[end - _TRAILER.size:end])
+        directory = json.loads(zlib.decompress(self._view(offset, length)))
+        self.meta = directory['meta']
+        self._tables = directory['tables']
+
+    def _view(self, offset, length):
+        # A memoryview slice of the map does not copy the compressed bytes
+        return memoryview(self._map)[offset:offset + length]
+
+    @property
+    def tables(self):
+        return list(self._tables)
+
+    def columns(self, table):
+        """(name, declared type, kind) of every column of table"""
+        return [tuple(column) for column in self._tables[table]['columns']]
+
+    def months(self, table, first_month=None, last_month=None):
+        """Months of table that have rows, optionally limited to a range"""
+        return [
+            month for month in sorted(self._tables[table]['months'])
+            if (not first_month or month >= first_month) and (not last_month or month <= last_month)
+        ]
+
+    def row_count(self, table, month=None):
+        months = self._tables[table]['months']
+        if month is not None:
+            return months[month]['rows'] if month in months else 0
+        return sum(entry['rows'] for entry in months.values())
+
+    def read_column(self, table, month, name):
+        """The values of one column for one month"""
+        offset, length = self._tables[table]['months'][month]['chunks'][name]
+        return json.loads(zlib.decompress(self._view(offset, length)))
+
+    def scan(self, table, names, first_month=None, last_month=None):
+        """Yield rows of just the named columns, as tuples, month by month"""
+        for month in self.months(table, first_month, last_month):
+            yield from zip(*(self.read_column(table, month, name) for name in names))
+
+
+_files = {}
+_files_lock = threading.Lock()
+
+
+def open_columnar(path):
+    """Shared ColumnarFile for path, reopened if the file was replaced"""
+    st = os.stat(path)
+    signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+    with _files_lock:
+        cached = _files.get(path)
+        if cached is None or cached[0] != signature:
+            cached = _files[path] = (signature, ColumnarFile(path))
+        return cached[1]
+
+
+def forget(path):
+    """Drop the shared view of a file that is being deleted"""
+    with _files_lock:
+        _files.pop(path, None)
+
+
+def referenced_names(*sql):
+    """Identifiers in SQL text: the columns it can read, among other words"""
+    names = set()
+    for text in sql:
+        names.update(_IDENTIFIER.findall(text))
+    return names
+
+
+def load_into(conn, schema, archive, columns=None, first_month=None, last_month=None):
+    """Create the archive's tables in schema and fill them for the month range
+
+    Every column is created so that queries and views see the usual
+    table layout, but only those named in columns (table -> names, None
+    for all) are read; the rest stay NULL. Tables missing from columns
+    are left empty. Generated columns are filled from their stored values,
+    and rows keep the rowids they had in the year file. Loading several
+    archives into one schema appends their rows.
+    """
+    for table in archive.tables:
+        definitions = [(name, column_type) for name, column_type, kind in archive.columns(table) if kind != ROWID]
+        conn.execute('CREATE TABLE IF NOT EXISTS {}.{} ({})'.format(
+            schema, table, ', '.join(f'{name} {column_type}'.rstrip() for name, column_type in definitions)
+        ))
+        if columns is not None and table not in columns:
+            continue
+        wanted = columns.get(table) if columns is not None else None
+        names = [name for name, _type in definitions if wanted is None or name in wanted]
+        if not names:
+            continue
+        if any(kind == ROWID for _name, _type, kind in archive.columns(table)):
+            names.insert(0, 'rowid')
+        conn.executemany(
+            'INSERT INTO {}.{} ({}) VALUES ({})'.format(schema, table, ', '.join(names), ', '.join('?' * len(names))),
+            archive.scan(table, names, first_month, last_month)
+        )
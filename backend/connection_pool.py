@@ -0,0 +1,277 @@
+"""
+Pooled SQLite connections for the main and per-client databases.
+
+Each database file gets a small bounded pool of reusable connections.
+Idle connections are closed after a timeout, and the total number of
+open connections across all files is capped: when the cap is reached
+the idle connections of the least recently used databases are closed
+first.
+"""
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out within the timeout"""
+
+
+def default_connection_factory(db_path):
+    """Open a connection that may be handed between server threads"""
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+class PooledConnection:
+    """Proxy around a sqlite3 connection that goes back to its pool on close()"""
+
+    def __init__(self, pool, db_path, conn):
+        self._pool = pool
+        self._db_path = db_path
+        self._conn = conn
+
+    @property
+    def released(self):
+        return self._conn is None
+
+    def close(self):
+        """Return the underlying connection to the pool"""
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool._release(self._db_path, conn)
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise sqlite3.ProgrammingError('Cannot operate on a released connection.')
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Same semantics as sqlite3.Connection: commit or roll back, keep open
+        return self._conn.__exit__(exc_type, exc, tb)
+
+    def __del__(self):
+        # Safety net for code paths that return early without close()
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class _ClientPool:
+    """Connections for a single database file"""
+
+    def __init__(self):
+        self.idle = deque()  # (connection, released_at)
+        self.open = 0
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of SQLite connections keyed by database path"""
+
+    def __init__(self, max_per_client=4, max_open=64, idle_timeout=300.0,
+                 checkout_timeout=10.0, factory=default_connection_factory):
+        self.max_per_client = max_per_client
+        self.max_open = max_open
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.factory = factory
+
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._clients = OrderedDict()  # db_path -> _ClientPool, LRU order
+        self._total_open = 0
+        self._closing = False
+        self._last_sweep = time.monotonic()
+        self._stats = {
+            'checkouts': 0,
+            'hits': 0,
+            'misses': 0,
+            'waits': 0,
+            'waitSeconds': 0.0,
+            'timeouts': 0,
+            'idleEvictions': 0,
+            'lruEvictions': 0,
+            'errors': 0,
+        }
+
+    def connect(self, db_path):
+        """Check out a connection for db_path; close() returns it to the pool"""
+        deadline = time.monotonic() + self.checkout_timeout
+        waited_since = None
+
+        with self._lock:
+            self._stats['checkouts'] += 1
+            self._sweep_idle()
+            while True:
+                client = self._clients.get(db_path)
+                if client is None:
+                    client = self._clients[db_path] = _ClientPool()
+                self._clients.move_to_end(db_path)
+
+                if client.idle:
+                    conn, _ = client.idle.pop()
+                    self._stats['hits'] += 1
+                    self._finish_wait(waited_since)
+                    return PooledConnection(self, db_path, conn)
+
+                if client.open < self.max_per_client and self._reserve_slot(db_path):
+                    client.open += 1
+                    self._total_open += 1
+                    self._stats['misses'] += 1
+                    self._finish_wait(waited_since)
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    self._finish_wait(waited_since)
+                    raise PoolTimeout(f'Timed out waiting for a connection to {db_path}')
+                if waited_since is None:
+                    waited_since = time.monotonic()
+                    self._stats['waits'] += 1
+                self._available.wait(remaining)
+
+        # Open the new connection outside the lock; the slot is already reserved
+        try:
+            conn = self.factory(db_path)
+        except Exception:
+            with self._lock:
+                self._stats['errors'] += 1
+                self._forget(db_path, 1)
+            raise
+        return PooledConnection(self, db_path, conn)
+
+    def close_client(self, db_path):
+        """Close the idle connections of one database (e.g. before it is moved)"""
+        with self._lock:
+            client = self._clients.get(db_path)
+            if client is None:
+                return
+            self._close_idle(db_path, client, len(client.idle))
+
+    def close_all(self, checkpoint=False, final=True):
+        """Close every idle connection; checked-out ones are closed on release
+
+        With checkpoint=True the WAL of every database with an idle
+        connection is folded back into the main file first, so a clean
+        shutdown leaves no -wal contents behind. With final=False the
+        pool keeps handing out (new) connections afterwards, e.g. in the
+        children of a process that closed its connections before forking.
+        """
+        with self._lock:
+            self._closing = final
+            for db_path, client in list(self._clients.items()):
+                if checkpoint and client.idle:
+                    try:
+                        client.idle[0][0].execute('PRAGMA wal_checkpoint(TRUNCATE)')
+                    except sqlite3.Error:
+                        pass
+                self._close_idle(db_path, client, len(client.idle))
+
+    def wait_idle(self, timeout):
+        """Wait until no connection is checked out; returns False on timeout"""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while self._total_open - sum(len(client.idle) for client in self._clients.values()):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._available.wait(remaining)
+            return True
+
+    def stats(self):
+        """Snapshot of the pool counters for the health endpoint"""
+        with self._lock:
+            idle = sum(len(client.idle) for client in self._clients.values())
+            checkouts = self._stats['checkouts']
+            snapshot = dict(self._stats)
+            snapshot.update({
+                'waitSeconds': round(self._stats['waitSeconds'], 6),
+                'hitRate': round(self._stats['hits'] / checkouts, 4) if checkouts else 0.0,
+                'open': self._total_open,
+                'idle': idle,
+                'inUse': self._total_open - idle,
+                'databases': len(self._clients),
+                'maxPerClient': self.max_per_client,
+                'maxOpen': self.max_open,
+            })
+            return snapshot
+
+    # Internal helpers, all called with self._lock held unless noted
+
+    def _release(self, db_path, conn):
+        """Take a connection back (called without the lock held)"""
+        healthy = True
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            healthy = False
+
+        with self._lock:
+            client = self._clients.get(db_path)
+            if client is None or not healthy or self._closing:
+                self._forget(db_path, 1)
+                self._close_quietly(conn)
+            else:
+                client.idle.append((conn, time.monotonic()))
+            self._available.notify_all()
+
+    def _reserve_slot(self, db_path):
+        """Make room under max_open by closing idle connections of LRU databases"""
+        if self._total_open < self.max_open:
+            return True
+        for other_path, other in self._clients.items():
+            if other_path == db_path or not other.idle:
+                continue
+            self._close_idle(other_path, other, 1)
+            self._stats['lruEvictions'] += 1
+            return True
+        return False
+
+    def _sweep_idle(self):
+        now = time.monotonic()
+        if now - self._last_sweep < self.idle_timeout / 2:
+            return
+        self._last_sweep = now
+        cutoff = now - self.idle_timeout
+        for db_path, client in list(self._clients.items()):
+            stale = 0
+            # Oldest releases sit on the left of the deque
+            while stale < len(client.idle) and client.idle[stale][1] < cutoff:
+                stale += 1
+            if stale:
+                self._close_idle(db_path, client, stale)
+                self._stats['idleEvictions'] += stale
+
+    def _close_idle(self, db_path, client, count):
+        for _ in range(count):
+            conn, _ = client.idle.popleft()
+            self._close_quietly(conn)
+        self._forget(db_path, count)
+
+    def _forget(self, db_path, count):
+        client = self._clients.get(db_path)
+        if client is not None:
+            client.open -= count
+            if client.open <= 0 and not client.idle:
+                del self._clients[db_path]
+        self._total_open -= count
+        self._available.notify_all()
+
+    def _finish_wait(self, waited_since):
+        if waited_since is not None:
+            self._stats['waitSeconds'] += time.monotonic() - waited_since
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
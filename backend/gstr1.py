@@ -0,0 +1,465 @@
+"""
+GSTR-1 export generated from SQL cursors.
+
+The export handler in the renderer built its files from fully loaded
+arrays, which ran out of memory for big clients. Here every section is
+read from a cursor and written out as it is read:
+
+    b2b    invoices to registered customers, grouped by customer GSTIN
+    b2cl   inter-state B2C invoices above the B2C large limit, by place
+           of supply
+    b2cs   all other B2C supplies, totalled by supply type, place of
+           supply and rate
+    hsn    HSN-wise summary (the same grouping as /hsn-summary)
+    docs   range and count of the sales invoice numbers issued
+
+in one of three formats:
+
+    json   the GSTR-1 JSON of the GST portal, streamed an invoice at a time
+    csv    one section in the offline tool's CSV layout
+    xlsx   one sheet per section, written with openpyxl's write-only mode
+           to a temporary file and streamed from it
+
+Only the current invoice and the B2CS totals (one row per place of
+supply and rate) are held in memory. `python benchmarks/bench_gstr1.py`
+measures the throughput.
+"""
+
+import csv
+import io
+import re
+import tempfile
+from datetime import date
+from functools import lru_cache
+
+from money import to_rupees
+from reports import iter_hsn_summary
+from serializers import dumps
+
+SECTIONS = ('b2b', 'b2cl', 'b2cs', 'hsn', 'docs')
+
+FORMATS = {
+    'json': 'application/json',
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Inter-state B2C invoices above this value (in paise) are reported one by
+# one in B2CL: Rs 2.5 lakh, lowered to Rs 1 lakh from August 2024
+B2CL_LIMITS = (('2024-08', 10000000), ('', 25000000))
+
+STATES = {
+    '01': 'Jammu and Kashmir', '02': 'Himachal Pradesh', '03': 'Punjab', '04': 'Chandigarh',
+    '05': 'Uttarakhand', '06': 'Haryana', '07': 'Delhi', '08': 'Rajasthan',
+    '09': 'Uttar Pradesh', '10': 'Bihar', '11': 'Sikkim', '12': 'Arunachal Pradesh',
+    '13': 'Nagaland', '14': 'Manipur', '15': 'Mizoram', '16': 'Tripura',
+    '17': 'Meghalaya', '18': 'Assam', '19': 'West Bengal', '20': 'Jharkhand',
+    '21': 'Odisha', '22': 'Chhattisgarh', '23': 'Madhya Pradesh', '24': 'Gujarat',
+    '25': 'Daman and Diu', '26': 'Dadra and Nagar Haveli', '27': 'Maharashtra', '29': 'Karnataka',
+    '30': 'Goa', '31': 'Lakshadweep', '32': 'Kerala', '33': 'Tamil Nadu',
+    '34': 'Puducherry', '35': 'Andaman and Nicobar Islands', '36': 'Telangana', '37': 'Andhra Pradesh',
+    '38': 'Ladakh', '97': 'Other Territory',
+}
+_STATE_CODES = {name.lower(): code for code, name in STATES.items()}
+
+# GSTR-1 invoice type code -> offline tool label
+INVOICE_TYPES = {
+    'R': 'Regular B2B',
+    'SEWP': 'SEZ supplies with payment',
+    'SEWOP': 'SEZ supplies without payment',
+    'DE': 'Deemed Exp',
+}
+
+# Column headings of the offline tool's CSV templates (and the xlsx sheets)
+HEADERS = {
+    'b2b': ('GSTIN/UIN of Recipient', 'Receiver Name', 'Invoice Number', 'Invoice date',
+            'Invoice Value', 'Place Of Supply', 'Reverse Charge', 'Applicable % of Tax Rate',
+            'Invoice Type', 'E-Commerce GSTIN', 'Rate', 'Taxable Value', 'Cess Amount'),
+    'b2cl': ('Invoice Number', 'Invoice date', 'Invoice Value', 'Place Of Supply',
+             'Applicable % of Tax Rate', 'Rate', 'Taxable Value', 'Cess Amount', 'E-Commerce GSTIN'),
+    'b2cs': ('Type', 'Place Of Supply', 'Applicable % of Tax Rate', 'Rate', 'Taxable Value',
+             'Cess Amount', 'E-Commerce GSTIN'),
+    'hsn': ('HSN', 'Description', 'UQC', 'Total Quantity', 'Total Value', 'Rate', 'Taxable Value',
+            'Integrated Tax Amount', 'Central Tax Amount', 'State/UT Tax Amount', 'Cess Amount'),
+    'docs': ('Nature of Document', 'Sr. No. From', 'Sr. No. To', 'Total Number', 'Cancelled'),
+}
+
+OUTWARD_INVOICES = 'Invoices for outward supply'
+
+# Bytes collected before a chunk of the response is handed to the server
+CHUNK_BYTES = 64 * 1024
+
+# Served by idx_sales_gstr1, so invoices arrive grouped by customer
+# without sorting the month first
+B2B_SQL = '''
+    SELECT customer_gstin, customer_name, invoice_number, invoice_day, invoice_date,
+           invoice_value, place_of_supply, reverse_charge, invoice_type, ecommerce_gstin,
+           tax_rate_bp, taxable_value, integrated_tax, central_tax, state_tax, cess
+    FROM sales
+    WHERE month = ? AND transaction_type = 'B2B'
+    ORDER BY customer_gstin, invoice_number
+'''
+
+B2CL_SQL = '''
+    SELECT place_of_supply, invoice_number, invoice_day, invoice_date, invoice_value,
+           ecommerce_gstin, tax_rate_bp, taxable_value, integrated_tax, cess
+    FROM sales
+    WHERE month = ? AND transaction_type = 'B2C' AND integrated_tax > 0 AND invoice_value > ?
+    ORDER BY place_of_supply, invoice_number
+'''
+
+B2CS_SQL = '''
+    SELECT CASE WHEN supply_type = 'inter' THEN 'INTER' ELSE 'INTRA' END,
+           place_of_supply, gst_rate_bp,
+           SUM(taxable_value), SUM(integrated_tax), SUM(central_tax), SUM(state_tax), 0
+    FROM b2c_sales WHERE month = ?
+    GROUP BY 1, 2, 3
+    UNION ALL
+    SELECT CASE WHEN integrated_tax > 0 THEN 'INTER' ELSE 'INTRA' END,
+           place_of_supply, tax_rate_bp,
+           SUM(taxable_value), SUM(integrated_tax), SUM(central_tax), SUM(state_tax), SUM(cess)
+    FROM sales
+    WHERE month = ? AND transaction_type = 'B2C' AND NOT (integrated_tax > 0 AND invoice_value > ?)
+    GROUP BY 1, 2, 3
+'''
+
+DOCS_SQL = '''
+    SELECT COUNT(DISTINCT invoice_number),
+           COUNT(DISTINCT CASE WHEN LOWER(status) = 'cancelled' THEN invoice_number END)
+    FROM sales WHERE month = ? AND invoice_number <> ''
+'''
+
+# First or last invoice number; shorter numbers sort first so 9 comes before 10
+DOCS_RANGE_SQL = '''
+    SELECT invoice_number FROM sales WHERE month = ? AND invoice_number <> ''
+    ORDER BY LENGTH(invoice_number) {order}, invoice_number {order} LIMIT 1
+'''
+
+
+class Gstr1Error(ValueError):
+    """Raised for invalid export parameters; the route answers with a 400"""
+
+
+def return_period(month):
+    """The GSTR-1 return period (MMYYYY) of a YYYY-MM month"""
+    match = re.match(r'^(\d{4})-(0[1-9]|1[0-2])$', month or '')
+    if not match:
+        raise Gstr1Error('month must look like 2024-04')
+    return match.group(2) + match.group(1)
+
+
+def parse_format(value):
+    export_format = (value or 'json').strip().lower()
+    if export_format not in FORMATS:
+        raise Gstr1Error(f"format must be one of: {', '.join(FORMATS)}")
+    if export_format == 'xlsx':
+        try:
+            import openpyxl  # noqa: F401
+        except ImportError:
+            raise Gstr1Error('Excel export needs openpyxl (pip install -r requirements.txt); use format=json or csv')
+    return export_format
+
+
+def parse_sections(value, export_format):
+    """Requested sections in export order; CSV holds exactly one"""
+    requested = [section.strip().lower() for section in (value or '').split(',') if section.strip()]
+    unknown = [section for section in requested if section not in SECTIONS]
+    if unknown:
+        raise Gstr1Error(f"sections must be taken from: {', '.join(SECTIONS)}")
+    if export_format == 'csv' and len(requested) != 1:
+        raise Gstr1Error('CSV export needs exactly one section, e.g. sections=b2b')
+    return tuple(section for section in SECTIONS if section in requested) if requested else SECTIONS
+
+
+def export_filename(gstin, month, export_format, sections):
+    name = f'GSTR1_{gstin or "client"}_{return_period(month)}'
+    if export_format == 'csv':
+        name += f'_{sections[0]}'
+    return f'{name}.{export_format}'
+
+
+def b2cl_limit(month):
+    for first_month, limit in B2CL_LIMITS:
+        if month >= first_month:
+            return limit
+
+
+@lru_cache(maxsize=1024)
+def state_code(place):
+    """Two-digit state code of a place of supply ('27-Maharashtra', 'Maharashtra' or '27')"""
+    place = (place or '').strip()
+    if place[:2].isdigit():
+        return place[:2]
+    return _STATE_CODES.get(place.lower(), place)
+
+
+def _place_label(place):
+    code = state_code(place)
+    return f'{code}-{STATES[code]}' if code in STATES else place
+
+
+@lru_cache(maxsize=4096)
+def _date_text(day, text, date_format):
+    # invoice_day is NULL when the stored text is not a date; pass it on as is
+    return date.fromordinal(day).strftime(date_format) if day is not None else text
+
+
+def _rate(basis_points):
+    return basis_points // 100 if basis_points % 100 == 0 else basis_points / 100
+
+
+def _rate_number(rate):
+    value = float(rate)
+    return int(value) if value.is_integer() else value
+
+
+def _invoice_type(invoice_type):
+    text = (invoice_type or '').lower()
+    if 'sez' in text:
+        return 'SEWOP' if 'without' in text else 'SEWP'
+    if 'deemed' in text:
+        return 'DE'
+    return 'R'
+
+
+def _rchrg(reverse_charge):
+    return 'Y' if reverse_charge == 'Yes' else 'N'
+
+
+def _b2cs_totals(conn, month):
+    """B2CS rows merged by supply type, state code and rate (a few hundred at most)"""
+    limit = b2cl_limit(month)
+    totals = {}
+    for supply, place, basis_points, *amounts in conn.execute(B2CS_SQL, (month, month, limit)):
+        key = (supply, state_code(place), basis_points or 0)
+        current = totals.get(key)
+        totals[key] = amounts if current is None else [a + b for a, b in zip(current, amounts)]
+    return sorted(totals.items())
+
+
+def _docs(conn, month):
+    total, cancelled = conn.execute(DOCS_SQL, (month,)).fetchone()
+    if not total:
+        return None
+    first, last = (
+        conn.execute(DOCS_RANGE_SQL.format(order=order), (month,)).fetchone()[0] for order in ('ASC', 'DESC')
+    )
+    return first, last, total, cancelled
+
+
+def iter_rows(conn, section, month):
+    """Rows of one section in the column order of HEADERS[section]"""
+    if section == 'b2b':
+        for (ctin, name, number, day, text, value, place, reverse_charge, invoice_type, etin,
+             basis_points, taxable, _igst, _cgst, _sgst, cess) in conn.execute(B2B_SQL, (month,)):
+            yield (ctin, name, number, _date_text(day, text, '%d-%b-%Y'), to_rupees(value),
+                   _place_label(place), _rchrg(reverse_charge), '',
+                   INVOICE_TYPES[_invoice_type(invoice_type)], etin or '',
+                   _rate(basis_points or 0), to_rupees(taxable), to_rupees(cess))
+    elif section == 'b2cl':
+        for (place, number, day, text, value, etin, basis_points,
+             taxable, _igst, cess) in conn.execute(B2CL_SQL, (month, b2cl_limit(month))):
+            yield (number, _date_text(day, text, '%d-%b-%Y'), to_rupees(value), _place_label(place),
+                   '', _rate(basis_points or 0), to_rupees(taxable), to_rupees(cess), etin or '')
+    elif section == 'b2cs':
+        for (_supply, code, basis_points), amounts in _b2cs_totals(conn, month):
+            place = f'{code}-{STATES[code]}' if code in STATES else code
+            yield ('OE', place, '', _rate(basis_points), to_rupees(amounts[0]), to_rupees(amounts[4]), '')
+    elif section == 'hsn':
+        for item in iter_hsn_summary(conn, month, month):
+            yield (item['hsnCode'], '', 'OTH', item['quantity'], item['invoiceValue'],
+                   _rate_number(item['gstRate']), item['taxableValue'],
+                   item['integratedTax'], item['centralTax'], item['stateTax'], item['cess'])
+    elif section == 'docs':
+        docs = _docs(conn, month)
+        if docs is not None:
+            yield (OUTWARD_INVOICES,) + docs
+
+
+def _item(basis_points, taxable, igst, cgst, sgst, cess):
+    return [{'num': 1, 'itm_det': {
+        'txval': to_rupees(taxable), 'rt': _rate(basis_points or 0), 'iamt': to_rupees(igst),
+        'camt': to_rupees(cgst), 'samt': to_rupees(sgst), 'csamt': to_rupees(cess),
+    }}]
+
+
+def _iter_b2b_json(conn, month):
+    current = None
+    for (ctin, _name, number, day, text, value, place, reverse_charge, invoice_type, etin,
+         basis_points, taxable, igst, cgst, sgst, cess) in conn.execute(B2B_SQL, (month,)):
+        invoice = {
+            'inum': number,
+            'idt': _date_text(day, text, '%d-%m-%Y'),
+            'val': to_rupees(value),
+            'pos': state_code(place),
+            'rchrg': _rchrg(reverse_charge),
+            'inv_typ': _invoice_type(invoice_type),
+            'itms': _item(basis_points, taxable, igst, cgst, sgst, cess),
+        }
+        if etin:
+            invoice['etin'] = etin
+        if ctin != current:
+            opening = b'{"ctin":' + dumps(ctin) + b',"inv":['
+            yield (b']},' + opening if current is not None else opening) + dumps(invoice)
+            current = ctin
+        else:
+            yield b',' + dumps(invoice)
+    if current is not None:
+        yield b']}'
+
+
+def _iter_b2cl_json(conn, month):
+    current = None
+    for (place, number, day, text, value, etin, basis_points,
+         taxable, igst, cess) in conn.execute(B2CL_SQL, (month, b2cl_limit(month))):
+        invoice = {
+            'inum': number,
+            'idt': _date_text(day, text, '%d-%m-%Y'),
+            'val': to_rupees(value),
+            'itms': [{'num': 1, 'itm_det': {
+                'rt': _rate(basis_points or 0), 'txval': to_rupees(taxable),
+                'iamt': to_rupees(igst), 'csamt': to_rupees(cess),
+            }}],
+        }
+        if etin:
+            invoice['etin'] = etin
+        code = state_code(place)
+        if code != current:
+            opening = b'{"pos":' + dumps(code) + b',"inv":['
+            yield (b']},' + opening if current is not None else opening) + dumps(invoice)
+            current = code
+        else:
+            yield b',' + dumps(invoice)
+    if current is not None:
+        yield b']}'
+
+
+def _iter_b2cs_json(conn, month):
+    separator = b''
+    for (supply, code, basis_points), amounts in _b2cs_totals(conn, month):
+        taxable, igst, cgst, sgst, cess = amounts
+        row = {'sply_ty': supply, 'pos': code, 'typ': 'OE', 'rt': _rate(basis_points),
+               'txval': to_rupees(taxable), 'csamt': to_rupees(cess)}
+        if supply == 'INTER':
+            row['iamt'] = to_rupees(igst)
+        else:
+            row['camt'] = to_rupees(cgst)
+            row['samt'] = to_rupees(sgst)
+        yield separator + dumps(row)
+        separator = b','
+
+
+def _iter_hsn_json(conn, month):
+    yield b'{"data":['
+    for number, item in enumerate(iter_hsn_summary(conn, month, month), 1):
+        row = {
+            'num': number, 'hsn_sc': item['hsnCode'], 'desc': '', 'uqc': 'OTH',
+            'qty': item['quantity'], 'rt': _rate_number(item['gstRate']),
+            'val': item['invoiceValue'], 'txval': item['taxableValue'], 'iamt': item['integratedTax'],
+            'camt': item['centralTax'], 'samt': item['stateTax'], 'csamt': item['cess'],
+        }
+        yield (b',' if number > 1 else b'') + dumps(row)
+    yield b']}'
+
+
+def _iter_docs_json(conn, month):
+    docs = _docs(conn, month)
+    details = []
+    if docs is not None:
+        first, last, total, cancelled = docs
+        details.append({'doc_num': 1, 'doc_typ': OUTWARD_INVOICES, 'docs': [{
+            'num': 1, 'from': first, 'to': last, 'totnum': total,
+            'cancel': cancelled, 'net_issue': total - cancelled,
+        }]})
+    yield dumps({'doc_det': details})
+
+
+# section -> (JSON key, opening, generator, closing)
+JSON_SECTIONS = {
+    'b2b': ('b2b', b'[', _iter_b2b_json, b']'),
+    'b2cl': ('b2cl', b'[', _iter_b2cl_json, b']'),
+    'b2cs': ('b2cs', b'[', _iter_b2cs_json, b']'),
+    'hsn': ('hsn', b'', _iter_hsn_json, b''),
+    'docs': ('doc_issue', b'', _iter_docs_json, b''),
+}
+
+
+def _chunked(parts):
+    """Join small byte strings into chunks of about CHUNK_BYTES"""
+    buffer, size = [], 0
+    for part in parts:
+        buffer.append(part)
+        size += len(part)
+        if size >= CHUNK_BYTES:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def _json_parts(conn, gstin, month, sections):
+    yield b'{"gstin":' + dumps(gstin or '') + b',"fp":' + dumps(return_period(month))
+    for section in sections:
+        key, opening, generate, closing = JSON_SECTIONS[section]
+        yield b',' + dumps(key) + b':' + opening
+        yield from generate(conn, month)
+        yield closing
+    yield b'}'
+
+
+def iter_json(conn, gstin, month, sections=SECTIONS):
+    """The GSTR-1 JSON document in chunks of bytes"""
+    return _chunked(_json_parts(conn, gstin, month, sections))
+
+
+def iter_csv(conn, section, month):
+    """One section as CSV text in chunks"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(HEADERS[section])
+    for row in iter_rows(conn, section, month):
+        writer.writerow(row)
+        if buffer.tell() >= CHUNK_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def write_xlsx(conn, month, sections, fileobj):
+    """Write one sheet per section to fileobj with openpyxl's write-only workbook"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    for section in sections:
+        sheet = workbook.create_sheet(section)
+        sheet.append(HEADERS[section])
+        for row in iter_rows(conn, section, month):
+            sheet.append(row)
+    workbook.save(fileobj)
+
+
+def iter_xlsx(conn, month, sections=SECTIONS):
+    """The workbook in chunks of bytes, built in a temporary file first
+
+    An xlsx file is a zip archive whose directory comes last, so it can
+    only be sent once it is complete; the rows still go to disk as they
+    are read rather than being held in memory.
+    """
+    with tempfile.TemporaryFile(suffix='.xlsx') as spool:
+        write_xlsx(conn, month, sections, spool)
+        spool.seek(0)
+        while True:
+            chunk = spool.read(CHUNK_BYTES)
+            if not chunk:
+                break
+            yield chunk
+
+
+def iter_export(conn, export_format, gstin, month, sections=SECTIONS):
+    """Chunks of the export in the given format"""
+    if export_format == 'csv':
+        return iter_csv(conn, sections[0], month)
+    if export_format == 'xlsx':
+        return iter_xlsx(conn, month, sections)
+    return iter_json(conn, gstin, month, sections)
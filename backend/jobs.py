@@ -0,0 +1,543 @@
+"""
+Background jobs for large bulk imports.
+
+A bulk request with ?async=1 only spools its body to disk, records a job
+in the jobs table of gst_jobs.db and answers 202 with the job id. A
+small thread pool then imports the rows chunk by chunk through the bulk
+import engine, writing progress to the job row after every committed
+chunk, so any server thread or worker process can answer progress polls.
+The jobs live in a database of their own because the client registry
+reloads whenever gst_clients.db changes.
+
+Before the import starts, the spooled JSON body is rewritten as NDJSON
+(one row per line) by an incremental parser, and the rows are read back
+a chunk at a time, so a large upload is never held in memory.
+
+Cancellation is a flag on the job row that the runner checks between
+chunks; the rows a cancelled job already imported are deleted again.
+Rows that upsert and replace jobs overwrite or delete cannot be put back,
+so those jobs stop being cancellable before their first chunk. The
+runner's check and cancel() both update the job row, so exactly one of
+them wins.
+
+Every row of an import gets an id made of the job's id stem and its
+position. When the server restarts, jobs left queued or running by a
+process that no longer exists are picked up again: chunks whose ids are
+already present are skipped, so no row is inserted twice. Jobs with a
+duplicate mode (skip, upsert, replace) are safe to rerun in any case.
+"""
+
+import itertools
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime
+
+from bulk_import import DEFAULT_CHUNK_SIZE, BulkImporter, new_id_stem, row_id
+from schema import TABLES
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+# Modes whose imported rows cannot simply be deleted again
+IRREVERSIBLE_MODES = ('upsert', 'replace')
+
+READ_SIZE = 64 * 1024
+
+JOB_FIELDS = {
+    'id': 'id',
+    'client_id': 'clientId',
+    'kind': 'kind',
+    'table_name': 'table',
+    'status': 'status',
+    'total': 'total',
+    'processed': 'processed',
+    'import_mode': 'mode',
+    'inserted': 'count',
+    'updated': 'updated',
+    'replaced': 'replaced',
+    'skipped': 'skipped',
+    'cancellable': 'cancellable',
+    'error_count': 'errorCount',
+    'error': 'error',
+    'created_at': 'createdAt',
+    'started_at': 'startedAt',
+    'finished_at': 'finishedAt',
+}
+
+
+ADDED_COLUMNS = [
+    ('import_mode', "TEXT NOT NULL DEFAULT 'insert'"),
+    ('updated', 'INTEGER NOT NULL DEFAULT 0'),
+    ('replaced', 'INTEGER NOT NULL DEFAULT 0'),
+    ('skipped', 'INTEGER NOT NULL DEFAULT 0'),
+    ('cancellable', 'INTEGER NOT NULL DEFAULT 1'),
+]
+
+
+class JobCancelled(Exception):
+    """Raised inside a runner when its job has been cancelled"""
+
+
+def create_jobs_table(conn):
+    """Jobs table in the jobs database"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            client_id TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            table_name TEXT NOT NULL,
+            db_path TEXT NOT NULL,
+            payload_path TEXT,
+            id_stem TEXT NOT NULL,
+            chunk_size INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            total INTEGER,
+            processed INTEGER NOT NULL DEFAULT 0,
+            inserted INTEGER NOT NULL DEFAULT 0,
+            error_count INTEGER NOT NULL DEFAULT 0,
+            errors TEXT,
+            error TEXT,
+            cancel_requested INTEGER NOT NULL DEFAULT 0,
+            runner_pid INTEGER,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            finished_at TEXT
+        )
+    ''')
+    # Columns added after the table was first created
+    existing = {row[1] for row in conn.execute('PRAGMA table_info(jobs)')}
+    for name, definition in ADDED_COLUMNS:
+        if name not in existing:
+            conn.execute(f'ALTER TABLE jobs ADD COLUMN {name} {definition}')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_client ON jobs(client_id, created_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status)')
+
+
+def adopt_jobs(conn, database):
+    """Move the jobs table of another database (where jobs used to be kept) into conn's"""
+    conn.execute('ATTACH DATABASE ? AS previous', (database,))
+    try:
+        if conn.execute("SELECT 1 FROM previous.sqlite_master WHERE type = 'table' AND name = 'jobs'").fetchone():
+            columns = ', '.join(row[1] for row in conn.execute('PRAGMA previous.table_info(jobs)'))
+            conn.execute(f'INSERT OR IGNORE INTO main.jobs ({columns}) SELECT {columns} FROM previous.jobs')
+            conn.execute('DROP TABLE previous.jobs')
+        conn.commit()
+    finally:
+        conn.execute('DETACH DATABASE previous')
+
+
+class _JsonReader:
+    """Decodes one JSON value at a time from a text file, refilling a small buffer"""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self):
+        chunk = self._stream.read(READ_SIZE)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self):
+        """The next character after whitespace, '' at the end"""
+        while True:
+            buffer = self._buffer
+            while self._pos < len(buffer) and buffer[self._pos] in ' \t\r\n':
+                self._pos += 1
+            if self._pos < len(buffer):
+                return buffer[self._pos]
+            if not self._fill():
+                return ''
+
+    def take(self, char):
+        if self.peek() != char:
+            raise ValueError('Request body is not a valid JSON object')
+        self._pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise ValueError('Request body is not valid JSON')
+            # A number that ends the buffer may go on in the next read
+            if end == len(self._buffer) and not self._eof and self._fill():
+                continue
+            self._pos = end
+            return value
+
+
+def iter_json_collection(stream, key):
+    """Yield the items of the array under key in the JSON object read from stream
+
+    Only the item being decoded and one read buffer are held in memory.
+    Other keys are decoded and dropped. Raises ValueError for a body that
+    is not a JSON object.
+    """
+    reader = _JsonReader(stream)
+    reader.take('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        name = reader.value()
+        if not isinstance(name, str):
+            raise ValueError('Request body is not a valid JSON object')
+        reader.take(':')
+        if name == key and reader.peek() == '[':
+            reader.take('[')
+            if reader.peek() == ']':
+                reader.take(']')
+            else:
+                while True:
+                    yield reader.value()
+                    if reader.peek() != ',':
+                        break
+                    reader.take(',')
+                reader.take(']')
+        else:
+            reader.value()
+        if reader.peek() != ',':
+            break
+        reader.take(',')
+    reader.take('}')
+
+
+def pid_alive(pid):
+    """Whether the process that last ran a job still exists"""
+    if not pid:
+        return False
+    if pid == os.getpid():
+        return True
+    if os.name == 'nt':
+        # os.kill(pid, 0) would terminate the process on Windows; the desktop
+        # app runs a single backend there, so any other pid is a dead one
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        # Exists but belongs to someone else, or the check is unsupported
+        return True
+    return True
+
+
+def now():
+    return datetime.now().isoformat()
+
+
+class JobManager:
+    """Runs bulk import jobs on a thread pool and persists their state"""
+
+    def __init__(self, connect_jobs, connect_client, payload_dir, workers=2,
+                 chunk_size=DEFAULT_CHUNK_SIZE, on_change=None, writer_lock=None):
+        self._connect_jobs = connect_jobs
+        self._connect_client = connect_client
+        self._writer_lock = writer_lock
+        self.payload_dir = payload_dir
+        self.chunk_size = chunk_size
+        self._on_change = on_change
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):
+            # A forked server worker must not inherit the parent's runner threads
+            os.register_at_fork(after_in_child=self._forget_executor)
+
+    # Public API
+
+    def submit_bulk_import(self, client_id, db_path, table, stream, kind='bulk-import', mode='insert'):
+        """Spool a bulk request body and queue its import; returns the job"""
+        job_id = f"JOB_{int(datetime.now().timestamp())}_{os.urandom(4).hex().upper()}"
+        os.makedirs(self.payload_dir, exist_ok=True)
+        payload_path = os.path.join(self.payload_dir, f'{job_id}.json')
+        with open(payload_path, 'wb') as payload:
+            while True:
+                chunk = stream.read(64 * 1024)
+                if not chunk:
+                    break
+                payload.write(chunk)
+
+        conn = self._connect_jobs()
+        try:
+            conn.execute('''
+                INSERT INTO jobs (id, client_id, kind, table_name, db_path, payload_path,
+                                  id_stem, chunk_size, import_mode, status, runner_pid, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'queued', ?, ?)
+            ''', (job_id, client_id, kind, table.name, db_path, payload_path,
+                  new_id_stem(table), self.chunk_size, mode, os.getpid(), now()))
+            conn.commit()
+        finally:
+            conn.close()
+
+        self._submit(job_id)
+        return self.get(job_id)
+
+    def get(self, job_id):
+        """Job as a camelCase dict, with the error report once it has finished"""
+        row = self._load(job_id)
+        return self._to_dict(row) if row is not None else None
+
+    def list(self, client_id, limit=50):
+        conn = self._connect_jobs()
+        try:
+            rows = conn.execute(
+                'SELECT * FROM jobs WHERE client_id = ? ORDER BY created_at DESC LIMIT ?',
+                (client_id, limit)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [self._to_dict(row, include_errors=False) for row in rows]
+
+    def cancel(self, job_id):
+        """Request cancellation; returns the job, or None if it does not exist
+
+        Queued jobs are cancelled at once, running jobs at the next chunk.
+        Upsert and replace jobs that have started writing are left running
+        (cancelRequested stays false, cancellable is false).
+        """
+        conn = self._connect_jobs()
+        try:
+            conn.execute('''
+                UPDATE jobs SET cancel_requested = 1,
+                       status = CASE WHEN status = 'queued' THEN 'cancelled' ELSE status END,
+                       finished_at = CASE WHEN status = 'queued' THEN ? ELSE finished_at END
+                WHERE id = ? AND status IN ('queued', 'running') AND cancellable = 1
+            ''', (now(), job_id))
+            conn.commit()
+        finally:
+            conn.close()
+        return self.get(job_id)
+
+    def resume(self):
+        """Requeue jobs whose runner process is gone; returns their ids"""
+        conn = self._connect_jobs()
+        resumed = []
+        try:
+            rows = conn.execute(
+                'SELECT id, runner_pid FROM jobs WHERE status IN (?, ?) ORDER BY created_at',
+                ACTIVE_STATUSES
+            ).fetchall()
+            for row in rows:
+                if pid_alive(row['runner_pid']):
+                    continue
+                # Claim the job; another process resuming at the same time loses here
+                claimed = conn.execute(
+                    'UPDATE jobs SET runner_pid = ? WHERE id = ? AND runner_pid IS ?',
+                    (os.getpid(), row['id'], row['runner_pid'])
+                ).rowcount
+                conn.commit()
+                if claimed:
+                    resumed.append(row['id'])
+        finally:
+            conn.close()
+        for job_id in resumed:
+            self._submit(job_id)
+        return resumed
+
+    def shutdown(self, wait=False):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    # Runner
+
+    def _submit(self, job_id):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job')
+            self._executor.submit(self._run, job_id)
+
+    def _forget_executor(self):
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _run(self, job_id):
+        job = self._load(job_id)
+        if job is None:
+            return
+        if job['status'] not in ACTIVE_STATUSES:
+            # Cancelled while it was still queued
+            self._remove_payload(job)
+            return
+        table = TABLES[job['table_name']]
+        self._update(job_id, status='running', started_at=job['started_at'] or now())
+
+        try:
+            rows_path, total = self._spool_rows(job, table)
+
+            conn = self._connect_client(job['db_path'])
+            try:
+                lock = self._writer_lock(job['db_path']) if self._writer_lock else None
+                importer = BulkImporter(conn, table, job['chunk_size'], id_stem=job['id_stem'],
+                                        mode=job['import_mode'], lock=lock)
+                start = self._resume_position(conn, table, job, total)
+                importer.received = start
+                importer.inserted = self._count_imported(conn, table, job['id_stem'])
+                importer.updated = job['updated']
+                importer.replaced = job['replaced']
+                importer.skipped = job['skipped']
+                importer.error_count = job['error_count']
+                importer.errors = json.loads(job['errors'] or '[]')
+
+                if job['import_mode'] in IRREVERSIBLE_MODES and not self._lock_in(job_id):
+                    raise JobCancelled()
+                with open(rows_path, encoding='utf-8') as rows_file:
+                    lines = itertools.islice(rows_file, start, None)
+                    for _offset in range(start, total, job['chunk_size']):
+                        if self._cancel_requested(job_id):
+                            raise JobCancelled()
+                        importer.import_chunk([json.loads(line) for line in itertools.islice(lines, job['chunk_size'])])
+                        self._record_progress(job_id, importer)
+                        if self._on_change is not None:
+                            self._on_change(job['db_path'])
+            except JobCancelled:
+                with lock or nullcontext():
+                    self._delete_imported(conn, table, job['id_stem'])
+                if self._on_change is not None:
+                    self._on_change(job['db_path'])
+                raise
+            finally:
+                conn.close()
+
+            self._update(job_id, status='completed', finished_at=now())
+        except JobCancelled:
+            self._update(job_id, status='cancelled', inserted=0, finished_at=now())
+        except Exception as e:
+            self._update(job_id, status='failed', error=str(e), finished_at=now())
+        self._remove_payload(job)
+
+    def _spool_rows(self, job, table):
+        """(path, count) of the job's rows as NDJSON, converted from the spooled body once"""
+        rows_path = os.path.splitext(job['payload_path'])[0] + '.ndjson'
+        if job['payload_path'] == rows_path:
+            return rows_path, job['total']
+
+        total = 0
+        with open(job['payload_path'], encoding='utf-8') as body, \
+                open(rows_path, 'w', encoding='utf-8') as rows_file:
+            for row in iter_json_collection(body, table.collection_key):
+                rows_file.write(json.dumps(row, separators=(',', ':')))
+                rows_file.write('\n')
+                total += 1
+        if not total:
+            raise ValueError(f'No {table.label} provided')
+        # A restart from here on reads the NDJSON file
+        self._update(job['id'], payload_path=rows_path, total=total)
+        os.remove(job['payload_path'])
+        return rows_path, total
+
+    def _resume_position(self, conn, table, job, total):
+        """First position whose chunk has not been committed"""
+        start = job['processed']
+        size = job['chunk_size']
+        # Progress is recorded after the chunk commit, so the chunk after
+        # the recorded position may already be in the client database
+        while start < total:
+            last = min(start + size, total) - 1
+            present = conn.execute(
+                f'SELECT 1 FROM {table.name} WHERE id BETWEEN ? AND ? LIMIT 1',
+                (row_id(job['id_stem'], start), row_id(job['id_stem'], last))
+            ).fetchone()
+            if present is None:
+                break
+            start += size
+        return min(start, total)
+
+    @staticmethod
+    def _count_imported(conn, table, id_stem):
+        return conn.execute(
+            f'SELECT COUNT(*) FROM {table.name} WHERE id > ? AND id < ?',
+            (id_stem + '_', id_stem + '`')
+        ).fetchone()[0]
+
+    @staticmethod
+    def _delete_imported(conn, table, id_stem):
+        # '`' sorts right after '_', so this is the id range of the import
+        conn.execute(f'DELETE FROM {table.name} WHERE id > ? AND id < ?',
+                     (id_stem + '_', id_stem + '`'))
+        conn.commit()
+
+    def _record_progress(self, job_id, importer):
+        self._update(
+            job_id,
+            processed=importer.received,
+            inserted=importer.inserted,
+            updated=importer.updated,
+            replaced=importer.replaced,
+            skipped=importer.skipped,
+            error_count=importer.error_count,
+            errors=json.dumps(importer.errors) if importer.errors else None,
+        )
+
+    def _lock_in(self, job_id):
+        """Make the job no longer cancellable, unless cancellation came first"""
+        conn = self._connect_jobs()
+        try:
+            updated = conn.execute(
+                'UPDATE jobs SET cancellable = 0 WHERE id = ? AND cancel_requested = 0', (job_id,)
+            ).rowcount
+            conn.commit()
+        finally:
+            conn.close()
+        return bool(updated)
+
+    def _cancel_requested(self, job_id):
+        conn = self._connect_jobs()
+        try:
+            row = conn.execute('SELECT cancel_requested FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        finally:
+            conn.close()
+        return row is None or bool(row[0])
+
+    def _remove_payload(self, job):
+        stem = os.path.splitext(job['payload_path'])[0]
+        for path in (stem + '.json', stem + '.ndjson'):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    # Persistence helpers
+
+    def _load(self, job_id):
+        conn = self._connect_jobs()
+        try:
+            return conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        finally:
+            conn.close()
+
+    def _update(self, job_id, **fields):
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        conn = self._connect_jobs()
+        try:
+            conn.execute(f'UPDATE jobs SET {assignments} WHERE id = ?', (*fields.values(), job_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _to_dict(row, include_errors=True):
+        job = {key: row[column] for column, key in JOB_FIELDS.items()}
+        job['cancelRequested'] = bool(row['cancel_requested'])
+        job['cancellable'] = bool(row['cancellable'])
+        if job['total']:
+            job['progress'] = round(job['processed'] / job['total'], 4)
+        else:
+            job['progress'] = 1.0 if job['status'] == 'completed' else 0.0
+        if include_errors:
+            job['errors'] = json.loads(row['errors']) if row['errors'] else []
+        return job
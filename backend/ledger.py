@@ -0,0 +1,167 @@
+"""
+Running ITC ledger per month and tax head.
+
+For every month the ledger carries the closing ITC of the previous month
+forward as the opening balance, adds the ITC on eligible purchases
+(itc_available = 'Yes') and sets off the output tax on sales and B2C
+sales:
+
+    balance = opening + input - output
+    closing = max(balance, 0)     carried into the next month
+    payable = max(-balance, 0)    to be paid in cash
+
+The figures come from the monthly_totals rollup, so a ledger costs one
+small query however many invoices there are. Results are cached per
+client database and month; the write routes invalidate a client's
+entries after every commit, and each entry is checked against the data
+version of the months it covers (or the file signature of the database)
+so that writes from another process are noticed.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+from money import to_rupees
+
+TAX_HEADS = (
+    ('integratedTax', 'integrated_tax'),
+    ('centralTax', 'central_tax'),
+    ('stateTax', 'state_tax'),
+    ('cess', 'cess'),
+)
+
+LEDGER_SQL = '''
+    SELECT month,
+           source = 'purchases' AS inward,
+           SUM(integrated_tax) AS integrated_tax,
+           SUM(central_tax) AS central_tax,
+           SUM(state_tax) AS state_tax,
+           SUM(cess) AS cess
+    FROM monthly_totals
+    WHERE source IN ('purchases', 'sales', 'b2c_sales')
+      AND month BETWEEN ? AND ?
+      AND (source <> 'purchases' OR itc_eligible)
+    GROUP BY month, inward
+    ORDER BY month
+'''
+
+
+def itc_ledger(conn, month, first_month=None):
+    """ITC ledger for month, carrying balances forward from first_month
+
+    Without first_month the ledger starts at the client's earliest month.
+    Balances are carried in integer paise and converted at the end.
+    """
+    zero = {key: 0 for key, _column in TAX_HEADS}
+    opening = dict(zero)
+    current = None  # (input, output) of the month being accumulated
+    months = 0
+
+    def close(entry):
+        inward, outward = entry
+        for key, _column in TAX_HEADS:
+            opening[key] = max(opening[key] + inward[key] - outward[key], 0)
+
+    for row in conn.execute(LEDGER_SQL, (first_month or '', month)):
+        if current is None or current[0] != row['month']:
+            if current is not None and current[0] != month:
+                close(current[1])
+            current = (row['month'], (dict(zero), dict(zero)))
+            months += 1
+        amounts = current[1][0] if row['inward'] else current[1][1]
+        for key, column in TAX_HEADS:
+            amounts[key] += row[column]
+
+    if current is not None and current[0] == month:
+        inward, outward = current[1]
+    else:
+        if current is not None:
+            close(current[1])
+        inward, outward = dict(zero), dict(zero)
+
+    heads = {}
+    for key, _column in TAX_HEADS:
+        balance = opening[key] + inward[key] - outward[key]
+        heads[key] = {
+            'opening': opening[key],
+            'input': inward[key],
+            'output': outward[key],
+            'balance': balance,
+            'closing': max(balance, 0),
+            'payable': max(-balance, 0),
+        }
+
+    totals = {
+        field: to_rupees(sum(head[field] for head in heads.values()))
+        for field in ('opening', 'input', 'output', 'balance', 'closing', 'payable')
+    }
+    heads = {key: {field: to_rupees(value) for field, value in head.items()} for key, head in heads.items()}
+    return {'month': month, 'from': first_month, 'monthsWithData': months, 'heads': heads, 'totals': totals}
+
+
+def file_signature(db_path):
+    """(mtime_ns, size) of a database file and its WAL"""
+    signature = []
+    for path in (db_path, db_path + '-wal'):
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+
+class LedgerCache:
+    """LRU cache of computed ledgers keyed by (db_path, month, first_month)"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._stats = {'lookups': 0, 'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def get(self, conn, db_path, month, first_month=None, signature=None):
+        """Cached ledger for a month, computed on a miss
+
+        signature identifies the state of the data the ledger is built
+        from (the data version when the caller has one); it defaults to
+        the file signature of the database.
+        """
+        key = (db_path, month, first_month)
+        if signature is None:
+            signature = file_signature(db_path)
+        with self._lock:
+            self._stats['lookups'] += 1
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return entry[1]
+            self._stats['misses'] += 1
+
+        # The signature is taken before the query, so a write that lands
+        # while it runs makes the entry stale rather than wrong
+        ledger = itc_ledger(conn, month, first_month)
+        with self._lock:
+            self._entries[key] = (signature, ledger)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return ledger
+
+    def invalidate(self, db_path):
+        """Drop every cached ledger of one client database"""
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == db_path]
+            for key in stale:
+                del self._entries[key]
+            self._stats['invalidations'] += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats['lookups']
+            snapshot = dict(self._stats)
+            snapshot['hitRate'] = round(self._stats['hits'] / lookups, 4) if lookups else 0.0
+            snapshot['entries'] = len(self._entries)
+            return snapshot
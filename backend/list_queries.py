@@ -0,0 +1,239 @@
+"""
+Filtered, sorted and keyset-paginated list queries for the client tables.
+
+List routes accept:
+    fields=id,invoiceNumber,...     only return these camelCase fields
+    sort=taxableValue&order=asc     sort on a whitelisted column (default newest first)
+    limit=100&cursor=<token>        page through results with an opaque cursor
+    <camelCaseKey>=value            equality filter on any column
+    invoiceDateFrom / invoiceDateTo inclusive invoice date range (any stored date format)
+
+Pages are fetched with a row-value comparison on the sort key plus the
+id as tie breaker, so every page is an index range scan instead of an
+OFFSET that re-reads the skipped rows.
+
+list_query_json encodes the response straight from the cursor tuples
+(see serializers.py) and streams unpaginated lists in chunks.
+"""
+
+import base64
+import json
+
+from columnar import referenced_names
+from money import to_paise
+from normalized import RATE_COLUMNS, to_basis_points, to_day
+from serializers import dumps, iter_json_array, plain_cursor, table_serializer
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+# Default ordering per table (newest first), ending with the unique id
+DEFAULT_ORDER = {
+    'purchases': ('invoice_date', 'created_at', 'id'),
+    'sales': ('invoice_date', 'created_at', 'id'),
+    'b2c_sales': ('created_at', 'id'),
+}
+
+# Columns that are never NULL and can therefore drive a keyset cursor
+SORTABLE = {
+    'purchases': {'invoice_date', 'invoice_number', 'supplier_name', 'supplier_gstin',
+                  'invoice_value', 'taxable_value', 'month', 'created_at', 'updated_at'},
+    'sales': {'invoice_date', 'invoice_number', 'customer_name', 'customer_gstin',
+              'invoice_value', 'taxable_value', 'month', 'created_at', 'updated_at'},
+    'b2c_sales': {'month', 'supply_type', 'gst_rate', 'taxable_value', 'invoice_value',
+                  'created_at', 'updated_at'},
+}
+
+# Query parameters that are not column filters
+RESERVED_PARAMS = {'fields', 'sort', 'order', 'limit', 'cursor', 'month', 'transaction_type',
+                   'invoiceDateFrom', 'invoiceDateTo'}
+
+
+class ListQueryError(ValueError):
+    """Raised for invalid list parameters; the route answers with a 400"""
+
+
+def encode_cursor(values):
+    """Opaque token for the sort key of the last row on a page"""
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, size):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ListQueryError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != size:
+        raise ListQueryError('Invalid cursor')
+    return values
+
+
+def column_filter(table, column, value):
+    """(condition, parameter) of an equality filter on a column
+
+    Amounts are compared in paise and rates in basis points, so 18 finds
+    rates stored as '18' and '18.00' alike.
+    """
+    if column.kind == 'amount':
+        try:
+            return f'{column.name} = ?', to_paise(value)
+        except ValueError:
+            raise ListQueryError(f'{column.key} must be a number')
+    rate_column, bp_column = RATE_COLUMNS.get(table.name, (None, None))
+    if column.name == rate_column:
+        try:
+            return f'{bp_column} = ?', to_basis_points(value)
+        except (TypeError, ValueError):
+            raise ListQueryError(f'{column.key} must be a number')
+    return f'{column.name} = ?', value
+
+
+def date_filter(key, value):
+    """invoice_day parameter of an invoiceDateFrom/To filter"""
+    try:
+        return to_day(value)
+    except ValueError:
+        raise ListQueryError(f'{key} must be a date (YYYY-MM-DD or DD-MM-YYYY)')
+
+
+def parse_fields(table, fields_param):
+    """Columns selected by fields=, or every column"""
+    if not fields_param:
+        return list(table.columns)
+    columns = []
+    for key in fields_param.split(','):
+        key = key.strip()
+        if not key:
+            continue
+        column = table.by_key.get(key)
+        if column is None:
+            raise ListQueryError(f'Unknown field: {key}')
+        if column not in columns:
+            columns.append(column)
+    if not columns:
+        raise ListQueryError('fields must name at least one field')
+    return columns
+
+
+def parse_order(table, args):
+    """Sort columns and direction; the id is always the final tie breaker"""
+    direction = (args.get('order') or 'desc').lower()
+    if direction not in ('asc', 'desc'):
+        raise ListQueryError('order must be asc or desc')
+
+    sort_key = args.get('sort')
+    if not sort_key:
+        return DEFAULT_ORDER[table.name], direction
+
+    column = table.by_key.get(sort_key)
+    if column is None or column.name not in SORTABLE[table.name]:
+        raise ListQueryError(f'Cannot sort by {sort_key}')
+    return (column.name, 'id'), direction
+
+
+def parse_limit(args):
+    """Page size, or None when the caller did not ask for pagination"""
+    if 'limit' not in args and 'cursor' not in args:
+        return None
+    try:
+        limit = int(args.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ListQueryError('limit must be a number')
+    if limit < 1:
+        raise ListQueryError('limit must be positive')
+    return min(limit, MAX_LIMIT)
+
+
+def build_list_query(table, args, filters=None):
+    """Build the SELECT for a list request
+
+    filters holds the route's own column filters (e.g. month). Returns
+    (sql, params, output_columns, order_positions, limit), where
+    order_positions are the indexes of the stored sort key values in
+    each result row.
+    """
+    output_columns = parse_fields(table, args.get('fields'))
+    order_columns, direction = parse_order(table, args)
+    limit = parse_limit(args)
+
+    where, params = [], []
+    for name, value in (filters or {}).items():
+        where.append(f'{name} = ?')
+        params.append(value)
+
+    for key, value in args.items():
+        if key in RESERVED_PARAMS:
+            continue
+        column = table.by_key.get(key)
+        if column is None:
+            raise ListQueryError(f'Unknown filter: {key}')
+        condition, value = column_filter(table, column, value)
+        where.append(condition)
+        params.append(value)
+
+    if 'invoice_date' in table.by_name:
+        for key, operator in (('invoiceDateFrom', '>='), ('invoiceDateTo', '<=')):
+            if args.get(key):
+                where.append(f'invoice_day {operator} ?')
+                params.append(date_filter(key, args[key]))
+
+    if args.get('cursor'):
+        values = decode_cursor(args['cursor'], len(order_columns))
+        comparison = '<' if direction == 'desc' else '>'
+        where.append('({}) {} ({})'.format(
+            ', '.join(order_columns), comparison, ', '.join('?' * len(order_columns))
+        ))
+        params.extend(values)
+
+    # Order columns are selected too, as stored, so the next cursor can be built
+    select_exprs = [column.select_sql for column in output_columns]
+    select_exprs += [name for name in order_columns if name not in select_exprs]
+    order_positions = [select_exprs.index(name) for name in order_columns]
+
+    sql = 'SELECT {} FROM {}'.format(', '.join(select_exprs), table.name)
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    sql += ' ORDER BY ' + ', '.join(f'{name} {direction.upper()}' for name in order_columns)
+    if limit is not None:
+        # One extra row tells whether there is a next page
+        sql += ' LIMIT ?'
+        params.append(limit + 1)
+
+    return sql, params, output_columns, order_positions, limit
+
+
+def query_columns(table, args, filters=None):
+    """{table name: names the request's SQL refers to}, for reading archived years"""
+    return {table.name: referenced_names(build_list_query(table, args, filters)[0])}
+
+
+def list_query_json(conn, table, args, filters=None):
+    """Execute a list request and encode the response as JSON
+
+    Returns bytes for a page, or a generator of byte chunks for an
+    unpaginated list, which reads the cursor as it is consumed. The
+    query runs before this returns, so parameter errors still surface
+    as ListQueryError.
+    """
+    sql, params, output_columns, order_positions, limit = build_list_query(table, args, filters)
+    serializer = table_serializer(output_columns)
+    cursor = plain_cursor(conn)
+    cursor.execute(sql, params)
+
+    if limit is None:
+        return iter_json_array(serializer, cursor)
+
+    rows = cursor.fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([last[position] for position in order_positions])
+
+    return b''.join((
+        b'{"items":', serializer.encode_rows(rows),
+        b',"nextCursor":', dumps(next_cursor),
+        b',"limit":', dumps(limit), b'}',
+    ))
@@ -0,0 +1,419 @@
+"""
+Versioned schema migrations for the client databases.
+
+Each client database records the last migration applied to it in
+PRAGMA user_version. Migrations run in order, each in its own
+transaction together with the version bump, so a database is never left
+half-migrated. Run this module to upgrade every database in
+client_databases/:
+
+    python migrations.py
+"""
+
+import glob
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import changes
+import natural_keys
+import normalized
+import partitions
+import rollups
+import search
+import versions
+from money import AMOUNT_COLUMNS, to_paise
+
+
+def create_base_tables(conn):
+    """Tables every client database starts with"""
+    # Create purchases table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS purchases (
+            id TEXT PRIMARY KEY,
+            supplier_gstin TEXT NOT NULL,
+            supplier_name TEXT NOT NULL,
+            invoice_number TEXT NOT NULL,
+            invoice_type TEXT NOT NULL,
+            invoice_date TEXT NOT NULL,
+            invoice_value REAL NOT NULL,
+            place_of_supply TEXT NOT NULL,
+            reverse_charge TEXT NOT NULL,
+            taxable_value REAL NOT NULL,
+            integrated_tax REAL NOT NULL,
+            central_tax REAL NOT NULL,
+            state_tax REAL NOT NULL,
+            cess REAL NOT NULL,
+            itc_available TEXT NOT NULL,
+            tax_rate TEXT NOT NULL,
+            month TEXT NOT NULL,
+            status TEXT DEFAULT 'active',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Create sales table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sales (
+            id TEXT PRIMARY KEY,
+            customer_gstin TEXT NOT NULL,
+            customer_name TEXT NOT NULL,
+            invoice_number TEXT NOT NULL,
+            invoice_type TEXT NOT NULL,
+            invoice_date TEXT NOT NULL,
+            invoice_value REAL NOT NULL,
+            place_of_supply TEXT NOT NULL,
+            reverse_charge TEXT NOT NULL,
+            taxable_value REAL NOT NULL,
+            integrated_tax REAL NOT NULL,
+            central_tax REAL NOT NULL,
+            state_tax REAL NOT NULL,
+            cess REAL NOT NULL,
+            tax_rate TEXT NOT NULL,
+            month TEXT NOT NULL,
+            transaction_type TEXT DEFAULT 'B2B',
+            hsn_code TEXT,
+            quantity REAL,
+            unit_price REAL,
+            ecommerce_gstin TEXT,
+            status TEXT DEFAULT 'active',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Create B2C sales table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS b2c_sales (
+            id TEXT PRIMARY KEY,
+            month TEXT NOT NULL,
+            supply_type TEXT NOT NULL,
+            place_of_supply TEXT,
+            gst_rate TEXT NOT NULL,
+            taxable_value REAL NOT NULL,
+            central_tax REAL NOT NULL,
+            state_tax REAL NOT NULL,
+            integrated_tax REAL NOT NULL,
+            invoice_value REAL NOT NULL,
+            hsn_code TEXT,
+            quantity REAL,
+            unit_price REAL,
+            status TEXT DEFAULT 'active',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Create GST returns table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS gst_returns (
+            id TEXT PRIMARY KEY,
+            return_type TEXT NOT NULL,
+            period TEXT NOT NULL,
+            filing_date TEXT,
+            status TEXT DEFAULT 'pending',
+            total_taxable_value REAL DEFAULT 0,
+            total_tax_payable REAL DEFAULT 0,
+            total_tax_paid REAL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def add_sundry_debtors(conn):
+    """Sundry debtors table for databases created before it existed"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sundry_debtors (
+            id TEXT PRIMARY KEY,
+            debtor_name TEXT NOT NULL,
+            gstin TEXT NOT NULL UNIQUE,
+            address TEXT,
+            contact TEXT,
+            email TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_debtor_name ON sundry_debtors(debtor_name)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_debtor_gstin ON sundry_debtors(gstin)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_debtor_created ON sundry_debtors(created_at DESC)')
+
+
+def add_list_indexes(conn):
+    """Indexes matching the month/transaction type filters and list ordering
+
+    Each ends in id, the tie-breaker of keyset pages, so a page is read
+    straight off the index with no extra sort step.
+    """
+    # WHERE month = ? ORDER BY invoice_date DESC, created_at DESC, id DESC
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_purchases_month_keyset
+        ON purchases(month, invoice_date, created_at, id)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_purchases_keyset
+        ON purchases(invoice_date, created_at, id)
+    ''')
+    # WHERE month = ? AND transaction_type = ? ORDER BY invoice_date DESC, created_at DESC, id DESC
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_sales_month_type_keyset
+        ON sales(month, transaction_type, invoice_date, created_at, id)
+    ''')
+    # WHERE transaction_type = ? without a month
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_sales_type_keyset
+        ON sales(transaction_type, invoice_date, created_at, id)
+    ''')
+    # WHERE month = ? ORDER BY created_at DESC, id DESC
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_b2c_sales_month_keyset
+        ON b2c_sales(month, created_at, id)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_b2c_sales_keyset
+        ON b2c_sales(created_at, id)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_gst_returns_type_period
+        ON gst_returns(return_type, period)
+    ''')
+
+
+# List indexes of databases migrated before they ended in id
+SUPERSEDED_LIST_INDEXES = ('idx_purchases_month_date', 'idx_purchases_date', 'idx_sales_month_type_date',
+                           'idx_sales_type_date', 'idx_b2c_sales_month_created')
+
+
+def drop_superseded_list_indexes(conn):
+    """Replace the list indexes of older databases with the keyset ones
+
+    Databases created since add_list_indexes builds the keyset indexes
+    have nothing to drop or create here.
+    """
+    for name in SUPERSEDED_LIST_INDEXES:
+        conn.execute(f'DROP INDEX IF EXISTS {name}')
+    add_list_indexes(conn)
+
+
+def add_monthly_totals(conn):
+    """Trigger-maintained monthly rollups, filled from the existing rows"""
+    rollups.create_rollups(conn)
+
+
+def add_data_versions(conn):
+    """Trigger-maintained per-table, per-month version counters"""
+    versions.create_versions(conn)
+
+
+def add_change_log(conn):
+    """Trigger-maintained change log for incremental sync"""
+    changes.create_change_log(conn)
+
+
+def add_search_index(conn):
+    """FTS5 index over names, invoice numbers and GSTINs"""
+    search.create_search_index(conn)
+
+
+def add_natural_key_indexes(conn):
+    """Unique invoice keys, after moving existing duplicates aside"""
+    natural_keys.create_natural_key_indexes(conn)
+
+
+def rebuild_table(conn, table, retyped):
+    """Recreate a table with some columns retyped, keeping its rows, rowids, indexes and triggers
+
+    retyped maps a column name to (new type, SELECT expression for its
+    value). Rowids are copied so the search index still points at the
+    right rows. Generated columns are not copied; tables that have them
+    must add them back (and their indexes) after the rebuild.
+    """
+    definitions, names, values = [], [], []
+    for _cid, name, column_type, notnull, default, pk in conn.execute(f'PRAGMA table_info({table})'):
+        column_type, value = retyped.get(name, (column_type, name))
+        definition = f'{name} {column_type}'.rstrip()
+        if pk:
+            definition += ' PRIMARY KEY'
+        if notnull:
+            definition += ' NOT NULL'
+        if default is not None:
+            definition += f' DEFAULT {default}'
+        definitions.append(definition)
+        names.append(name)
+        values.append(value)
+
+    dependents = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL",
+        (table,)
+    ).fetchall()
+    conn.execute(f"CREATE TABLE {table}_rebuild ({', '.join(definitions)})")
+    conn.execute(
+        f"INSERT INTO {table}_rebuild (rowid, {', '.join(names)}) "
+        f"SELECT rowid, {', '.join(values)} FROM {table}"
+    )
+    conn.execute(f'DROP TABLE {table}')
+    conn.execute(f'ALTER TABLE {table}_rebuild RENAME TO {table}')
+    for (sql,) in dependents:
+        conn.execute(sql)
+
+
+def convert_amounts_to_paise(conn):
+    """Store invoice amounts as INTEGER paise instead of REAL rupees"""
+    # The same rounding rule as every write route (see money.py)
+    conn.create_function('to_paise', 1, to_paise, deterministic=True)
+    tables = ['purchases', 'sales', 'b2c_sales'] + [
+        natural_keys.quarantine_table(table) for table in natural_keys.NATURAL_KEYS
+    ]
+    for table in tables:
+        columns = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+        if not columns:
+            continue
+        rebuild_table(conn, table, {
+            column: ('INTEGER', f'to_paise({column})') for column in AMOUNT_COLUMNS if column in columns
+        })
+
+    conn.execute('DROP TABLE monthly_totals')
+    rollups.create_rollups(conn)
+    # Amounts with more than two decimals were rounded; cached copies are stale
+    conn.execute(f'UPDATE data_versions SET version = version + 1, changed_at = {versions.CHANGED_AT_SQL}')
+
+
+def add_normalized_columns(conn):
+    """Generated basis-point rate and invoice_day columns; rollups regrouped by them"""
+    normalized.add_normalized_columns(conn)
+    # '18' and '18.00' used to be separate rollup rows
+    conn.execute('DROP TABLE monthly_totals')
+    rollups.create_rollups(conn)
+    conn.execute(f'UPDATE data_versions SET version = version + 1, changed_at = {versions.CHANGED_AT_SQL}')
+
+
+def add_gstr1_index(conn):
+    """B2B sales of a month in customer order, for the streamed GSTR-1 export"""
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_sales_gstr1
+        ON sales(month, transaction_type, customer_gstin, invoice_number)
+    ''')
+
+
+def add_partitions(conn):
+    """partitions table of closed financial years, and triggers that keep them read-only"""
+    partitions.create_partitions(conn)
+
+
+# (version, description, function) in the order they must run
+CLIENT_MIGRATIONS = [
+    (1, 'Create purchases, sales, b2c_sales and gst_returns tables', create_base_tables),
+    (2, 'Add sundry_debtors table', add_sundry_debtors),
+    (3, 'Add month/type/date list indexes ending in id', add_list_indexes),
+    (4, 'Drop list indexes superseded by the keyset indexes', drop_superseded_list_indexes),
+    (5, 'Add monthly_totals rollup table and triggers', add_monthly_totals),
+    (6, 'Add data_versions table and triggers', add_data_versions),
+    (7, 'Add change_log table and triggers', add_change_log),
+    (8, 'Add search_index FTS5 table and triggers', add_search_index),
+    (9, 'Quarantine duplicate invoices and add unique natural-key indexes', add_natural_key_indexes),
+    (10, 'Store invoice amounts as INTEGER paise', convert_amounts_to_paise),
+    (11, 'Add tax_rate_bp and invoice_day generated columns', add_normalized_columns),
+    (12, 'Add GSTR-1 export index on sales', add_gstr1_index),
+    (13, 'Add partitions table and closed financial year triggers', add_partitions),
+]
+
+
+def schema_version(conn):
+    """The migration version recorded in a database"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def apply_migrations(conn, migrations=CLIENT_MIGRATIONS):
+    """Apply pending migrations to an open connection; returns the versions applied"""
+    applied = []
+    current = schema_version(conn)
+    previous_isolation = conn.isolation_level
+    conn.isolation_level = None  # manage the transactions explicitly
+    try:
+        for version, _description, migrate in migrations:
+            if version <= current:
+                continue
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                migrate(conn)
+                conn.execute(f'PRAGMA user_version = {int(version)}')
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            applied.append(version)
+            current = version
+        if applied:
+            conn.execute('PRAGMA optimize')
+    finally:
+        conn.isolation_level = previous_isolation
+    return applied
+
+
+def migrate_database(db_path, migrations=CLIENT_MIGRATIONS):
+    """Bring one database file up to the latest version, in WAL mode"""
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        applied = apply_migrations(conn, migrations)
+        # WAL lets readers run alongside a writer; the mode is stored in the file
+        conn.execute('PRAGMA journal_mode=WAL')
+        return applied
+    finally:
+        conn.close()
+
+
+def migrate_all(db_dir, max_workers=None, migrations=CLIENT_MIGRATIONS):
+    """Upgrade every .db file in db_dir in parallel
+
+    Returns a list of (db_path, applied_versions, error) tuples.
+    """
+    db_files = sorted(glob.glob(os.path.join(db_dir, '*.db')))
+    if not db_files:
+        return []
+    if max_workers is None:
+        max_workers = min(8, os.cpu_count() or 1)
+
+    def run(db_path):
+        try:
+            return db_path, migrate_database(db_path, migrations), None
+        except Exception as e:
+            return db_path, [], e
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(run, db_files))
+
+
+def latest_version(migrations=CLIENT_MIGRATIONS):
+    return migrations[-1][0] if migrations else 0
+
+
+def main():
+    """Migrate all client databases and print a summary"""
+    client_db_dir = 'client_databases'
+    if not os.path.exists(client_db_dir):
+        print(f"✗ Directory '{client_db_dir}' not found!")
+        print(f"  Current directory: {os.getcwd()}")
+        return
+
+    results = migrate_all(client_db_dir)
+    failed = 0
+    for db_path, applied, error in results:
+        name = os.path.basename(db_path)
+        if error is not None:
+            failed += 1
+            print(f"✗ Error migrating {name}: {error}")
+        elif applied:
+            print(f"✓ Migrated {name} to version {applied[-1]}")
+        else:
+            print(f"✓ {name} is already at version {latest_version()}")
+
+    print()
+    print(f"Total databases: {len(results)}")
+    print(f"Successful: {len(results) - failed}")
+    print(f"Failed: {failed}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Fixed-point amounts: rupees in the JSON API, integer paise in SQLite.
+
+invoice_value, taxable_value and the tax columns of purchases, sales and
+B2C sales are stored as INTEGER paise. Every write path converts the
+incoming rupee amounts with to_paise, so there is exactly one rounding
+rule: the amount as written (numbers by their shortest decimal form) is
+rounded to the paisa, halves away from zero, e.g. 10.005 -> 1001 and
+-10.005 -> -1001. Sums over these columns are exact integer sums.
+
+Amounts go back to rupees only at the edge: list and row queries select
+column / 100.0 (Column.select_sql), reports divide their integer totals
+with to_rupees.
+"""
+
+import math
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+PAISE_PER_RUPEE = 100
+
+# Amount columns of the invoice tables (b2c_sales has no cess)
+AMOUNT_COLUMNS = ('invoice_value', 'taxable_value', 'integrated_tax', 'central_tax', 'state_tax', 'cess')
+
+_PAISA = Decimal('0.01')
+
+
+def to_paise(value, default=0):
+    """Rupee amount (number or text such as '1,180.50') as integer paise
+
+    Missing and blank values return default, which is already in paise.
+    Raises ValueError for anything that is not a finite amount.
+    """
+    if value is None:
+        return default
+    if type(value) is int:
+        return value * PAISE_PER_RUPEE
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            raise ValueError(f'Not an amount: {value!r}')
+        paise = value * PAISE_PER_RUPEE
+        nearest = round(paise)
+        # Whole paise (by far the common case) need no decimal arithmetic;
+        # anything else is rounded from the number's decimal form
+        if abs(paise - nearest) < 1e-6:
+            return int(nearest)
+        value = repr(value)
+    elif isinstance(value, str):
+        value = value.replace(',', '').strip()
+        if not value:
+            return default
+    try:
+        amount = Decimal(value)
+    except (InvalidOperation, TypeError):
+        raise ValueError(f'Not an amount: {value!r}')
+    if not amount.is_finite():
+        raise ValueError(f'Not an amount: {value!r}')
+    return int(amount.quantize(_PAISA, rounding=ROUND_HALF_UP) * PAISE_PER_RUPEE)
+
+
+def to_rupees(paise):
+    """Integer paise as a rupee number for JSON (None stays None)"""
+    if paise is None:
+        return None
+    return paise / PAISE_PER_RUPEE
+
+
+def rupees_sql(expression):
+    """SQL expression converting a paise expression to rupees"""
+    return f'{expression} / 100.0'
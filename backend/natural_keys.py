@@ -0,0 +1,145 @@
+"""
+Natural keys of invoices and duplicate handling for imports.
+
+Row ids are random, so nothing used to stop the same GSTR-2B file from
+being imported twice. A purchase is identified by its supplier GSTIN,
+invoice number and invoice date, a sale by its customer GSTIN, invoice
+number and invoice date. Partial unique indexes on those columns (rows
+without an invoice number are left out) make SQLite reject a second
+copy of an invoice, and let the bulk importer resolve duplicates in the
+INSERT statement itself:
+
+    insert   - a duplicate is reported as a row error (the default)
+    skip     - rows whose invoice already exists are left out
+    upsert   - the existing row is updated in place, keeping its id;
+               rows that are identical are not written at all
+    replace  - the existing row is deleted and the incoming one inserted
+
+Databases that already hold duplicates keep the oldest copy of each
+invoice; the others are moved to a <table>_duplicates table for review
+when the indexes are created.
+"""
+
+# table -> natural key columns
+NATURAL_KEYS = {
+    'purchases': ('supplier_gstin', 'invoice_number', 'invoice_date'),
+    'sales': ('customer_gstin', 'invoice_number', 'invoice_date'),
+}
+
+# Rows outside the partial indexes are never treated as duplicates
+KEY_CONDITION = "invoice_number <> ''"
+
+IMPORT_MODES = ('insert', 'skip', 'upsert', 'replace')
+
+
+class ImportModeError(ValueError):
+    """Raised for an unknown import mode or one the table does not support"""
+
+
+def index_name(table):
+    return f'idx_{table}_natural_key'
+
+
+def quarantine_table(table):
+    return f'{table}_duplicates'
+
+
+def parse_mode(table, mode):
+    """Validated import mode for a table; None or '' means insert"""
+    mode = (mode or 'insert').strip().lower()
+    if mode not in IMPORT_MODES:
+        raise ImportModeError(f"mode must be one of: {', '.join(IMPORT_MODES)}")
+    if mode != 'insert' and table.name not in NATURAL_KEYS:
+        raise ImportModeError(f'{table.label} have no invoice key; only mode=insert is supported')
+    return mode
+
+
+def quarantine_duplicates(conn, table):
+    """Move every copy of an invoice but the oldest to <table>_duplicates; returns how many"""
+    key = ', '.join(NATURAL_KEYS[table])
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {quarantine_table(table)} AS
+        SELECT *, '' AS duplicate_of, '' AS quarantined_at FROM {table} WHERE 0
+    ''')
+    conn.execute(f'''
+        INSERT INTO {quarantine_table(table)}
+        SELECT t.*, d.keep_id, CURRENT_TIMESTAMP
+        FROM {table} AS t
+        JOIN (
+            SELECT rowid AS row_key,
+                   FIRST_VALUE(id) OVER keys AS keep_id,
+                   ROW_NUMBER() OVER keys AS copy
+            FROM {table}
+            WHERE {KEY_CONDITION}
+            WINDOW keys AS (PARTITION BY {key} ORDER BY created_at, rowid)
+        ) AS d ON t.rowid = d.row_key
+        WHERE d.copy > 1
+    ''')
+    # Deleting through the table keeps rollups, versions, change log and search in step
+    return conn.execute(f'''
+        DELETE FROM {table}
+        WHERE id IN (SELECT id FROM {quarantine_table(table)})
+    ''').rowcount
+
+
+def create_natural_key_indexes(conn):
+    """Quarantine existing duplicates and create the unique natural-key indexes"""
+    for table, key in NATURAL_KEYS.items():
+        quarantine_duplicates(conn, table)
+        conn.execute(f'''
+            CREATE UNIQUE INDEX IF NOT EXISTS {index_name(table)}
+            ON {table}({', '.join(key)}) WHERE {KEY_CONDITION}
+        ''')
+
+
+def is_duplicate_error(error, table):
+    """Whether an IntegrityError comes from the natural-key index of table"""
+    key = NATURAL_KEYS.get(table.name)
+    if key is None:
+        return False
+    return str(error) == 'UNIQUE constraint failed: ' + ', '.join(f'{table.name}.{name}' for name in key)
+
+
+def duplicate_message(table):
+    """Error for a row whose invoice is already present"""
+    keys = [table.by_name[name].key for name in NATURAL_KEYS[table.name]]
+    return f"An invoice with the same {', '.join(keys[:-1])} and {keys[-1]} already exists"
+
+
+def insert_sql(table, columns, mode):
+    """INSERT statement for the import mode
+
+    upsert only touches rows where some imported column differs, so an
+    identical re-import does not bump versions or fill the change log.
+    replace runs delete_sql for the row first and then a plain insert.
+    """
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(table.name, ', '.join(columns), ', '.join('?' * len(columns)))
+    if mode == 'skip':
+        return sql + f" ON CONFLICT ({', '.join(NATURAL_KEYS[table.name])}) WHERE {KEY_CONDITION} DO NOTHING"
+    if mode == 'upsert':
+        updated = upsert_columns(table, columns)
+        assignments = ', '.join(f'{name} = excluded.{name}' for name in updated)
+        changed = ' OR '.join(f'{table.name}.{name} IS NOT excluded.{name}' for name in updated)
+        if 'updated_at' in table.by_name:
+            assignments += ', updated_at = CURRENT_TIMESTAMP'
+        return (
+            sql + f" ON CONFLICT ({', '.join(NATURAL_KEYS[table.name])}) WHERE {KEY_CONDITION} "
+            f'DO UPDATE SET {assignments} WHERE {changed}'
+        )
+    return sql
+
+
+def upsert_columns(table, columns):
+    """Imported columns an upsert overwrites: all but the id and the key"""
+    return [name for name in columns if name != 'id' and name not in NATURAL_KEYS[table.name]]
+
+
+def match_sql(table):
+    """WHERE condition matching the existing copy of an invoice, taking the key values"""
+    where = ' AND '.join(f'{name} = ?' for name in NATURAL_KEYS[table.name])
+    return f'{where} AND {KEY_CONDITION}'
+
+
+def delete_sql(table):
+    """DELETE of the existing copy of an invoice, taking the key values"""
+    return f'DELETE FROM {table.name} WHERE {match_sql(table)}'
@@ -0,0 +1,125 @@
+"""
+Normalized tax rates and invoice dates.
+
+tax_rate (gst_rate for B2C sales) is free text such as '18', '18.00' or
+'12.5%', and invoice_date is stored in whatever format was imported:
+YYYY-MM-DD, DD-MM-YYYY or DD/MM/YYYY. Grouping by rate had to cast the
+text on every row, the same rate could end up in two groups, and a date
+range could only be a string comparison that is wrong for day-first
+dates.
+
+Each table gets generated columns next to the raw ones:
+
+    tax_rate_bp / gst_rate_bp   the rate in basis points (18% -> 1800)
+    invoice_day                 the invoice date as a day ordinal, the
+                                same number as date.toordinal() (NULL
+                                when the text is not a date)
+
+SQLite computes them from the raw column on every insert and update, so
+single-row writes, batch edits and bulk and file imports all fill them
+without any change, and they are indexed for per-rate GROUP BY and
+date-range queries. Request parameters are parsed with to_basis_points
+and to_day, which follow the same rules as the SQL.
+"""
+
+import math
+import re
+from datetime import date
+from decimal import ROUND_HALF_UP, Decimal
+
+BASIS_POINTS = 100
+
+# table -> (raw rate column, basis point column)
+RATE_COLUMNS = {
+    'purchases': ('tax_rate', 'tax_rate_bp'),
+    'sales': ('tax_rate', 'tax_rate_bp'),
+    'b2c_sales': ('gst_rate', 'gst_rate_bp'),
+}
+
+# Tables with an invoice_date, which get an invoice_day ordinal
+DAY_TABLES = ('purchases', 'sales')
+
+# julianday() of day 0 of the proleptic Gregorian ordinal (date.toordinal)
+_ORDINAL_EPOCH_JULIAN_DAY = 1721424.5
+
+_ISO_DATE = re.compile(r'^(\d{4})-(\d{2})-(\d{2})')
+_DAY_FIRST_DATE = re.compile(r'^(\d{2})[-/](\d{2})[-/](\d{4})$')
+
+
+def rate_bp_sql(column):
+    """SQL for a text rate column in basis points; text that is not a number counts as 0"""
+    return f'CAST(ROUND(CAST({column} AS REAL) * {BASIS_POINTS}) AS INTEGER)'
+
+
+def day_sql(column):
+    """SQL for a text date column as a day ordinal, or NULL"""
+    iso = (
+        f"CASE WHEN {column} GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*' THEN substr({column}, 1, 10) "
+        f"WHEN {column} GLOB '[0-9][0-9][-/][0-9][0-9][-/][0-9][0-9][0-9][0-9]' "
+        f"THEN substr({column}, 7, 4) || '-' || substr({column}, 4, 2) || '-' || substr({column}, 1, 2) END"
+    )
+    # julianday() is NULL for month 13 or day 32 but rolls 2024-02-30 over
+    # into March. Only days after the 28th need the (slower) check that
+    # the date survives a round trip unchanged. Generated columns cannot
+    # use subqueries, so the normalized text is spelled out each time.
+    return (
+        f"CASE WHEN substr({iso}, 9, 2) <= '28' OR date({iso}, '+0 days') = ({iso}) "
+        f'THEN CAST(julianday({iso}) - {_ORDINAL_EPOCH_JULIAN_DAY} AS INTEGER) END'
+    )
+
+
+def to_basis_points(value):
+    """A rate such as 18, '18.00' or '12.5%' in basis points; raises ValueError"""
+    if isinstance(value, str):
+        value = value.strip().rstrip('%')
+    scaled = float(value) * BASIS_POINTS
+    if not math.isfinite(scaled):
+        raise ValueError(f'Not a rate: {value!r}')
+    # SQLite's ROUND takes halves away from zero ('0.125' -> 13), where
+    # round() would take them to even; the product is a REAL in SQL too
+    return int(Decimal(scaled).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def rate_from_basis_points(basis_points):
+    """Basis points back to the rate text used by the API ('18', '12.5')"""
+    return f'{basis_points / BASIS_POINTS:g}'
+
+
+def parse_date(value):
+    """A date from YYYY-MM-DD (optionally followed by a time), DD-MM-YYYY or DD/MM/YYYY
+
+    Raises ValueError for anything else.
+    """
+    text = str(value or '').strip()
+    match = _ISO_DATE.match(text)
+    if match:
+        year, month, day = match.groups()
+    else:
+        match = _DAY_FIRST_DATE.match(text)
+        if not match:
+            raise ValueError(f'Not a date: {value!r}')
+        day, month, year = match.groups()
+    return date(int(year), int(month), int(day))
+
+
+def to_day(value):
+    """The invoice_day ordinal of a date given as text; raises ValueError"""
+    return parse_date(value).toordinal()
+
+
+def add_normalized_columns(conn):
+    """Add the generated rate and date columns with their indexes"""
+    for table, (rate_column, bp_column) in RATE_COLUMNS.items():
+        conn.execute(
+            f'ALTER TABLE {table} ADD COLUMN {bp_column} INTEGER '
+            f'GENERATED ALWAYS AS ({rate_bp_sql(rate_column)}) VIRTUAL'
+        )
+        # Per-rate totals are asked for a month at a time
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_rate_bp ON {table}(month, {bp_column})')
+
+    for table in DAY_TABLES:
+        conn.execute(
+            f'ALTER TABLE {table} ADD COLUMN invoice_day INTEGER '
+            f"GENERATED ALWAYS AS ({day_sql('invoice_date')}) VIRTUAL"
+        )
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_invoice_day ON {table}(invoice_day)')
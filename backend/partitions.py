@@ -0,0 +1,607 @@
+"""
+Financial-year partitions of a client database.
+
+A client database keeps every month it was ever given, so the hot file
+and its indexes grow with each year even though only the current year
+is written. Closing a financial year moves its purchases, sales and B2C
+sales into a database file of its own:
+
+    client_databases/<name>.db                  open years (hot)
+    client_databases/years/<name>/2023-24.db    one closed year
+
+The year file is a full client database (same migrations, indexes and
+monthly_totals rollup) holding just that year's rows. Once written it is
+switched out of WAL mode, vacuumed and made read-only, and readers open
+it with immutable=1 so SQLite skips locking and change detection.
+
+The hot database records closed years in the partitions table, and
+triggers reject any insert or update into one of their months.
+reader_for routes a read to the right file: the hot database when the
+months are all open, the year file when they fall in one closed year,
+and otherwise a connection with the needed year files ATTACHed behind
+TEMP views that shadow the tables with main.X UNION ALL year.X. The
+data_versions counters stay in the hot database, so cache validators
+work the same for every year.
+
+A closed year can be archived further into a compressed columnar file
+(client_databases/years/<name>/2023-24.cols, see columnar.py) that
+replaces its year file. Reads of archived months load only the months
+and columns they ask for from the memory-mapped archive into an
+in-memory database; restore turns the archive back into a year file.
+
+    python partitions.py close client_databases/name.db 2023-24 [--vacuum]
+    python partitions.py reopen client_databases/name.db 2023-24
+    python partitions.py archive client_databases/name.db 2023-24
+    python partitions.py restore client_databases/name.db 2023-24
+    python partitions.py list [client_databases/name.db ...]
+"""
+
+import glob
+import os
+import sqlite3
+import stat
+import sys
+from datetime import date
+
+import columnar
+import migrations
+import search
+import storage
+from changes import latest_sequence
+from natural_keys import NATURAL_KEYS
+from reports import financial_year_months
+
+# Tables moved into year files; everything else stays in the hot database
+PARTITIONED_TABLES = ('purchases', 'sales', 'b2c_sales')
+
+# Read through the views of a connection spanning several files, and
+# kept in archives
+SPANNED_TABLES = PARTITIONED_TABLES + ('monthly_totals',)
+
+YEARS_DIR = 'years'
+
+# SQLite's default limit on ATTACHed databases per connection
+MAX_ATTACHED = 10
+ARCHIVE_SUFFIX = '.cols'
+
+CLOSING, CLOSED, ARCHIVED = 'closing', 'closed', 'archived'
+
+CLOSED_MONTH_MESSAGE = 'The financial year of this month is closed'
+
+
+class PartitionError(ValueError):
+    """A financial year that cannot be closed or reopened"""
+
+
+class SpanError(PartitionError):
+    """A read spanning more closed years than one connection can attach"""
+
+
+def create_partitions(conn):
+    """Create the partitions table and the triggers that keep closed years read-only"""
+    # A year is 'closing' while its rows are copied out, and already
+    # rejects writes so nothing can land after the copy
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS partitions (
+            financial_year TEXT PRIMARY KEY,
+            first_month TEXT NOT NULL,
+            last_month TEXT NOT NULL,
+            status TEXT NOT NULL,
+            purchases INTEGER NOT NULL DEFAULT 0,
+            sales INTEGER NOT NULL DEFAULT 0,
+            b2c_sales INTEGER NOT NULL DEFAULT 0,
+            closed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    for table in PARTITIONED_TABLES:
+        for event in ('insert', 'update'):
+            conn.execute(f'DROP TRIGGER IF EXISTS trg_{table}_closed_year_{event}')
+            conn.execute(
+                f'CREATE TRIGGER trg_{table}_closed_year_{event} BEFORE {event.upper()} ON {table} '
+                f'WHEN EXISTS (SELECT 1 FROM partitions WHERE NEW.month BETWEEN first_month AND last_month) '
+                f"BEGIN SELECT RAISE(ABORT, '{CLOSED_MONTH_MESSAGE}'); END"
+            )
+
+
+def closed_month_ranges(conn):
+    """(first_month, last_month) of every year that rejects writes"""
+    return conn.execute('SELECT first_month, last_month FROM partitions').fetchall()
+
+
+def financial_year_label(financial_year):
+    """2023-24 for '2023-24' or '2023'; raises PartitionError"""
+    try:
+        first_month, _last_month = financial_year_months(financial_year)
+    except ValueError:
+        raise PartitionError(f'Not a financial year: {financial_year!r} (expected e.g. 2023-24)')
+    start = int(first_month[:4])
+    return f'{start}-{(start + 1) % 100:02d}'
+
+
+def year_path(db_path, financial_year):
+    """The file a closed financial year of db_path is kept in"""
+    stem = os.path.splitext(os.path.basename(db_path))[0]
+    return os.path.join(os.path.dirname(db_path), YEARS_DIR, stem, f'{financial_year}.db')
+
+
+def archive_path(db_path, financial_year):
+    """The columnar file an archived financial year of db_path is kept in"""
+    return os.path.splitext(year_path(db_path, financial_year))[0] + ARCHIVE_SUFFIX
+
+
+def _uri(path, **params):
+    query = '&'.join(f'{key}={value}' for key, value in params.items())
+    return 'file:{}{}'.format(os.path.abspath(path).replace('?', '%3f'), f'?{query}' if query else '')
+
+
+def open_year(path):
+    """Read-only connection to a closed year file"""
+    conn = sqlite3.connect(_uri(path, immutable=1), uri=True, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def open_archived(db_path, financial_year, first_month=None, last_month=None, columns=None):
+    """In-memory connection holding the months and columns of an archived year that a read needs"""
+    conn = sqlite3.connect(':memory:', check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    try:
+        archive = columnar.open_columnar(archive_path(db_path, financial_year))
+        columnar.load_into(conn, 'main', archive, columns, first_month, last_month)
+    except Exception:
+        conn.close()
+        raise
+    return conn
+
+
+def closed_years(conn, first_month=None, last_month=None):
+    """Closed and archived years overlapping the months first_month..last_month (either may be None)"""
+    return conn.execute(
+        'SELECT * FROM partitions WHERE status <> ? AND last_month >= ? AND first_month <= ? '
+        'ORDER BY financial_year',
+        (CLOSING, first_month or '', last_month or '9999-99')
+    ).fetchall()
+
+
+def _status(conn, financial_year):
+    row = conn.execute('SELECT status FROM partitions WHERE financial_year = ?', (financial_year,)).fetchone()
+    return row[0] if row else None
+
+
+def _stored_columns(conn, schema, table):
+    """Columns that can be inserted into (generated columns are hidden 2 or 3)"""
+    return [row[1] for row in conn.execute(f'PRAGMA {schema}.table_xinfo({table})') if row[6] == 0]
+
+
+def _all_columns(conn, schema, table):
+    return [row[1] for row in conn.execute(f'PRAGMA {schema}.table_xinfo({table})')]
+
+
+def open_span(db_path, years, first_month=None, last_month=None, columns=None, profile=None):
+    """Connection to db_path with the given partitions rows ATTACHed behind TEMP views
+
+    The views are named like the tables, and TEMP objects are found
+    before main ones, so queries written for one database read every
+    year unchanged. Each year file is attached on its own; the archived
+    years are loaded together into one in-memory database by
+    open_archived's rules. SQLite attaches at most MAX_ATTACHED
+    databases, so a span of more year files raises SpanError. The hot
+    database gets the storage profile (from the environment unless one
+    is given), like a pooled connection.
+    """
+    files = [year for year in years if year['status'] != ARCHIVED]
+    archived = [year for year in years if year['status'] == ARCHIVED]
+    if len(files) + bool(archived) > MAX_ATTACHED:
+        raise SpanError(
+            f'The months span {len(files)} closed financial year files, more than can be read at once; '
+            f'ask for fewer months or archive the older years'
+        )
+    profile = profile or storage.profile_from_env()
+    conn = sqlite3.connect(_uri(db_path), uri=True, check_same_thread=False,
+                           timeout=profile['busy_timeout_ms'] / 1000)
+    conn.row_factory = sqlite3.Row
+    try:
+        # Before anything is attached: journal_mode applies to every schema
+        storage.apply_profile(conn, profile)
+        schemas = []
+        for index, year in enumerate(files):
+            schema = f'year{index}'
+            path = year_path(db_path, year['financial_year'])
+            conn.execute(f'ATTACH DATABASE ? AS {schema}', (_uri(path, immutable=1),))
+            schemas.append(schema)
+        if archived:
+            conn.execute("ATTACH DATABASE ':memory:' AS archived")
+            for year in archived:
+                archive = columnar.open_columnar(archive_path(db_path, year['financial_year']))
+                columnar.load_into(conn, 'archived', archive, columns, first_month, last_month)
+            schemas.append('archived')
+        for table in SPANNED_TABLES:
+            names = ', '.join(_all_columns(conn, 'main', table))
+            selects = [f'SELECT {names} FROM {schema}.{table}' for schema in ['main'] + schemas]
+            conn.execute(f"CREATE TEMP VIEW {table} AS {' UNION ALL '.join(selects)}")
+    except Exception:
+        conn.close()
+        raise
+    return conn
+
+
+def search_readers(conn, db_path, first_month=None, last_month=None):
+    """Connections with a search_index for each closed year overlapping the months
+
+    Year files are opened as they are. An archived year is loaded into
+    memory (just the columns a search reads) and indexed there.
+    """
+    readers = []
+    try:
+        for year in closed_years(conn, first_month, last_month):
+            if year['status'] == ARCHIVED:
+                reader = open_archived(db_path, year['financial_year'], first_month, last_month,
+                                       search.ARCHIVE_COLUMNS)
+                readers.append(reader)
+                search.index_loaded(reader)
+            else:
+                readers.append(open_year(year_path(db_path, year['financial_year'])))
+    except Exception:
+        for reader in readers:
+            reader.close()
+        raise
+    return readers
+
+
+def reader_for(conn, db_path, first_month=None, last_month=None, columns=None, profile=None):
+    """Connection to read the months first_month..last_month of db_path from
+
+    Returns conn itself when none of the months is in a closed year.
+    Otherwise conn is closed and a connection to the year file, or to
+    the hot database with the year files attached, is returned instead.
+    columns maps each table the read uses to the column names it needs
+    (None for all); archived years load just those. Without it every
+    table is loaded whole. profile is the storage profile of a span
+    connection.
+    """
+    years = closed_years(conn, first_month, last_month)
+    if not years:
+        return conn
+    conn.close()
+    year = years[0]
+    if (len(years) == 1 and first_month and last_month
+            and year['first_month'] <= first_month and last_month <= year['last_month']):
+        if year['status'] == ARCHIVED:
+            return open_archived(db_path, year['financial_year'], first_month, last_month, columns)
+        return open_year(year_path(db_path, year['financial_year']))
+    return open_span(db_path, years, first_month, last_month, columns, profile)
+
+
+def _set_read_only(path, read_only):
+    mode = os.stat(path).st_mode
+    writable = stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH
+    os.chmod(path, mode & ~writable if read_only else mode | stat.S_IWUSR)
+
+
+def _create_year_file(path):
+    """An empty, fully migrated year file, not in WAL mode"""
+    # Whatever is there is left over from an interrupted close or restore
+    for stale in (path, path + '-wal', path + '-shm', path + '-journal'):
+        if os.path.exists(stale):
+            _set_read_only(stale, False)
+            os.remove(stale)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    migrations.migrate_database(path)
+    year_conn = sqlite3.connect(path)
+    try:
+        year_conn.execute('PRAGMA journal_mode=DELETE')
+    finally:
+        year_conn.close()
+
+
+def _seal_year_file(path):
+    """Compact a filled year file and make it read-only"""
+    year_conn = sqlite3.connect(path)
+    try:
+        year_conn.execute('VACUUM')
+    finally:
+        year_conn.close()
+    _set_read_only(path, True)
+
+
+def _run(conn, statements):
+    """Run (sql, params) pairs in one write transaction"""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        results = [conn.execute(sql, params).rowcount for sql, params in statements]
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    return results
+
+
+def close_year(db_path, financial_year, today=None, vacuum=False):
+    """Move a finished financial year of db_path into its read-only year file
+
+    Returns the number of rows moved per table. Runs in three steps so a
+    crash at any point leaves every row readable: the year is marked
+    closing (which stops writes to it), the rows are copied into a new
+    year file, and then they are deleted from the hot database in the
+    same transaction that marks the year closed. Closing a year that was
+    left closing starts the copy again.
+    """
+    financial_year = financial_year_label(financial_year)
+    first_month, last_month = financial_year_months(financial_year)
+    today = today or date.today()
+    if last_month >= f'{today.year}-{today.month:02d}':
+        raise PartitionError(f'Financial year {financial_year} has not ended yet')
+
+    path = year_path(db_path, financial_year)
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    try:
+        status = _status(conn, financial_year)
+        if status not in (None, CLOSING):
+            raise PartitionError(f'Financial year {financial_year} is already {status}')
+        if status is None:
+            _run(conn, [(
+                'INSERT INTO partitions (financial_year, first_month, last_month, status) VALUES (?, ?, ?, ?)',
+                (financial_year, first_month, last_month, CLOSING)
+            )])
+
+        _create_year_file(path)
+
+        months = (first_month, last_month)
+        conn.execute('ATTACH DATABASE ? AS year', (path,))
+        try:
+            copies = []
+            for table in PARTITIONED_TABLES:
+                columns = ', '.join(_stored_columns(conn, 'main', table))
+                copies.append((
+                    f'INSERT INTO year.{table} (rowid, {columns}) '
+                    f'SELECT rowid, {columns} FROM main.{table} WHERE month BETWEEN ? AND ?',
+                    months
+                ))
+            # The year file is never synced from; only the rows matter
+            copies.append(('DELETE FROM year.change_log', ()))
+            moved = dict(zip(PARTITIONED_TABLES, _run(conn, copies)))
+        finally:
+            conn.execute('DETACH DATABASE year')
+
+        # The rows did not change, so sync clients are not told they were deleted
+        sequence = latest_sequence(conn)
+        deletes = [(f'DELETE FROM {table} WHERE month BETWEEN ? AND ?', months) for table in PARTITIONED_TABLES]
+        deleted = _run(conn, deletes + [
+            ('DELETE FROM change_log WHERE seq > ?', (sequence,)),
+            ('UPDATE partitions SET status = ?, purchases = ?, sales = ?, b2c_sales = ?, '
+             'closed_at = CURRENT_TIMESTAMP WHERE financial_year = ?',
+             (CLOSED, moved['purchases'], moved['sales'], moved['b2c_sales'], financial_year)),
+        ])
+        if deleted[:len(PARTITIONED_TABLES)] != [moved[table] for table in PARTITIONED_TABLES]:
+            # Cannot happen while the closing status blocks writes
+            raise PartitionError(f'Row counts of {financial_year} changed while it was being closed')
+
+        _seal_year_file(path)
+        if vacuum:
+            conn.execute('VACUUM')
+        return moved
+    finally:
+        conn.close()
+
+
+def reopen_year(db_path, financial_year):
+    """Move a closed financial year back into the hot database and delete its year file"""
+    financial_year = financial_year_label(financial_year)
+    path = year_path(db_path, financial_year)
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    try:
+        status = _status(conn, financial_year)
+        if status is None:
+            raise PartitionError(f'Financial year {financial_year} is not closed')
+        if status == ARCHIVED:
+            raise PartitionError(f'Financial year {financial_year} is archived; restore it first')
+        if status == CLOSING:
+            # The rows never left the hot database
+            _run(conn, [('DELETE FROM partitions WHERE financial_year = ?', (financial_year,))])
+            moved = dict.fromkeys(PARTITIONED_TABLES, 0)
+        else:
+            conn.execute('ATTACH DATABASE ? AS year', (_uri(path, mode='ro'),))
+            try:
+                sequence = latest_sequence(conn)
+                statements = [('DELETE FROM partitions WHERE financial_year = ?', (financial_year,))]
+                for table in PARTITIONED_TABLES:
+                    columns = ', '.join(_stored_columns(conn, 'main', table))
+                    statements.append((
+                        f'INSERT INTO main.{table} (rowid, {columns}) SELECT rowid, {columns} FROM year.{table}',
+                        ()
+                    ))
+                statements.append(('DELETE FROM change_log WHERE seq > ?', (sequence,)))
+                try:
+                    moved = dict(zip(PARTITIONED_TABLES, _run(conn, statements)[1:]))
+                except sqlite3.IntegrityError as e:
+                    raise PartitionError(_reopen_conflict(conn, financial_year, e)) from e
+            finally:
+                conn.execute('DETACH DATABASE year')
+
+        if os.path.exists(path):
+            _set_read_only(path, False)
+            os.remove(path)
+        return moved
+    finally:
+        conn.close()
+
+
+def _archive_table(year_conn, table):
+    """(columns, months) of a year file table for write_columnar"""
+    columns = [
+        (name, column_type, columnar.GENERATED if hidden else columnar.STORED)
+        for _cid, name, column_type, _notnull, _default, _pk, hidden
+        in year_conn.execute(f'PRAGMA table_xinfo({table})')
+    ]
+    select = ', '.join(name for name, _type, _kind in columns)
+    order = ''
+    if table in PARTITIONED_TABLES:
+        # monthly_totals is WITHOUT ROWID and rebuilt on restore anyway
+        columns.insert(0, ('rowid', 'INTEGER', columnar.ROWID))
+        select, order = f'rowid, {select}', ' ORDER BY rowid'
+    months = [row[0] for row in year_conn.execute(f'SELECT DISTINCT month FROM {table} ORDER BY month')]
+    rows = (
+        (month, year_conn.execute(f'SELECT {select} FROM {table} WHERE month = ?{order}', (month,)))
+        for month in months
+    )
+    return columns, rows
+
+
+def _reopen_conflict(conn, financial_year, error):
+    """Why the rows of the attached year do not fit back into the hot database"""
+    for table, key in NATURAL_KEYS.items():
+        match = ' AND '.join(f'h.{name} = y.{name}' for name in key)
+        numbers = [row[0] for row in conn.execute(
+            f"SELECT y.invoice_number FROM year.{table} AS y JOIN main.{table} AS h ON {match} "
+            f"WHERE y.invoice_number <> '' ORDER BY y.invoice_number LIMIT 11"
+        )]
+        if numbers:
+            listed = ', '.join(numbers[:10]) + (', ...' if len(numbers) > 10 else '')
+            return (f'Financial year {financial_year} cannot be reopened: the open years already hold '
+                    f'{table} with the same invoices ({listed}); delete or correct those first')
+    return f'Financial year {financial_year} cannot be reopened: {error}'
+
+
+def archive_year(db_path, financial_year):
+    """Replace the year file of a closed financial year with a columnar archive
+
+    Returns the sizes of the year file and of the archive in bytes. The
+    archive is written and checked before the year is marked archived,
+    and the year file is only deleted after that.
+    """
+    financial_year = financial_year_label(financial_year)
+    path = year_path(db_path, financial_year)
+    target = archive_path(db_path, financial_year)
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    try:
+        status = _status(conn, financial_year)
+        if status != CLOSED:
+            raise PartitionError(f'Financial year {financial_year} is {status or "open"}, not closed')
+
+        year_conn = open_year(path)
+        try:
+            tables = {table: _archive_table(year_conn, table) for table in SPANNED_TABLES}
+            # A view of an earlier archive would keep the old file mapped
+            columnar.forget(target)
+            size = columnar.write_columnar(target, tables, meta={'financialYear': financial_year})
+            archive = columnar.open_columnar(target)
+            for table in SPANNED_TABLES:
+                expected = year_conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                if archive.row_count(table) != expected:
+                    raise PartitionError(f'Archive of {financial_year} is missing rows of {table}')
+        finally:
+            year_conn.close()
+
+        _run(conn, [('UPDATE partitions SET status = ? WHERE financial_year = ?', (ARCHIVED, financial_year))])
+        database_size = os.path.getsize(path)
+        # Windows refuses to delete a read-only file
+        _set_read_only(path, False)
+        os.remove(path)
+        return {'database': database_size, 'archive': size}
+    finally:
+        conn.close()
+
+
+def restore_year(db_path, financial_year):
+    """Turn the archive of a financial year back into its read-only year file"""
+    financial_year = financial_year_label(financial_year)
+    path = year_path(db_path, financial_year)
+    target = archive_path(db_path, financial_year)
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    try:
+        status = _status(conn, financial_year)
+        if status != ARCHIVED:
+            raise PartitionError(f'Financial year {financial_year} is not archived')
+
+        archive = columnar.open_columnar(target)
+        _create_year_file(path)
+        moved = {}
+        year_conn = sqlite3.connect(path, isolation_level=None)
+        try:
+            year_conn.execute('BEGIN IMMEDIATE')
+            try:
+                for table in PARTITIONED_TABLES:
+                    # Generated columns and the rollup are recomputed by SQLite
+                    names = [name for name, _type, kind in archive.columns(table) if kind != columnar.GENERATED]
+                    year_conn.executemany(
+                        f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+                        archive.scan(table, names)
+                    )
+                    moved[table] = archive.row_count(table)
+                year_conn.execute('DELETE FROM change_log')
+                year_conn.execute('COMMIT')
+            except Exception:
+                year_conn.execute('ROLLBACK')
+                raise
+        finally:
+            year_conn.close()
+        _seal_year_file(path)
+
+        _run(conn, [('UPDATE partitions SET status = ? WHERE financial_year = ?', (CLOSED, financial_year))])
+        # Windows refuses to delete a mapped file: drop the shared view
+        # and this one, so the map is closed once no read is using it
+        columnar.forget(target)
+        del archive
+        os.remove(target)
+        return moved
+    finally:
+        conn.close()
+
+
+def list_years(db_path):
+    """Rows of the partitions table of db_path"""
+    conn = sqlite3.connect(_uri(db_path, mode='ro'), uri=True)
+    conn.row_factory = sqlite3.Row
+    try:
+        return conn.execute('SELECT * FROM partitions ORDER BY financial_year').fetchall()
+    finally:
+        conn.close()
+
+
+def main():
+    """close, reopen, archive, restore or list the financial years of client databases"""
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    commands = ('close', 'reopen', 'archive', 'restore', 'list')
+    if not args or args[0] not in commands or (args[0] != 'list' and len(args) != 3):
+        print('Usage: python partitions.py close|reopen|archive|restore database financial-year [--vacuum]')
+        print('       python partitions.py list [database ...]')
+        sys.exit(2)
+
+    command = args[0]
+    if command == 'list':
+        db_files = args[1:] or sorted(glob.glob(os.path.join('client_databases', '*.db')))
+        for db_path in db_files:
+            name = os.path.basename(db_path)
+            years = list_years(db_path)
+            if not years:
+                print(f"  {name}: no closed years")
+            for year in years:
+                print(f"  {name} {year['financial_year']} {year['status']}: {year['purchases']} purchases, "
+                      f"{year['sales']} sales, {year['b2c_sales']} B2C sales")
+        return
+
+    db_path, financial_year = args[1], args[2]
+    name = os.path.basename(db_path)
+    try:
+        if command == 'close':
+            moved = close_year(db_path, financial_year, vacuum='--vacuum' in sys.argv)
+            print(f"✓ Closed {financial_year} of {name} into {year_path(db_path, financial_year_label(financial_year))}")
+        elif command == 'reopen':
+            moved = reopen_year(db_path, financial_year)
+            print(f"✓ Reopened {financial_year} of {name}")
+        elif command == 'archive':
+            sizes = archive_year(db_path, financial_year)
+            print(f"✓ Archived {financial_year} of {name}: {sizes['database'] / 1e6:.1f} MB year file "
+                  f"-> {sizes['archive'] / 1e6:.1f} MB archive")
+            return
+        else:
+            moved = restore_year(db_path, financial_year)
+            print(f"✓ Restored {financial_year} of {name}")
+    except PartitionError as e:
+        print(f"✗ {name}: {e}")
+        sys.exit(1)
+    print(f"  {moved['purchases']} purchases, {moved['sales']} sales, {moved['b2c_sales']} B2C sales")
+
+
+if __name__ == '__main__':
+    main()
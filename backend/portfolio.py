@@ -0,0 +1,156 @@
+"""
+Monthly figures across every client database.
+
+The portfolio summary opens each database in client_databases/ on a
+bounded thread pool, reads the month from the monthly_totals rollup and
+yields each client's result as soon as it is ready. Results are cached
+per database and month together with the file signature (mtime and size
+of the database and its WAL), so repeated requests only rescan the
+databases that changed since.
+"""
+
+import glob
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from ledger import file_signature
+from partitions import reader_for
+from rollups import month_summary
+
+TAX_KEYS = ('integratedTax', 'centralTax', 'stateTax', 'cess')
+
+
+def read_client_month(db_path, month):
+    """Sales, purchases, ITC and liability of one database for a month"""
+    # Short-lived read-only connection, so a scan over hundreds of files
+    # does not push the working set out of the shared pool
+    uri = 'file:{}?mode=ro'.format(os.path.abspath(db_path).replace('?', '%3f'))
+    conn = sqlite3.connect(uri, uri=True, timeout=5)
+    conn.row_factory = sqlite3.Row
+    try:
+        # A month of a closed financial year is read from its year file
+        conn = reader_for(conn, db_path, month, month, {'monthly_totals': None})
+        summary = month_summary(conn, month)
+    finally:
+        conn.close()
+
+    liability = sum(summary['liability'].values())
+    itc = sum(summary['itc'].values())
+    return {
+        'sales': {
+            'invoices': summary['sales']['invoices'] + summary['b2cSales']['invoices'],
+            'taxableValue': round(summary['sales']['taxableValue'] + summary['b2cSales']['taxableValue'], 2),
+        },
+        'purchases': {
+            'invoices': summary['purchases']['invoices'],
+            'taxableValue': summary['purchases']['taxableValue'],
+        },
+        'itc': summary['itc'],
+        'liability': summary['liability'],
+        'netPayable': round(max(liability - itc, 0.0), 2),
+    }
+
+
+class PortfolioCache:
+    """Per-database results keyed by (db_path, month), checked against the file signature"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, db_path, month, signature):
+        with self._lock:
+            entry = self._entries.get((db_path, month))
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+        return None
+
+    def put(self, db_path, month, signature, result):
+        with self._lock:
+            self._entries[(db_path, month)] = (signature, result)
+
+    def discard_missing(self, db_paths):
+        """Forget databases that no longer exist"""
+        keep = set(db_paths)
+        with self._lock:
+            for key in [key for key in self._entries if key[0] not in keep]:
+                del self._entries[key]
+
+
+def iter_portfolio(db_dir, month, clients, cache, max_workers=8):
+    """Yield one event per client database as it completes, then a 'done' event
+
+    clients maps a database path to its client record (or is missing
+    databases that have no client row).
+    """
+    started = time.monotonic()
+    db_paths = sorted(glob.glob(os.path.join(db_dir, '*.db')))
+    cache.discard_missing(db_paths)
+
+    def scan(db_path):
+        signature = file_signature(db_path)
+        cached = cache.get(db_path, month, signature)
+        if cached is not None:
+            return cached, True
+        result = read_client_month(db_path, month)
+        cache.put(db_path, month, signature, result)
+        return result, False
+
+    totals = {
+        'salesTaxableValue': 0.0,
+        'purchasesTaxableValue': 0.0,
+        'itc': dict.fromkeys(TAX_KEYS, 0.0),
+        'liability': dict.fromkeys(TAX_KEYS, 0.0),
+        'netPayable': 0.0,
+    }
+    scanned = cached_count = failed = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='portfolio') as executor:
+        futures = {executor.submit(scan, db_path): db_path for db_path in db_paths}
+        for future in as_completed(futures):
+            db_path = futures[future]
+            client = clients.get(os.path.normpath(db_path))
+            event = {
+                'event': 'client',
+                'clientId': client['id'] if client else None,
+                'clientName': client['client_name'] if client else None,
+                'database': os.path.basename(db_path),
+            }
+            try:
+                result, from_cache = future.result()
+            except Exception as e:
+                failed += 1
+                event['error'] = str(e)
+                yield event
+                continue
+
+            scanned += 1
+            cached_count += from_cache
+            totals['salesTaxableValue'] += result['sales']['taxableValue']
+            totals['purchasesTaxableValue'] += result['purchases']['taxableValue']
+            totals['netPayable'] += result['netPayable']
+            for key in TAX_KEYS:
+                totals['itc'][key] += result['itc'][key]
+                totals['liability'][key] += result['liability'][key]
+            event.update(result)
+            event['cached'] = from_cache
+            yield event
+
+    yield {
+        'event': 'done',
+        'month': month,
+        'clients': scanned,
+        'cached': cached_count,
+        'failed': failed,
+        'seconds': round(time.monotonic() - started, 4),
+        'totals': {
+            'salesTaxableValue': round(totals['salesTaxableValue'], 2),
+            'purchasesTaxableValue': round(totals['purchasesTaxableValue'], 2),
+            'itc': {key: round(value, 2) for key, value in totals['itc'].items()},
+            'liability': {key: round(value, 2) for key, value in totals['liability'].items()},
+            'netPayable': round(totals['netPayable'], 2),
+        },
+    }
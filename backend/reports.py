@@ -0,0 +1,338 @@
+"""
+Return summaries computed in SQLite.
+
+The report pages used to download every sales row for a month and add
+them up in the browser. These functions run the aggregation as GROUP BY
+queries over the client tables and return only the totals. Amounts are
+summed as integer paise and converted to rupees once, at the end.
+"""
+
+import json
+
+from columnar import referenced_names
+from money import to_rupees
+from normalized import rate_from_basis_points
+
+AMOUNT_FIELDS = ('taxableValue', 'integratedTax', 'centralTax', 'stateTax', 'cess')
+
+
+def _zero_totals():
+    return {field: 0 for field in AMOUNT_FIELDS}
+
+
+def _add(totals, row):
+    for field in AMOUNT_FIELDS:
+        totals[field] += row[field] or 0
+
+
+def _rupees(totals):
+    return {field: to_rupees(value) for field, value in totals.items()}
+
+
+# Sales and B2C sales grouped into the buckets GSTR-3B needs. B2C sales
+# carry no cess or invoice type, so they contribute zeros there.
+OUTWARD_GROUPS_SQL = '''
+    SELECT source, transaction_type, zero_rated, rate_zero, positive,
+           COUNT(*) AS invoices,
+           SUM(taxable_value) AS taxableValue,
+           SUM(integrated_tax) AS integratedTax,
+           SUM(central_tax) AS centralTax,
+           SUM(state_tax) AS stateTax,
+           SUM(cess) AS cess,
+           SUM(invoice_value) AS invoiceValue
+    FROM (
+        SELECT 'sales' AS source,
+               COALESCE(transaction_type, 'B2B') AS transaction_type,
+               (LOWER(invoice_type) LIKE '%sez%' OR LOWER(invoice_type) LIKE '%export%') AS zero_rated,
+               (tax_rate_bp = 0) AS rate_zero,
+               (taxable_value > 0) AS positive,
+               taxable_value, integrated_tax, central_tax, state_tax, cess, invoice_value
+        FROM sales WHERE month = ?
+        UNION ALL
+        SELECT 'b2c_sales', 'B2C', 0,
+               (gst_rate_bp = 0),
+               (taxable_value > 0),
+               taxable_value, integrated_tax, central_tax, state_tax, 0, invoice_value
+        FROM b2c_sales WHERE month = ?
+    )
+    GROUP BY source, transaction_type, zero_rated, rate_zero, positive
+'''
+
+# Inter-state supplies to unregistered persons by place of supply (table 3.2)
+UNREGISTERED_INTER_STATE_SQL = '''
+    SELECT place_of_supply AS placeOfSupply,
+           SUM(taxable_value) AS taxableValue,
+           SUM(integrated_tax) AS integratedTax
+    FROM (
+        SELECT place_of_supply, taxable_value, integrated_tax
+        FROM b2c_sales WHERE month = ? AND supply_type = 'inter'
+        UNION ALL
+        SELECT place_of_supply, taxable_value, integrated_tax
+        FROM sales WHERE month = ? AND transaction_type = 'B2C' AND integrated_tax > 0
+    )
+    GROUP BY place_of_supply
+    ORDER BY place_of_supply
+'''
+
+INWARD_GROUPS_SQL = '''
+    SELECT (reverse_charge = 'Yes') AS reverse_charge,
+           (itc_available = 'Yes') AS eligible,
+           COUNT(*) AS invoices,
+           SUM(taxable_value) AS taxableValue,
+           SUM(integrated_tax) AS integratedTax,
+           SUM(central_tax) AS centralTax,
+           SUM(state_tax) AS stateTax,
+           SUM(cess) AS cess
+    FROM purchases WHERE month = ?
+    GROUP BY 1, 2
+'''
+
+# What gstr3b_summary reads of each table, for column-pruned reads of archived years
+GSTR3B_COLUMNS = dict.fromkeys(
+    ('purchases', 'sales', 'b2c_sales'),
+    referenced_names(OUTWARD_GROUPS_SQL, UNREGISTERED_INTER_STATE_SQL, INWARD_GROUPS_SQL)
+)
+
+
+def gstr3b_summary(conn, month):
+    """GSTR-3B tables 3.1, 3.2 and 4 for one month, plus the 3B page totals"""
+    outward = {
+        'taxable': _zero_totals(),      # 3.1(a)
+        'zeroRated': _zero_totals(),    # 3.1(b)
+        'nilExempt': _zero_totals(),    # 3.1(c)
+        'reverseCharge': _zero_totals(),  # 3.1(d)
+        'nonGst': _zero_totals(),       # 3.1(e)
+    }
+    summary = {
+        'totalInvoices': 0,
+        'totalTaxableValue': 0,
+        'totalCGST': 0,
+        'totalSGST': 0,
+        'totalIGST': 0,
+        'totalCess': 0,
+        'totalInvoiceValue': 0,
+        'b2bSales': 0,
+        'b2cSales': 0,
+        'exportSales': 0,
+        'exemptSales': 0,
+        'nilRatedSales': 0,
+        'nonGSTSales': 0,
+    }
+
+    for row in conn.execute(OUTWARD_GROUPS_SQL, (month, month)):
+        taxable_value = row['taxableValue'] or 0
+        summary['totalInvoices'] += row['invoices']
+        summary['totalTaxableValue'] += taxable_value
+        summary['totalCGST'] += row['centralTax'] or 0
+        summary['totalSGST'] += row['stateTax'] or 0
+        summary['totalIGST'] += row['integratedTax'] or 0
+        summary['totalCess'] += row['cess'] or 0
+        summary['totalInvoiceValue'] += row['invoiceValue'] or 0
+
+        if row['transaction_type'] == 'B2B':
+            summary['b2bSales'] += taxable_value
+        elif row['transaction_type'] == 'B2C':
+            summary['b2cSales'] += taxable_value
+
+        if row['zero_rated']:
+            summary['exportSales'] += taxable_value
+            _add(outward['zeroRated'], row)
+        elif row['rate_zero']:
+            _add(outward['nilExempt'], row)
+        else:
+            _add(outward['taxable'], row)
+
+        if row['rate_zero'] and not row['zero_rated']:
+            if row['positive']:
+                summary['nilRatedSales'] += taxable_value
+            else:
+                summary['exemptSales'] += taxable_value
+
+    itc = {
+        'reverseCharge': _zero_totals(),  # 4(A)(3)
+        'allOther': _zero_totals(),       # 4(A)(5)
+        'ineligible': _zero_totals(),     # 4(D)(2)
+    }
+    for row in conn.execute(INWARD_GROUPS_SQL, (month,)):
+        if row['reverse_charge']:
+            _add(outward['reverseCharge'], row)
+        if not row['eligible']:
+            _add(itc['ineligible'], row)
+        elif row['reverse_charge']:
+            _add(itc['reverseCharge'], row)
+        else:
+            _add(itc['allOther'], row)
+
+    available = _zero_totals()
+    _add(available, itc['reverseCharge'])
+    _add(available, itc['allOther'])
+
+    unregistered = [
+        {
+            'placeOfSupply': row['placeOfSupply'],
+            'taxableValue': to_rupees(row['taxableValue'] or 0),
+            'integratedTax': to_rupees(row['integratedTax'] or 0),
+        }
+        for row in conn.execute(UNREGISTERED_INTER_STATE_SQL, (month, month))
+    ]
+
+    return {
+        'month': month,
+        'summary': {
+            key: value if key == 'totalInvoices' else to_rupees(value)
+            for key, value in summary.items()
+        },
+        'section3_1': {name: _rupees(totals) for name, totals in outward.items()},
+        'section3_2': {'unregistered': unregistered},
+        'section4': {
+            'available': {
+                'reverseCharge': _rupees(itc['reverseCharge']),
+                'allOther': _rupees(itc['allOther']),
+                'total': _rupees(available),
+            },
+            'reversed': _rupees(_zero_totals()),
+            'net': _rupees(available),
+            'ineligible': _rupees(itc['ineligible']),
+        },
+    }
+
+
+# Sales and B2C sales grouped by HSN code (and optionally GST rate).
+# {rate} is replaced by the rate expression or a constant when the
+# per-rate split is not wanted.
+HSN_GROUPS_SQL = '''
+    SELECT hsn_code AS hsnCode, {rate} AS gstRate,
+           COUNT(*) AS invoices,
+           TOTAL(quantity) AS quantity,
+           SUM(taxable_value) AS taxableValue,
+           SUM(integrated_tax) AS integratedTax,
+           SUM(central_tax) AS centralTax,
+           SUM(state_tax) AS stateTax,
+           SUM(cess) AS cess,
+           SUM(invoice_value) AS invoiceValue
+    FROM (
+        {sources}
+    )
+    GROUP BY 1, 2
+    ORDER BY 1, 2
+'''
+
+HSN_SOURCES_SQL = {
+    'sales': '''
+        SELECT COALESCE(NULLIF(TRIM(hsn_code), ''), 'Not Specified') AS hsn_code,
+               tax_rate_bp AS rate, quantity, taxable_value,
+               integrated_tax, central_tax, state_tax, cess, invoice_value
+        FROM sales WHERE month BETWEEN ? AND ? AND transaction_type = 'B2B'
+    ''',
+    'b2c': '''
+        SELECT COALESCE(NULLIF(TRIM(hsn_code), ''), 'Not Specified'),
+               gst_rate_bp, quantity, taxable_value,
+               integrated_tax, central_tax, state_tax, 0, invoice_value
+        FROM b2c_sales WHERE month BETWEEN ? AND ?
+    ''',
+}
+
+# Purchases or sales per GST rate over an invoice date range, on the
+# generated tax_rate_bp and invoice_day columns (see normalized.py)
+RATE_SUMMARY_SQL = '''
+    SELECT tax_rate_bp AS rate,
+           COUNT(*) AS invoices,
+           SUM(taxable_value) AS taxableValue,
+           SUM(integrated_tax) AS integratedTax,
+           SUM(central_tax) AS centralTax,
+           SUM(state_tax) AS stateTax,
+           SUM(cess) AS cess,
+           SUM(invoice_value) AS invoiceValue
+    FROM {table} WHERE invoice_day BETWEEN ? AND ?
+    GROUP BY tax_rate_bp
+    ORDER BY tax_rate_bp
+'''
+
+RATE_SUMMARY_TABLES = ('purchases', 'sales')
+
+HSN_AMOUNT_FIELDS = ('quantity', 'taxableValue', 'integratedTax', 'centralTax',
+                     'stateTax', 'cess', 'invoiceValue')
+
+
+def financial_year_months(financial_year):
+    """First and last month of a financial year given as 2024-25 or 2024"""
+    start = int(str(financial_year).split('-')[0])
+    return f'{start}-04', f'{start + 1}-03'
+
+
+def _hsn_groups(conn, first_month, last_month, sources, by_rate):
+    rate = 'rate' if by_rate else 'NULL'
+    sql = HSN_GROUPS_SQL.format(
+        rate=rate,
+        sources=' UNION ALL '.join(HSN_SOURCES_SQL[source] for source in sources),
+    )
+    params = [first_month, last_month] * len(sources)
+    return conn.execute(sql, params)
+
+
+def _hsn_item(row, by_rate):
+    item = {'hsnCode': row['hsnCode']}
+    if by_rate:
+        item['gstRate'] = rate_from_basis_points(row['gstRate'])
+    item['invoices'] = row['invoices']
+    item['quantity'] = round(row['quantity'], 2)
+    for field in HSN_AMOUNT_FIELDS[1:]:
+        item[field] = to_rupees(row[field])
+    return item
+
+
+def rate_summary(conn, table, first_date, last_date):
+    """Totals per GST rate for invoices dated first_date to last_date (inclusive)"""
+    fields = ('invoices',) + AMOUNT_FIELDS + ('invoiceValue',)
+    totals = dict.fromkeys(fields, 0)
+    rates = []
+    params = (first_date.toordinal(), last_date.toordinal())
+    for row in conn.execute(RATE_SUMMARY_SQL.format(table=table), params):
+        item = {'taxRate': rate_from_basis_points(row['rate']), 'invoices': row['invoices']}
+        for field in fields[1:]:
+            item[field] = to_rupees(row[field])
+        for field in fields:
+            totals[field] += row[field]
+        rates.append(item)
+    return {
+        'table': table,
+        'from': first_date.isoformat(),
+        'to': last_date.isoformat(),
+        'rates': rates,
+        'totals': {field: value if field == 'invoices' else to_rupees(value) for field, value in totals.items()},
+    }
+
+
+def iter_hsn_summary(conn, first_month, last_month, sources=('sales', 'b2c'), by_rate=True):
+    """Yield one grouped HSN row at a time for the months in [first_month, last_month]"""
+    for row in _hsn_groups(conn, first_month, last_month, sources, by_rate):
+        yield _hsn_item(row, by_rate)
+
+
+def iter_hsn_summary_json(conn, first_month, last_month, sources=('sales', 'b2c'), by_rate=True):
+    """Encode the HSN summary as one JSON document, a row at a time
+
+    Only the current row and the running totals are held in memory, so a
+    full financial year streams in constant space.
+    """
+    totals = dict.fromkeys(HSN_AMOUNT_FIELDS, 0)
+    totals['quantity'] = 0.0
+    totals['invoices'] = 0
+    codes = 0
+    header = {'from': first_month, 'to': last_month, 'sources': list(sources), 'byRate': by_rate}
+    yield json.dumps(header)[:-1] + ', "items": ['
+
+    separator = ''
+    for row in _hsn_groups(conn, first_month, last_month, sources, by_rate):
+        codes += 1
+        for field in ('invoices',) + HSN_AMOUNT_FIELDS:
+            totals[field] += row[field]
+        yield separator + json.dumps(_hsn_item(row, by_rate))
+        separator = ', '
+
+    totals = {
+        key: value if key == 'invoices' else round(value, 2) if key == 'quantity' else to_rupees(value)
+        for key, value in totals.items()
+    }
+    totals['rows'] = codes
+    yield '], "totals": ' + json.dumps(totals) + '}'
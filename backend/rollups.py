@@ -0,0 +1,317 @@
+"""
+Monthly rollups of purchases, sales and B2C sales.
+
+monthly_totals holds one row per (source table, month, transaction type,
+tax rate in basis points, ITC eligibility) with the invoice count and amount sums (in
+integer paise, so adding and subtracting rows never drifts). Triggers
+on the three source tables keep it up to date inside the same
+transaction as every insert, update and delete, so monthly totals, ITC
+and liability are read with a primary-key lookup instead of scanning
+the month's rows. Bulk imports suspend the triggers and apply each
+chunk with apply_rows instead.
+
+If the rollup ever disagrees with the raw rows it can be checked and
+rebuilt from the command line:
+
+    python rollups.py verify [client_databases/name.db ...]
+    python rollups.py rebuild [client_databases/name.db ...]
+"""
+
+import glob
+import os
+import sqlite3
+import sys
+
+from money import to_rupees
+from normalized import rate_bp_sql, rate_from_basis_points
+
+AMOUNT_COLUMNS = ('taxable_value', 'integrated_tax', 'central_tax', 'state_tax', 'cess', 'invoice_value')
+
+AMOUNT_KEYS = {
+    'taxable_value': 'taxableValue',
+    'integrated_tax': 'integratedTax',
+    'central_tax': 'centralTax',
+    'state_tax': 'stateTax',
+    'cess': 'cess',
+    'invoice_value': 'invoiceValue',
+}
+
+KEY_COLUMNS = ('source', 'month', 'transaction_type', 'tax_rate_bp', 'itc_eligible')
+
+# How each source row maps onto the rollup key and amounts. '{p}' is the
+# row prefix: NEW. / OLD. inside triggers, nothing in plain queries. The
+# rate is computed from the raw column the same way as the generated
+# tax_rate_bp, which a later migration than monthly_totals adds.
+ROLLUP_SOURCES = {
+    'purchases': {
+        'transaction_type': "CASE WHEN {p}reverse_charge = 'Yes' THEN 'RCM' ELSE 'REGULAR' END",
+        'tax_rate_bp': rate_bp_sql('{p}tax_rate'),
+        'itc_eligible': "({p}itc_available = 'Yes')",
+        'amounts': {column: '{p}' + column for column in AMOUNT_COLUMNS},
+    },
+    'sales': {
+        'transaction_type': "COALESCE({p}transaction_type, 'B2B')",
+        'tax_rate_bp': rate_bp_sql('{p}tax_rate'),
+        'itc_eligible': '0',
+        'amounts': {column: '{p}' + column for column in AMOUNT_COLUMNS},
+    },
+    'b2c_sales': {
+        'transaction_type': "'B2C'",
+        'tax_rate_bp': rate_bp_sql('{p}gst_rate'),
+        'itc_eligible': '0',
+        'amounts': dict({column: '{p}' + column for column in AMOUNT_COLUMNS}, cess='0'),
+    },
+}
+
+
+def _key_exprs(source, prefix):
+    spec = ROLLUP_SOURCES[source]
+    return [
+        f"'{source}'",
+        f'{prefix}month',
+        spec['transaction_type'].format(p=prefix),
+        spec['tax_rate_bp'].format(p=prefix),
+        spec['itc_eligible'].format(p=prefix),
+    ]
+
+
+def _amount_exprs(source, prefix):
+    amounts = ROLLUP_SOURCES[source]['amounts']
+    return [amounts[column].format(p=prefix) for column in AMOUNT_COLUMNS]
+
+
+def _add_sql(source, prefix):
+    """Upsert that adds one source row to its rollup row"""
+    values = _key_exprs(source, prefix) + ['1'] + _amount_exprs(source, prefix)
+    updates = ', '.join(
+        f'{column} = {column} + excluded.{column}'
+        for column in ('invoice_count',) + AMOUNT_COLUMNS
+    )
+    return (
+        f"INSERT INTO monthly_totals ({', '.join(KEY_COLUMNS)}, invoice_count, {', '.join(AMOUNT_COLUMNS)}) "
+        f"VALUES ({', '.join(values)}) "
+        f"ON CONFLICT ({', '.join(KEY_COLUMNS)}) DO UPDATE SET {updates};"
+    )
+
+
+def _subtract_sql(source, prefix):
+    """Remove one source row from its rollup row, dropping rows that reach zero"""
+    match = ' AND '.join(
+        f'{column} = {expr}' for column, expr in zip(KEY_COLUMNS, _key_exprs(source, prefix))
+    )
+    updates = ', '.join(
+        f'{column} = {column} - {expr}'
+        for column, expr in zip(AMOUNT_COLUMNS, _amount_exprs(source, prefix))
+    )
+    return (
+        f'UPDATE monthly_totals SET invoice_count = invoice_count - 1, {updates} WHERE {match}; '
+        f'DELETE FROM monthly_totals WHERE {match} AND invoice_count <= 0;'
+    )
+
+
+def apply_rows(conn, source, rows_sql, params=(), old=None, new=None):
+    """Set-based counterpart of the triggers, for writes that suspend them
+
+    rows_sql is the FROM ... WHERE clause selecting the written rows; old
+    and new are the prefixes of their old and new values in it, as OLD.
+    and NEW. are in the triggers (see bulk_import.py).
+    """
+    columns = f"{', '.join(KEY_COLUMNS)}, invoice_count, {', '.join(AMOUNT_COLUMNS)}"
+    updates = ', '.join(
+        f'{column} = {column} + excluded.{column}'
+        for column in ('invoice_count',) + AMOUNT_COLUMNS
+    )
+    for prefix, sign in ((old, -1), (new, 1)):
+        if prefix is None:
+            continue
+        keys = _key_exprs(source, prefix)
+        amounts = ', '.join(f'{sign} * SUM({expr})' for expr in _amount_exprs(source, prefix))
+        conn.execute(
+            f"INSERT INTO monthly_totals ({columns}) "
+            f"SELECT {', '.join(keys)}, {sign} * COUNT(*), {amounts} {rows_sql} "
+            f"GROUP BY {', '.join(str(index) for index in range(2, len(keys) + 1))} "
+            f"ON CONFLICT ({', '.join(KEY_COLUMNS)}) DO UPDATE SET {updates}",
+            params
+        )
+    if old is not None:
+        conn.execute('DELETE FROM monthly_totals WHERE source = ? AND invoice_count <= 0', (source,))
+
+
+def create_triggers(conn):
+    """(Re)create the triggers that maintain monthly_totals"""
+    for source in ROLLUP_SOURCES:
+        for event in ('insert', 'update', 'delete'):
+            conn.execute(f'DROP TRIGGER IF EXISTS trg_{source}_rollup_{event}')
+        conn.execute(
+            f'CREATE TRIGGER trg_{source}_rollup_insert AFTER INSERT ON {source} '
+            f'BEGIN {_add_sql(source, "NEW.")} END'
+        )
+        conn.execute(
+            f'CREATE TRIGGER trg_{source}_rollup_update AFTER UPDATE ON {source} '
+            f'BEGIN {_subtract_sql(source, "OLD.")} {_add_sql(source, "NEW.")} END'
+        )
+        conn.execute(
+            f'CREATE TRIGGER trg_{source}_rollup_delete AFTER DELETE ON {source} '
+            f'BEGIN {_subtract_sql(source, "OLD.")} END'
+        )
+
+
+def create_rollups(conn):
+    """Create monthly_totals with its triggers and fill it from the raw rows"""
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS monthly_totals (
+            source TEXT NOT NULL,
+            month TEXT NOT NULL,
+            transaction_type TEXT NOT NULL,
+            tax_rate_bp INTEGER NOT NULL,
+            itc_eligible INTEGER NOT NULL,
+            invoice_count INTEGER NOT NULL DEFAULT 0,
+            {', '.join(f'{column} INTEGER NOT NULL DEFAULT 0' for column in AMOUNT_COLUMNS)},
+            PRIMARY KEY ({', '.join(KEY_COLUMNS)})
+        ) WITHOUT ROWID
+    ''')
+    create_triggers(conn)
+    _fill(conn)
+
+
+def _computed_sql(source):
+    keys = _key_exprs(source, '')
+    amounts = _amount_exprs(source, '')
+    return (
+        f"SELECT {', '.join(f'{expr} AS {column}' for column, expr in zip(KEY_COLUMNS, keys))}, "
+        f"COUNT(*) AS invoice_count, "
+        f"{', '.join(f'SUM({expr}) AS {column}' for column, expr in zip(AMOUNT_COLUMNS, amounts))} "
+        f"FROM {source} GROUP BY {', '.join(KEY_COLUMNS[1:])}"
+    )
+
+
+def _fill(conn):
+    for source in ROLLUP_SOURCES:
+        conn.execute(
+            f"INSERT INTO monthly_totals ({', '.join(KEY_COLUMNS)}, invoice_count, {', '.join(AMOUNT_COLUMNS)}) "
+            + _computed_sql(source)
+        )
+
+
+def rebuild(conn):
+    """Recompute monthly_totals from the raw rows in one transaction"""
+    with conn:
+        conn.execute('DELETE FROM monthly_totals')
+        _fill(conn)
+
+
+def verify(conn):
+    """Compare monthly_totals with the raw rows; returns a list of drifted keys"""
+    materialized = {}
+    for row in conn.execute('SELECT * FROM monthly_totals'):
+        row = tuple(row)
+        materialized[row[:len(KEY_COLUMNS)]] = row[len(KEY_COLUMNS):]
+
+    drift = []
+    for source in ROLLUP_SOURCES:
+        for row in conn.execute(_computed_sql(source)):
+            row = tuple(row)
+            key, expected = row[:len(KEY_COLUMNS)], row[len(KEY_COLUMNS):]
+            actual = materialized.pop(key, None)
+            if actual != expected:
+                drift.append({'key': key, 'expected': expected, 'actual': actual})
+    for key, actual in materialized.items():
+        drift.append({'key': key, 'expected': None, 'actual': actual})
+    return drift
+
+
+def _zero_amounts():
+    return {key: 0 for key in AMOUNT_KEYS.values()}
+
+
+def _rupees(amounts):
+    return {key: value if key == 'invoices' else to_rupees(value) for key, value in amounts.items()}
+
+
+def month_summary(conn, month):
+    """Totals, ITC and liability for one month from monthly_totals"""
+    totals = {source: dict(_zero_amounts(), invoices=0) for source in ROLLUP_SOURCES}
+    itc = _zero_amounts()
+    liability = _zero_amounts()
+    by_rate = []
+
+    rows = conn.execute(
+        'SELECT * FROM monthly_totals WHERE source IN (?, ?, ?) AND month = ? '
+        'ORDER BY source, transaction_type, tax_rate_bp',
+        tuple(ROLLUP_SOURCES) + (month,)
+    )
+    for row in rows:
+        amounts = {AMOUNT_KEYS[column]: row[column] for column in AMOUNT_COLUMNS}
+        source_totals = totals[row['source']]
+        source_totals['invoices'] += row['invoice_count']
+        for key, value in amounts.items():
+            source_totals[key] += value
+
+        if row['source'] == 'purchases':
+            if row['itc_eligible']:
+                for key, value in amounts.items():
+                    itc[key] += value
+            # Tax on reverse-charge purchases is payable by the recipient
+            if row['transaction_type'] == 'RCM':
+                for key, value in amounts.items():
+                    liability[key] += value
+        else:
+            for key, value in amounts.items():
+                liability[key] += value
+
+        by_rate.append(dict(
+            source=row['source'],
+            transactionType=row['transaction_type'],
+            taxRate=rate_from_basis_points(row['tax_rate_bp']),
+            itcEligible=bool(row['itc_eligible']),
+            invoices=row['invoice_count'],
+            **_rupees(amounts)
+        ))
+
+    tax_keys = ('integratedTax', 'centralTax', 'stateTax', 'cess')
+    return {
+        'month': month,
+        'purchases': _rupees(totals['purchases']),
+        'sales': _rupees(totals['sales']),
+        'b2cSales': _rupees(totals['b2c_sales']),
+        'itc': {key: to_rupees(itc[key]) for key in tax_keys},
+        'liability': {key: to_rupees(liability[key]) for key in tax_keys},
+        'byRate': by_rate,
+    }
+
+
+def main():
+    """verify or rebuild the rollups of the given (or all) client databases"""
+    if len(sys.argv) < 2 or sys.argv[1] not in ('verify', 'rebuild'):
+        print('Usage: python rollups.py verify|rebuild [database ...]')
+        sys.exit(2)
+
+    command = sys.argv[1]
+    db_files = sys.argv[2:] or sorted(glob.glob(os.path.join('client_databases', '*.db')))
+    drifted = 0
+    for db_path in db_files:
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            name = os.path.basename(db_path)
+            if command == 'rebuild':
+                rebuild(conn)
+                print(f"✓ Rebuilt monthly totals for {name}")
+                continue
+            drift = verify(conn)
+            if drift:
+                drifted += 1
+                print(f"✗ {name}: {len(drift)} drifted rollup row(s)")
+                for item in drift[:10]:
+                    print(f"    {item['key']}: expected {item['expected']}, found {item['actual']}")
+            else:
+                print(f"✓ {name}: monthly totals match")
+        finally:
+            conn.close()
+
+    if drifted:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Column specifications for the client database tables.
+
+Each table lists its columns once, with the camelCase key used by the
+JSON API and how incoming values are coerced. The bulk import engine
+and the list endpoints are driven from these specs instead of repeating
+the column lists in every route.
+"""
+
+from money import rupees_sql
+
+
+class Column:
+    """One table column and its JSON API counterpart"""
+
+    # Kinds:
+    #   text      - stored as given, default used when missing
+    #   amount    - rupees in the API, stored as integer paise (see money.py);
+    #               blank values fall back to the default
+    #   optional  - float, blank values are stored as NULL
+    #   generated - filled in by the database or the importer, never read from input
+    __slots__ = ('name', 'key', 'kind', 'default', 'source')
+
+    def __init__(self, name, key, kind='text', default='', source=None):
+        self.name = name
+        self.key = key
+        self.kind = kind
+        self.default = default
+        # Input key when it differs from the output key (purchases send calculatedTaxRate)
+        self.source = source or key
+
+    @property
+    def select_sql(self):
+        """SELECT expression for the column's API value"""
+        if self.kind == 'amount':
+            return rupees_sql(self.name)
+        return self.name
+
+
+class Table:
+    """Column layout of a client database table"""
+
+    def __init__(self, name, id_prefix, columns, required=(), collection_key=None, label=None):
+        self.name = name
+        self.id_prefix = id_prefix
+        self.columns = columns
+        self.required = tuple(required)
+        self.collection_key = collection_key
+        self.label = label or name
+        self.by_key = {column.key: column for column in columns}
+        self.by_name = {column.name: column for column in columns}
+        self.input_columns = [column for column in columns if column.kind != 'generated']
+
+
+PURCHASES = Table('purchases', 'PUR', [
+    Column('id', 'id', 'generated'),
+    Column('supplier_gstin', 'supplierGSTIN'),
+    Column('supplier_name', 'supplierName'),
+    Column('invoice_number', 'invoiceNumber'),
+    Column('invoice_type', 'invoiceType', default='Regular'),
+    Column('invoice_date', 'invoiceDate'),
+    Column('invoice_value', 'invoiceValue', 'amount', 0),
+    Column('place_of_supply', 'placeOfSupply'),
+    Column('reverse_charge', 'reverseCharge', default='No'),
+    Column('taxable_value', 'taxableValue', 'amount', 0),
+    Column('integrated_tax', 'integratedTax', 'amount', 0),
+    Column('central_tax', 'centralTax', 'amount', 0),
+    Column('state_tax', 'stateTax', 'amount', 0),
+    Column('cess', 'cess', 'amount', 0),
+    Column('itc_available', 'itcAvailable', default='Yes'),
+    Column('tax_rate', 'taxRate', default='0', source='calculatedTaxRate'),
+    Column('month', 'month'),
+    Column('status', 'status', default='active'),
+    Column('created_at', 'createdAt', 'generated'),
+    Column('updated_at', 'updatedAt', 'generated'),
+], required=('supplierGSTIN', 'supplierName', 'invoiceNumber', 'month'),
+   collection_key='purchases', label='purchases')
+
+SALES = Table('sales', 'SAL', [
+    Column('id', 'id', 'generated'),
+    Column('customer_gstin', 'customerGSTIN'),
+    Column('customer_name', 'customerName'),
+    Column('invoice_number', 'invoiceNumber'),
+    Column('invoice_type', 'invoiceType', default='Regular'),
+    Column('invoice_date', 'invoiceDate'),
+    Column('invoice_value', 'invoiceValue', 'amount', 0),
+    Column('place_of_supply', 'placeOfSupply'),
+    Column('reverse_charge', 'reverseCharge', default='No'),
+    Column('taxable_value', 'taxableValue', 'amount', 0),
+    Column('integrated_tax', 'integratedTax', 'amount', 0),
+    Column('central_tax', 'centralTax', 'amount', 0),
+    Column('state_tax', 'stateTax', 'amount', 0),
+    Column('cess', 'cess', 'amount', 0),
+    Column('tax_rate', 'taxRate', default='0'),
+    Column('month', 'month'),
+    Column('transaction_type', 'transactionType', default='B2B'),
+    Column('hsn_code', 'hsnCode'),
+    Column('quantity', 'quantity', 'optional', None),
+    Column('unit_price', 'unitPrice', 'optional', None),
+    Column('ecommerce_gstin', 'ecommerceGSTIN'),
+    Column('status', 'status', default='active'),
+    Column('created_at', 'createdAt', 'generated'),
+    Column('updated_at', 'updatedAt', 'generated'),
+], required=('customerName', 'invoiceNumber', 'month'),
+   collection_key='sales', label='sales')
+
+B2C_SALES = Table('b2c_sales', 'B2C', [
+    Column('id', 'id', 'generated'),
+    Column('month', 'month'),
+    Column('supply_type', 'supplyType'),
+    Column('place_of_supply', 'placeOfSupply'),
+    Column('gst_rate', 'gstRate'),
+    Column('taxable_value', 'taxableValue', 'amount', 0),
+    Column('central_tax', 'centralTax', 'amount', 0),
+    Column('state_tax', 'stateTax', 'amount', 0),
+    Column('integrated_tax', 'integratedTax', 'amount', 0),
+    Column('invoice_value', 'invoiceValue', 'amount', 0),
+    Column('hsn_code', 'hsnCode'),
+    Column('quantity', 'quantity', 'optional', None),
+    Column('unit_price', 'unitPrice', 'optional', None),
+    Column('status', 'status', default='active'),
+    Column('created_at', 'createdAt', 'generated'),
+    Column('updated_at', 'updatedAt', 'generated'),
+], required=('month', 'supplyType', 'gstRate'),
+   collection_key='b2cSales', label='B2C sales')
+
+SUNDRY_DEBTORS = Table('sundry_debtors', None, [
+    Column('id', 'id', 'generated'),
+    Column('debtor_name', 'debtorName'),
+    Column('gstin', 'gstin'),
+    Column('address', 'address'),
+    Column('contact', 'contact'),
+    Column('email', 'email'),
+    Column('created_at', 'createdAt', 'generated'),
+    Column('updated_at', 'updatedAt', 'generated'),
+], required=('debtorName', 'gstin'), label='sundry debtors')
+
+TABLES = {table.name: table for table in (PURCHASES, SALES, B2C_SALES, SUNDRY_DEBTORS)}
@@ -0,0 +1,299 @@
+"""
+Full-text and prefix search over purchases, sales and sundry debtors.
+
+search_index is a contentless FTS5 table with three columns: the party
+name (supplier, customer or debtor), the invoice number and the GSTINs.
+Each indexed row is stored under rowid * 4 + table code, so a match
+leads straight back to the source row by rowid without keeping a copy
+of the text. Triggers add, replace and remove entries in the same
+transaction as every write; contentless tables need the old values to
+remove an entry, which the triggers have as OLD. Bulk imports suspend
+the triggers and index each chunk with index_rows instead.
+
+Every word of a query must match, the last one as a prefix ("acme
+inv/00012" finds invoice INV/000123 of ACME Traders), with prefix
+indexes for two to four characters so short prefixes stay fast. Results are ranked with
+bm25, except for queries so broad that scoring every match would cost
+more than it is worth; those come newest first.
+
+The index follows rowids, which only change if a table is rebuilt or
+vacuumed; run rebuild() (python search.py rebuild) afterwards.
+
+Rows of a closed financial year leave the hot database together with
+their index entries (see partitions.py). A year file has a search_index
+of its own, and an archived year is indexed in memory when it is
+searched; search() merges the matches of those connections with the hot
+ones.
+"""
+
+import glob
+import os
+import sqlite3
+import sys
+
+# table -> (code, source columns, FTS column expressions with '{p}' for NEW./OLD.)
+INDEXED_TABLES = {
+    'purchases': (1, ('supplier_name', 'invoice_number', 'supplier_gstin'), {
+        'name': '{p}supplier_name',
+        'invoice_number': '{p}invoice_number',
+        'gstin': '{p}supplier_gstin',
+    }),
+    'sales': (2, ('customer_name', 'invoice_number', 'customer_gstin', 'ecommerce_gstin'), {
+        'name': '{p}customer_name',
+        'invoice_number': '{p}invoice_number',
+        'gstin': "{p}customer_gstin || ' ' || COALESCE({p}ecommerce_gstin, '')",
+    }),
+    'sundry_debtors': (3, ('debtor_name', 'gstin'), {
+        'name': '{p}debtor_name',
+        'invoice_number': "''",
+        'gstin': '{p}gstin',
+    }),
+}
+
+FTS_COLUMNS = ('name', 'invoice_number', 'gstin')
+
+API_NAMES = {'purchases': 'purchases', 'sales': 'sales', 'sundry_debtors': 'sundryDebtors'}
+
+FIELD_NAMES = {'name': 'name', 'invoiceNumber': 'invoice_number', 'gstin': 'gstin'}
+
+# Columns of the partitioned tables a search reads, for loading archived years
+ARCHIVE_COLUMNS = {
+    table: INDEXED_TABLES[table][1] + ('id', 'invoice_date', 'invoice_value', 'month')
+    for table in ('purchases', 'sales')
+}
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 200
+
+# Above this many matches ranking is skipped and the newest rows come first:
+# bm25 has to score every match, and a two-letter prefix can match them all
+RANK_LIMIT = 5000
+
+SEARCH_SQL = '''
+    SELECT h.code, h.code % 4 AS kind, h.rank AS rank,
+           COALESCE(p.id, s.id, d.id) AS id,
+           COALESCE(p.supplier_name, s.customer_name, d.debtor_name) AS name,
+           COALESCE(p.supplier_gstin, s.customer_gstin, d.gstin) AS gstin,
+           COALESCE(p.invoice_number, s.invoice_number) AS invoice_number,
+           COALESCE(p.invoice_date, s.invoice_date) AS invoice_date,
+           COALESCE(p.invoice_value, s.invoice_value) / 100.0 AS invoice_value,
+           COALESCE(p.month, s.month) AS month
+    FROM (SELECT rowid AS code, {rank} AS rank FROM search_index WHERE search_index MATCH ?) AS h
+    LEFT JOIN purchases AS p ON h.code % 4 = 1 AND p.rowid = h.code / 4
+    LEFT JOIN sales AS s ON h.code % 4 = 2 AND s.rowid = h.code / 4
+    LEFT JOIN sundry_debtors AS d ON h.code % 4 = 3 AND d.rowid = h.code / 4
+    WHERE {where}
+    ORDER BY {order}
+    LIMIT ? OFFSET ?
+'''
+
+COUNT_SQL = '''
+    SELECT COUNT(*) FROM (SELECT rowid FROM search_index WHERE search_index MATCH ? LIMIT ?)
+'''
+
+
+class SearchError(ValueError):
+    """Raised for invalid search parameters; the route answers with a 400"""
+
+
+def _values(table, prefix):
+    code, _sources, columns = INDEXED_TABLES[table]
+    return [f'{prefix}rowid * 4 + {code}'] + [columns[name].format(p=prefix) for name in FTS_COLUMNS]
+
+
+def _insert_sql(table, prefix):
+    return (
+        f"INSERT INTO search_index (rowid, {', '.join(FTS_COLUMNS)}) "
+        f"VALUES ({', '.join(_values(table, prefix))});"
+    )
+
+
+def _delete_sql(table, prefix):
+    return (
+        f"INSERT INTO search_index (search_index, rowid, {', '.join(FTS_COLUMNS)}) "
+        f"VALUES ('delete', {', '.join(_values(table, prefix))});"
+    )
+
+
+def create_triggers(conn):
+    """(Re)create the triggers that keep search_index in sync"""
+    for table, (_code, sources, _columns) in INDEXED_TABLES.items():
+        for event in ('insert', 'update', 'delete'):
+            conn.execute(f'DROP TRIGGER IF EXISTS trg_{table}_search_{event}')
+        conn.execute(
+            f'CREATE TRIGGER trg_{table}_search_insert AFTER INSERT ON {table} '
+            f'BEGIN {_insert_sql(table, "NEW.")} END'
+        )
+        # Only edits of indexed columns touch the index
+        conn.execute(
+            f"CREATE TRIGGER trg_{table}_search_update AFTER UPDATE OF {', '.join(sources)} ON {table} "
+            f'BEGIN {_delete_sql(table, "OLD.")} {_insert_sql(table, "NEW.")} END'
+        )
+        conn.execute(
+            f'CREATE TRIGGER trg_{table}_search_delete AFTER DELETE ON {table} '
+            f'BEGIN {_delete_sql(table, "OLD.")} END'
+        )
+
+
+def index_rows(conn, table, rows_sql, params=(), old=None, new=None):
+    """Set-based counterpart of the triggers, for writes that suspend them
+
+    rows_sql is the FROM ... WHERE clause selecting the written rows; old
+    and new are the prefixes of their old and new values in it, as OLD.
+    and NEW. are in the triggers (see bulk_import.py).
+    """
+    if old is not None:
+        conn.execute(
+            f"INSERT INTO search_index (search_index, rowid, {', '.join(FTS_COLUMNS)}) "
+            f"SELECT 'delete', {', '.join(_values(table, old))} {rows_sql}",
+            params
+        )
+    if new is not None:
+        conn.execute(
+            f"INSERT INTO search_index (rowid, {', '.join(FTS_COLUMNS)}) "
+            f"SELECT {', '.join(_values(table, new))} {rows_sql}",
+            params
+        )
+
+
+def _fill(conn):
+    for table in INDEXED_TABLES:
+        conn.execute(
+            f"INSERT INTO search_index (rowid, {', '.join(FTS_COLUMNS)}) "
+            f"SELECT {', '.join(_values(table, ''))} FROM {table}"
+        )
+
+
+def _create_table(conn):
+    conn.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+            {', '.join(FTS_COLUMNS)},
+            content='',
+            prefix='2 3 4',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    ''')
+
+
+def create_search_index(conn):
+    """Create search_index with its triggers and index the existing rows"""
+    _create_table(conn)
+    create_triggers(conn)
+    _fill(conn)
+
+
+def index_loaded(conn):
+    """Index the purchases and sales loaded into an in-memory database (no triggers)
+
+    The database holds an archived year (see columnar.load_into) and is
+    thrown away after one search, so only an empty sundry_debtors table
+    is added for SEARCH_SQL to join.
+    """
+    conn.execute('CREATE TABLE IF NOT EXISTS sundry_debtors (id TEXT, debtor_name TEXT, gstin TEXT)')
+    _create_table(conn)
+    _fill(conn)
+
+
+def rebuild(conn):
+    """Re-index every row from scratch"""
+    with conn:
+        conn.execute("INSERT INTO search_index (search_index) VALUES ('delete-all')")
+        create_triggers(conn)
+        _fill(conn)
+        conn.execute("INSERT INTO search_index (search_index) VALUES ('optimize')")
+
+
+def match_expression(text, fields=None):
+    """FTS5 query matching the words of text, the last one as a prefix
+
+    Words are quoted, so punctuation such as '/' or '-' inside an invoice
+    number is split the same way as in the index and cannot form FTS5
+    syntax. fields restricts the match to some of the indexed columns.
+    """
+    words = ['"{}"'.format(word.replace('"', '""')) for word in text.split()]
+    if not words:
+        raise SearchError('q must contain at least one word')
+    # Only the word being typed is a prefix; a prefix term longer than the
+    # prefix indexes has to merge the doclists of every matching term
+    words[-1] += '*'
+    expression = ' '.join(words)
+    if fields:
+        return '{%s} : (%s)' % (' '.join(fields), expression)
+    return expression
+
+
+def search(conn, text, tables=None, fields=None, month=None, limit=DEFAULT_LIMIT, offset=0, years=()):
+    """Matches for text, best first; returns {'items', 'ranked', 'hasMore', 'nextOffset'}
+
+    Queries with more than RANK_LIMIT matches are returned newest first
+    with 'ranked' false. years are connections to closed financial years
+    (see partitions.search_readers) whose matches are merged in.
+    """
+    where, params = ['1'], []
+    if tables:
+        codes = [INDEXED_TABLES[table][0] for table in tables]
+        where.append(f"h.code % 4 IN ({', '.join(str(code) for code in codes)})")
+    if month:
+        where.append('COALESCE(p.month, s.month) = ?')
+        params.append(month)
+
+    expression = match_expression(text, fields)
+    sources = [conn, *years]
+    matches = sum(source.execute(COUNT_SQL, (expression, RANK_LIMIT + 1)).fetchone()[0] for source in sources)
+    ranked = matches <= RANK_LIMIT
+    if ranked:
+        sql = SEARCH_SQL.format(rank='rank', where=' AND '.join(where), order='h.rank, h.code DESC')
+    else:
+        sql = SEARCH_SQL.format(rank='0', where=' AND '.join(where), order='h.code DESC')
+    if not years:
+        rows = conn.execute(sql, [expression] + params + [limit + 1, offset]).fetchall()
+    else:
+        # Every file's best offset + limit + 1 rows, merged in the same
+        # order; rowids are kept when a year is closed, so codes are unique
+        rows = []
+        for source in sources:
+            rows.extend(source.execute(sql, [expression] + params + [offset + limit + 1, 0]).fetchall())
+        if ranked:
+            rows.sort(key=lambda row: (row['rank'], -row['code']))
+        else:
+            rows.sort(key=lambda row: -row['code'])
+        rows = rows[offset:]
+
+    kinds = {code: API_NAMES[table] for table, (code, _sources, _columns) in INDEXED_TABLES.items()}
+    items = [
+        {
+            'table': kinds[row['kind']],
+            'id': row['id'],
+            'name': row['name'],
+            'gstin': row['gstin'],
+            'invoiceNumber': row['invoice_number'],
+            'invoiceDate': row['invoice_date'],
+            'invoiceValue': row['invoice_value'],
+            'month': row['month'],
+            'score': round(-row['rank'], 4) if ranked else None,
+        }
+        for row in rows[:limit]
+    ]
+    has_more = len(rows) > limit
+    return {'items': items, 'ranked': ranked, 'hasMore': has_more,
+            'nextOffset': offset + limit if has_more else None}
+
+
+def main():
+    """Rebuild the search index of the given (or all) client databases"""
+    if len(sys.argv) < 2 or sys.argv[1] != 'rebuild':
+        print('Usage: python search.py rebuild [database ...]')
+        sys.exit(2)
+
+    db_files = sys.argv[2:] or sorted(glob.glob(os.path.join('client_databases', '*.db')))
+    for db_path in db_files:
+        conn = sqlite3.connect(db_path)
+        try:
+            rebuild(conn)
+            print(f"✓ Rebuilt search index for {os.path.basename(db_path)}")
+        finally:
+            conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+JSON encoding of table rows without building a dict per row.
+
+The list routes used to turn every sqlite3.Row into a dict of camelCase
+keys and hand the list to jsonify, which then walked the dicts again
+(sorting their keys). Here the keys of a column list are rendered once
+into a row template such as
+
+    {"id":%s,"supplierGSTIN":%s,...}
+
+and each row is filled in from the cursor's plain tuples, one encoded
+value per column. Values are encoded with orjson when it is installed
+(pip install orjson) and with the standard library's C string encoder
+otherwise; the output is the same JSON either way, except that orjson
+keeps non-ASCII characters as UTF-8 instead of \\u escapes.
+
+Large results can be streamed: iter_json_array fetches and encodes the
+cursor a chunk at a time, so memory stays flat however many rows match.
+`python benchmarks/bench_serializers.py` compares the encoders with the
+old dict-and-jsonify path.
+"""
+
+import json
+import math
+import threading
+from json.encoder import encode_basestring_ascii
+
+try:
+    import orjson
+except ImportError:  # optional, the standard library path is used instead
+    orjson = None
+
+DEFAULT_CHUNK_ROWS = 500
+
+
+def _encode_float(value):
+    # NaN and infinity are not JSON; orjson writes them as null too
+    return float.__repr__(value) if math.isfinite(value) else 'null'
+
+
+_VALUE_ENCODERS = {
+    str: encode_basestring_ascii,
+    float: _encode_float,
+    int: int.__repr__,
+    bool: lambda value: 'true' if value else 'false',
+    type(None): lambda value: 'null',
+}
+
+
+def encode_value(value):
+    """JSON text of one column value (standard library path)"""
+    encoder = _VALUE_ENCODERS.get(type(value))
+    if encoder is None:
+        if isinstance(value, bytes):
+            value = value.decode('utf-8', 'replace')
+        return json.dumps(value, default=str)
+    return encoder(value)
+
+
+def dumps(obj):
+    """Compact JSON bytes for any payload, through orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+
+class RowSerializer:
+    """Encodes row tuples as JSON objects with the given keys, in order"""
+
+    def __init__(self, keys, use_orjson=None):
+        self.keys = tuple(keys)
+        self.width = len(self.keys)
+        self.use_orjson = orjson is not None if use_orjson is None else use_orjson
+        if self.use_orjson and orjson is None:
+            raise RuntimeError('orjson is not installed')
+        template = '{' + ','.join(
+            encode_basestring_ascii(key).replace('%', '%%') + ':%s' for key in self.keys
+        ) + '}'
+        if self.use_orjson:
+            self._template = template.encode('utf-8')
+            self._encode = orjson.dumps
+        else:
+            self._template = template
+            self._encode = encode_value
+
+    def encode_items(self, rows):
+        """Rows as comma-separated JSON objects (bytes, no brackets)
+
+        rows may be wider than the key list; extra columns are ignored.
+        """
+        template, encode, width = self._template, self._encode, self.width
+        parts = [template % tuple(map(encode, row[:width])) for row in rows]
+        if self.use_orjson:
+            return b','.join(parts)
+        return ','.join(parts).encode('utf-8')
+
+    def encode_rows(self, rows):
+        """JSON array of rows as bytes"""
+        return b'[' + self.encode_items(rows) + b']'
+
+    def iter_rows(self, cursor, chunk_rows=DEFAULT_CHUNK_ROWS):
+        """Yield the rows of an executed cursor as comma-separated JSON chunks"""
+        separator = b''
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                return
+            yield separator + self.encode_items(rows)
+            separator = b','
+
+
+_serializers = {}
+_serializers_lock = threading.Lock()
+
+
+def row_serializer(keys):
+    """Shared RowSerializer for a key list (one per fields= selection)"""
+    keys = tuple(keys)
+    serializer = _serializers.get(keys)
+    if serializer is None:
+        with _serializers_lock:
+            serializer = _serializers.setdefault(keys, RowSerializer(keys))
+    return serializer
+
+
+def table_serializer(columns):
+    """Shared RowSerializer for a list of schema columns"""
+    return row_serializer(column.key for column in columns)
+
+
+def plain_cursor(conn):
+    """Cursor that returns plain tuples even when the connection uses sqlite3.Row"""
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    return cursor
+
+
+def iter_json_array(serializer, cursor, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Stream an executed cursor as one JSON array"""
+    yield b'['
+    yield from serializer.iter_rows(cursor, chunk_rows)
+    yield b']'
@@ -0,0 +1,204 @@
+"""
+Production server for the backend.
+
+    python serve.py      (python app.py does the same unless GST_DEBUG=1)
+
+The server is picked from what is installed: waitress (pure Python,
+works on Windows, installed from requirements.txt), then gunicorn (POSIX
+only, multiple worker processes), then werkzeug's threaded server
+without the reloader or debugger. Settings come from the environment:
+
+    GST_HOST, GST_PORT        bind address (default 127.0.0.1:5001)
+    GST_SERVER                auto, waitress, gunicorn or werkzeug
+    GST_WORKERS               worker processes, gunicorn only (default 1)
+    GST_THREADS               request threads per process (default 8; werkzeug
+                              starts a thread per request instead)
+    GST_SHUTDOWN_TIMEOUT      seconds in-flight requests get on shutdown (default 10)
+
+Client databases are switched to WAL mode by the migrations, so readers
+in every thread and worker process run alongside a writer.
+
+One process with several threads is the supported layout. The write
+queues (one writer per client database), the change stream notifier and
+the ledger and portfolio caches live in the process's memory, so with
+GST_WORKERS > 1 under gunicorn each worker has its own: a client database
+gets a writer per process that contend on SQLite's lock, and one worker's
+writes only reach another worker's caches through their data version
+and file signature checks, and its change streams through their poll. On SIGINT or
+SIGTERM the server stops accepting requests, waits for checked-out
+connections to come back, checkpoints the WAL files and closes the pool.
+"""
+
+import os
+import signal
+import sys
+import tempfile
+import threading
+
+SERVERS = ('waitress', 'gunicorn', 'werkzeug')
+
+
+def settings():
+    """Server settings from the environment"""
+    return {
+        'host': os.environ.get('GST_HOST', '127.0.0.1'),
+        'port': int(os.environ.get('GST_PORT', 5001)),
+        'server': os.environ.get('GST_SERVER', 'auto').lower(),
+        'workers': max(1, int(os.environ.get('GST_WORKERS', 1))),
+        'threads': max(1, int(os.environ.get('GST_THREADS', 8))),
+        'shutdown_timeout': float(os.environ.get('GST_SHUTDOWN_TIMEOUT', 10)),
+    }
+
+
+def available(server):
+    if server == 'werkzeug':
+        return True
+    if server == 'gunicorn' and os.name != 'posix':
+        return False
+    try:
+        __import__(server)
+    except ImportError:
+        return False
+    return True
+
+
+def choose_server(requested):
+    """The requested server, or the first installed one for 'auto'"""
+    if requested == 'auto':
+        return next(server for server in SERVERS if available(server))
+    if requested not in SERVERS:
+        raise ValueError(f"GST_SERVER must be auto or one of {', '.join(SERVERS)}")
+    if not available(requested):
+        raise RuntimeError(f'{requested} is not installed or not supported on this platform')
+    return requested
+
+
+def close_databases(pool, timeout):
+    """Let in-flight requests return their connections, then checkpoint and close"""
+    if not pool.wait_idle(timeout):
+        print(f"Warning: connections still in use after {timeout:g}s, closing anyway")
+    pool.close_all(checkpoint=True)
+
+
+def install_signal_handlers(stop):
+    """Call stop() once on SIGINT/SIGTERM, from a helper thread"""
+    def handler(signum, frame):
+        threading.Thread(target=stop, daemon=True).start()
+
+    signal.signal(signal.SIGINT, handler)
+    signal.signal(signal.SIGTERM, handler)
+
+
+def run_waitress(app, config):
+    from waitress import create_server
+
+    server = create_server(app, host=config['host'], port=config['port'],
+                           threads=config['threads'])
+    # run() stops its task threads when SystemExit/KeyboardInterrupt reaches it
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    server.run()
+
+
+def run_werkzeug(app, config):
+    from werkzeug.serving import make_server
+
+    server = make_server(config['host'], config['port'], app, threaded=True)
+    install_signal_handlers(server.shutdown)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+# Lock files held by the gunicorn worker that ran the start function
+_start_locks = []
+
+
+def start_in_one_worker(start, lock_path):
+    """Run start in the first worker to take the lock; it holds it until it exits
+
+    A worker started to replace that one takes the lock over.
+    """
+    import fcntl
+
+    lock = open(lock_path, 'a')
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        return
+    _start_locks.append(lock)
+    start()
+
+
+def run_gunicorn(app, config, pool, start=None):
+    from gunicorn.app.base import BaseApplication
+
+    lock_path = os.path.join(tempfile.gettempdir(), f"gst-backend-{config['port']}.lock")
+
+    class Application(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f"{config['host']}:{config['port']}")
+            self.cfg.set('workers', config['workers'])
+            self.cfg.set('threads', config['threads'])
+            self.cfg.set('worker_class', 'gthread')
+            self.cfg.set('graceful_timeout', config['shutdown_timeout'])
+            # Bulk and file imports can run for minutes on large uploads
+            self.cfg.set('timeout', 0)
+            self.cfg.set('worker_exit', lambda server, worker: close_databases(pool, 0))
+            if start is not None:
+                self.cfg.set('post_worker_init', lambda worker: start_in_one_worker(start, lock_path))
+
+        def load(self):
+            return app
+
+    # gunicorn drains requests on SIGTERM and calls worker_exit in each worker
+    Application().run()
+
+
+def serve(app, pool, prepare=None, start=None):
+    """Prepare the databases and run the app until it is asked to stop
+
+    prepare runs once in the process that starts the server. start (such
+    as resuming background jobs, which starts threads) runs in a process
+    that serves requests: this one, or a single gunicorn worker.
+    """
+    config = settings()
+    server = choose_server(config['server'])
+
+    if prepare is not None:
+        prepare()
+
+    if server == 'werkzeug':
+        detail = 'a thread per request'
+    else:
+        workers = config['workers'] if server == 'gunicorn' else 1
+        detail = f"{workers} process(es), {config['threads']} thread(s) each"
+    print(f"Serving on http://{config['host']}:{config['port']} with {server} ({detail})")
+    if server == 'gunicorn' and config['workers'] > 1:
+        print("Warning: each worker process has its own write queues and caches (see serve.py)")
+    sys.stdout.flush()
+
+    if server == 'gunicorn':
+        # SQLite connections must not cross the fork into the workers
+        pool.close_all(final=False)
+        run_gunicorn(app, config, pool, start)
+        return
+
+    if start is not None:
+        start()
+
+    try:
+        if server == 'waitress':
+            run_waitress(app, config)
+        else:
+            run_werkzeug(app, config)
+    finally:
+        print("Shutting down, closing databases...")
+        close_databases(pool, config['shutdown_timeout'])
+
+
+if __name__ == '__main__':
+    from app import app, db_pool, prepare_databases, resume_jobs
+
+    serve(app, db_pool, prepare_databases, resume_jobs)
@@ -0,0 +1,88 @@
+"""
+SQLite storage profile applied to every pooled connection.
+
+The defaults suit a desktop app with one process serving several
+windows: WAL so readers never block the writer, synchronous=NORMAL so a
+commit does not wait for an fsync (WAL stays consistent after a crash,
+only the last commits can be lost on power failure), a bigger page
+cache, memory-mapped reads, in-memory temp tables and a busy timeout
+instead of immediate "database is locked" errors. Every setting can be
+overridden from the environment:
+
+    GST_SQLITE_JOURNAL_MODE    WAL
+    GST_SQLITE_SYNCHRONOUS     NORMAL   (OFF, NORMAL, FULL, EXTRA)
+    GST_SQLITE_CACHE_KB        16384    page cache per connection
+    GST_SQLITE_MMAP_MB         256      0 disables memory-mapped I/O
+    GST_SQLITE_TEMP_STORE      MEMORY   (DEFAULT, FILE, MEMORY)
+    GST_SQLITE_BUSY_TIMEOUT_MS 5000
+"""
+
+import os
+import sqlite3
+
+DEFAULT_PROFILE = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_kb': 16384,
+    'mmap_mb': 256,
+    'temp_store': 'MEMORY',
+    'busy_timeout_ms': 5000,
+}
+
+ENVIRONMENT = {
+    'journal_mode': 'GST_SQLITE_JOURNAL_MODE',
+    'synchronous': 'GST_SQLITE_SYNCHRONOUS',
+    'cache_kb': 'GST_SQLITE_CACHE_KB',
+    'mmap_mb': 'GST_SQLITE_MMAP_MB',
+    'temp_store': 'GST_SQLITE_TEMP_STORE',
+    'busy_timeout_ms': 'GST_SQLITE_BUSY_TIMEOUT_MS',
+}
+
+CHOICES = {
+    'journal_mode': ('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'),
+    'synchronous': ('OFF', 'NORMAL', 'FULL', 'EXTRA'),
+    'temp_store': ('DEFAULT', 'FILE', 'MEMORY'),
+}
+
+
+def profile_from_env(environ=None):
+    """DEFAULT_PROFILE with overrides from GST_SQLITE_* variables"""
+    environ = os.environ if environ is None else environ
+    profile = dict(DEFAULT_PROFILE)
+    for setting, variable in ENVIRONMENT.items():
+        value = environ.get(variable)
+        if value is None or value == '':
+            continue
+        if setting in CHOICES:
+            value = value.upper()
+            if value not in CHOICES[setting]:
+                raise ValueError(f"{variable} must be one of {', '.join(CHOICES[setting])}")
+        else:
+            value = int(value)
+        profile[setting] = value
+    return profile
+
+
+def apply_profile(conn, profile):
+    """Set the profile's PRAGMAs on an open connection"""
+    conn.execute(f"PRAGMA busy_timeout = {int(profile['busy_timeout_ms'])}")
+    if profile['journal_mode'] in CHOICES['journal_mode']:
+        conn.execute(f"PRAGMA journal_mode = {profile['journal_mode']}")
+    if profile['synchronous'] in CHOICES['synchronous']:
+        conn.execute(f"PRAGMA synchronous = {profile['synchronous']}")
+    if profile['temp_store'] in CHOICES['temp_store']:
+        conn.execute(f"PRAGMA temp_store = {profile['temp_store']}")
+    # A negative cache_size is a size in KiB rather than a page count
+    conn.execute(f"PRAGMA cache_size = {-int(profile['cache_kb'])}")
+    conn.execute(f"PRAGMA mmap_size = {int(profile['mmap_mb']) * 1024 * 1024}")
+
+
+def connection_factory(profile):
+    """Connection factory for ConnectionPool that applies profile"""
+    def connect(db_path):
+        conn = sqlite3.connect(db_path, check_same_thread=False,
+                               timeout=profile['busy_timeout_ms'] / 1000)
+        conn.row_factory = sqlite3.Row
+        apply_profile(conn, profile)
+        return conn
+    return connect
@@ -0,0 +1,267 @@
+"""
+Streaming CSV/Excel import for the purchases, sales and B2C sales tables.
+
+The upload is parsed straight off the request stream: multipart bodies
+are decoded incrementally, CSV text is split into records as the bytes
+arrive, and every chunk of records is committed through the bulk import
+engine before the next one is read. Memory use depends on the chunk
+size, not on the size of the file.
+
+Excel workbooks are zip archives that can only be read once the whole
+file is present, so they are spooled to a temporary file on disk and
+read row by row with openpyxl's read-only mode (openpyxl is optional).
+"""
+
+import codecs
+import csv
+import re
+import tempfile
+from datetime import date, datetime
+
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+from schema import PURCHASES
+
+READ_SIZE = 64 * 1024
+
+STANDARD_GST_RATES = (0, 5, 12, 18, 28)
+
+# Header aliases used by the downloadable templates that are not column keys
+HEADER_ALIASES = {
+    'sales': {'rate': 'unitPrice'},
+    'b2c_sales': {'rate': 'unitPrice'},
+}
+
+
+class ImportFormatError(Exception):
+    """Raised when an upload cannot be parsed as a supported file"""
+
+
+def normalize_header(header):
+    """Lowercase a header and strip everything but letters and digits"""
+    return re.sub(r'[^a-z0-9]', '', header.strip().lower())
+
+
+def header_map(table):
+    """Map normalized template headers to the input keys of a table"""
+    mapping = {}
+    for column in table.input_columns:
+        mapping[normalize_header(column.key)] = column.source
+        mapping[normalize_header(column.source)] = column.source
+    mapping.update(HEADER_ALIASES.get(table.name, {}))
+    return mapping
+
+
+def month_from_date(value):
+    """YYYY-MM from YYYY-MM-DD, DD-MM-YYYY or DD/MM/YYYY, as the import pages do"""
+    value = (value or '').strip()
+    match = re.match(r'^(\d{4})-(\d{1,2})-(\d{1,2})', value)
+    if match:
+        year, month = match.group(1), match.group(2)
+    else:
+        match = re.match(r'^(\d{1,2})[-/](\d{1,2})[-/](\d{4})$', value)
+        if not match:
+            return None
+        year, month = match.group(3), match.group(2)
+    if not 1 <= int(month) <= 12:
+        return None
+    return f'{year}-{int(month):02d}'
+
+
+def calculate_tax_rate(row):
+    """Effective GST rate, snapped to a standard slab when within 0.5%"""
+    def amount(key):
+        try:
+            return float(str(row.get(key) or 0).replace(',', ''))
+        except ValueError:
+            return 0.0
+
+    taxable_value = amount('taxableValue')
+    if taxable_value == 0:
+        return '0'
+    total_gst = amount('centralTax') + amount('stateTax') + amount('integratedTax')
+    tax_rate = total_gst / taxable_value * 100
+    closest_rate = min(STANDARD_GST_RATES, key=lambda rate: abs(rate - tax_rate))
+    if abs(closest_rate - tax_rate) <= 0.5:
+        return str(closest_rate)
+    return f'{tax_rate:.2f}'
+
+
+def prepare_row(table, row, default_month):
+    """Fill in what the import pages derive in the browser before saving"""
+    if not row.get('month'):
+        row['month'] = month_from_date(row.get('invoiceDate')) or default_month
+    if table is PURCHASES:
+        row['calculatedTaxRate'] = calculate_tax_rate(row)
+    return row
+
+
+def iter_upload_parts(stream, boundary, fields):
+    """Yield ('file', filename) followed by its byte chunks from a multipart stream
+
+    Simple form fields seen before the file are collected into fields.
+    Only the first file part is imported.
+    """
+    decoder = MultipartDecoder(boundary.encode('latin-1'))
+    current_field = None
+    in_file = False
+    finished = False
+
+    while not finished:
+        chunk = stream.read(READ_SIZE)
+        decoder.receive_data(chunk or None)
+        event = decoder.next_event()
+        while not isinstance(event, NeedData):
+            if isinstance(event, File):
+                if in_file is None:
+                    # A second file part; everything needed has been read
+                    return
+                in_file = True
+                yield ('file', event.filename)
+            elif isinstance(event, Field):
+                current_field = event.name
+                fields[current_field] = ''
+            elif isinstance(event, Data):
+                if in_file:
+                    yield ('data', event.data)
+                    if not event.more_data:
+                        in_file = None
+                elif current_field is not None:
+                    fields[current_field] += event.data.decode('utf-8', 'replace')
+            elif isinstance(event, Epilogue):
+                finished = True
+                break
+            event = decoder.next_event()
+        if not chunk:
+            finished = True
+
+
+def iter_lines(byte_chunks, encoding='utf-8-sig'):
+    """Decode byte chunks incrementally and yield complete lines"""
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    pending = ''
+    for chunk in byte_chunks:
+        pending += decoder.decode(chunk)
+        # Only split on \n; the csv module deals with \r and quoted newlines
+        *lines, pending = pending.split('\n')
+        for line in lines:
+            yield line + '\n'
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+def iter_csv_rows(lines, table):
+    """Yield row dicts keyed by the table's input keys from CSV lines"""
+    reader = csv.reader(lines)
+    try:
+        headers = next(reader)
+    except StopIteration:
+        raise ImportFormatError('The file is empty')
+
+    mapping = header_map(table)
+    keys = [mapping.get(normalize_header(header)) for header in headers]
+    if not any(keys):
+        raise ImportFormatError('None of the column headers match the import template')
+
+    for values in reader:
+        if not any(value.strip() for value in values):
+            continue
+        yield {key: value.strip() for key, value in zip(keys, values) if key}
+
+
+def cell_text(value):
+    """Worksheet cell value as the text a CSV export would contain"""
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value).strip()
+
+
+def iter_xlsx_rows(byte_chunks, table):
+    """Spool an .xlsx upload to disk and yield row dicts from the first sheet"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportFormatError('Excel import needs openpyxl (pip install -r requirements.txt); upload a CSV file instead')
+
+    with tempfile.TemporaryFile(suffix='.xlsx') as spool:
+        for chunk in byte_chunks:
+            spool.write(chunk)
+        spool.seek(0)
+
+        workbook = load_workbook(spool, read_only=True, data_only=True)
+        try:
+            rows = workbook.worksheets[0].iter_rows(values_only=True)
+            headers = next(rows, None)
+            if headers is None:
+                raise ImportFormatError('The workbook is empty')
+            mapping = header_map(table)
+            keys = [mapping.get(normalize_header(str(header or ''))) for header in headers]
+            if not any(keys):
+                raise ImportFormatError('None of the column headers match the import template')
+
+            for values in rows:
+                if all(value is None or str(value).strip() == '' for value in values):
+                    continue
+                yield {key: cell_text(value) for key, value in zip(keys, values) if key}
+        finally:
+            workbook.close()
+
+
+def iter_request_rows(request, table, fields):
+    """Row dicts from a multipart upload or a raw CSV request body"""
+    content_type = request.mimetype
+
+    if content_type == 'multipart/form-data':
+        boundary = request.mimetype_params.get('boundary')
+        if not boundary:
+            raise ImportFormatError('Missing multipart boundary')
+        parts = iter_upload_parts(request.stream, boundary, fields)
+        kind, filename = next(parts, (None, None))
+        if kind != 'file':
+            raise ImportFormatError('No file was uploaded')
+        byte_chunks = (data for _, data in parts)
+        is_excel = (filename or '').lower().endswith(('.xlsx', '.xlsm'))
+    else:
+        byte_chunks = iter(lambda: request.stream.read(READ_SIZE), b'')
+        is_excel = content_type in (
+            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+
+    if is_excel:
+        return iter_xlsx_rows(byte_chunks, table)
+    return iter_csv_rows(iter_lines(byte_chunks), table)
+
+
+def stream_import(importer, request, default_month=None):
+    """Import an upload chunk by chunk, yielding a progress event after each commit"""
+    fields = {}
+    rows = iter_request_rows(request, importer.table, fields)
+
+    chunk = []
+    for row in rows:
+        chunk.append(prepare_row(importer.table, row, fields.get('month') or default_month))
+        if len(chunk) >= importer.chunk_size:
+            importer.import_chunk(chunk)
+            chunk = []
+            yield progress_event(importer)
+    if chunk:
+        importer.import_chunk(chunk)
+
+    result = importer.result()
+    result['event'] = 'done'
+    yield result
+
+
+def progress_event(importer):
+    """Running totals after a committed chunk"""
+    return {
+        'event': 'progress',
+        'received': importer.received,
+        'count': importer.inserted,
+        'errorCount': importer.error_count,
+    }
@@ -0,0 +1,84 @@
+"""
+Shared fixtures: a migrated client database in a temporary directory,
+and one with sales in two financial years for the partition tests.
+
+Run from backend/ with python -m pytest.
+"""
+
+import os
+import sys
+from datetime import date
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import partitions  # noqa: E402
+from bulk_import import import_rows  # noqa: E402
+from migrations import migrate_database  # noqa: E402
+from schema import SALES  # noqa: E402
+from storage import DEFAULT_PROFILE, connection_factory  # noqa: E402
+
+# 2024-25 has ended by then, 2025-26 has not
+TODAY = date(2025, 6, 1)
+
+connect = connection_factory(DEFAULT_PROFILE)
+
+
+def make_sale(number, **fields):
+    """A sale as the API receives it"""
+    sale = {
+        'customerGSTIN': '27AAACA1234A1Z5',
+        'customerName': 'Acme Traders',
+        'invoiceNumber': f'INV/{number:04d}',
+        'invoiceType': 'Regular',
+        'invoiceDate': '2024-04-10',
+        'invoiceValue': 118,
+        'placeOfSupply': 'MH',
+        'reverseCharge': 'No',
+        'taxableValue': 100,
+        'integratedTax': 0,
+        'centralTax': 9,
+        'stateTax': 9,
+        'cess': 0,
+        'taxRate': '18',
+        'month': '2024-04',
+        'transactionType': 'B2B',
+    }
+    sale.update(fields)
+    return sale
+
+
+def read(db_path, sql, first_month, last_month, columns=None):
+    """Rows of sql read through partitions.reader_for, as tuples"""
+    reader = partitions.reader_for(connect(db_path), db_path, first_month, last_month, columns)
+    try:
+        return [tuple(row) for row in reader.execute(sql)]
+    finally:
+        reader.close()
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'client.db')
+    migrate_database(path)
+    return path
+
+
+@pytest.fixture
+def conn(db_path):
+    conn = connect(db_path)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def two_years(db_path, conn):
+    """Six sales of Old Traders in 2023-24 (four in May, two in June) and three of New Traders in 2024-25"""
+    old = [make_sale(n, customerName='Old Traders', invoiceDate='2023-05-10', month='2023-05') for n in range(4)]
+    old += [make_sale(n, customerName='Old Traders', invoiceDate='2023-06-10', month='2023-06',
+                      taxableValue=200) for n in range(4, 6)]
+    new = [make_sale(n, customerName='New Traders', invoiceDate='2024-04-10', month='2024-04') for n in range(3)]
+    import_rows(conn, SALES, old + new)
+    return db_path
@@ -0,0 +1,79 @@
+import gc
+import os
+import stat
+
+import pytest
+
+import columnar
+import partitions
+from conftest import TODAY, read
+from search import search
+
+
+@pytest.fixture
+def windows_remove(monkeypatch):
+    """os.remove that refuses read-only and memory-mapped files, as on Windows"""
+    remove = os.remove
+
+    def refuse_locked(path):
+        if not os.stat(path).st_mode & stat.S_IWUSR:
+            raise PermissionError(f'{path} is read-only')
+        for item in gc.get_objects():
+            if isinstance(item, columnar.ColumnarFile) and item.path == path:
+                raise PermissionError(f'{path} is mapped')
+        remove(path)
+
+    monkeypatch.setattr(os, 'remove', refuse_locked)
+
+
+@pytest.fixture
+def archived(two_years, windows_remove):
+    partitions.close_year(two_years, '2023-24', today=TODAY)
+    partitions.archive_year(two_years, '2023-24')
+    return two_years
+
+
+def test_archive_replaces_the_year_file(archived, conn):
+    assert not os.path.exists(partitions.year_path(archived, '2023-24'))
+    archive = columnar.open_columnar(partitions.archive_path(archived, '2023-24'))
+    assert archive.row_count('sales') == 6
+    assert archive.months('sales') == ['2023-05', '2023-06']
+    assert conn.execute('SELECT status FROM partitions').fetchone()[0] == partitions.ARCHIVED
+
+
+def test_reader_for_loads_archived_months(archived):
+    assert read(archived, 'SELECT COUNT(*), SUM(taxable_value) FROM sales', '2023-06', '2023-06') == [(2, 40000)]
+    assert read(archived, 'SELECT COUNT(*) FROM sales', '2023-04', '2024-04') == [(9,)]
+    # Columns a read does not ask for are left NULL
+    rows = read(archived, 'SELECT invoice_number, customer_name FROM sales', '2023-05', '2023-05',
+                {'sales': {'invoice_number'}})
+    assert len(rows) == 4 and all(name is None for _number, name in rows)
+
+
+def test_archived_years_must_be_restored_first(archived):
+    with pytest.raises(partitions.PartitionError):
+        partitions.reopen_year(archived, '2023-24')
+    with pytest.raises(partitions.PartitionError):
+        partitions.archive_year(archived, '2023-24')
+
+
+def test_search_finds_archived_years(archived, conn):
+    years = partitions.search_readers(conn, archived)
+    try:
+        items = search(conn, 'old traders', years=years)['items']
+    finally:
+        for year in years:
+            year.close()
+    assert len(items) == 6
+    assert len({item['id'] for item in items}) == 6
+    assert {item['month'] for item in items} == {'2023-05', '2023-06'}
+
+
+def test_restore_and_reopen_round_trip(archived, conn):
+    assert partitions.restore_year(archived, '2023-24')['sales'] == 6
+    assert not os.path.exists(partitions.archive_path(archived, '2023-24'))
+    assert read(archived, 'SELECT COUNT(*) FROM sales', '2023-05', '2023-06') == [(6,)]
+
+    partitions.reopen_year(archived, '2023-24')
+    assert conn.execute('SELECT COUNT(*) FROM sales').fetchone()[0] == 9
+    assert conn.execute('SELECT COUNT(*) FROM partitions').fetchone()[0] == 0
@@ -0,0 +1,79 @@
+import pytest
+
+from batch_edit import BatchAborted, BatchError, batch_delete, batch_update, validate_request
+from bulk_import import import_rows
+from conftest import connect, make_sale
+from schema import SALES
+from write_queue import WriteQueues
+
+
+@pytest.fixture
+def ids(conn):
+    import_rows(conn, SALES, [make_sale(n, month='2024-04' if n < 3 else '2024-05') for n in range(5)])
+    return [row[0] for row in conn.execute('SELECT id FROM sales ORDER BY invoice_number')]
+
+
+def stored(conn, column):
+    return [row[0] for row in conn.execute(f'SELECT {column} FROM sales ORDER BY invoice_number')]
+
+
+def statuses(result):
+    return [(outcome['id'], outcome['status']) for outcome in result['outcomes']]
+
+
+def test_update_by_ids(conn, ids):
+    result = batch_update(conn, SALES, {'ids': [ids[1], 'SAL_MISSING', ids[3]], 'set': {'customerName': 'Zenith'}})
+    conn.commit()
+    assert statuses(result) == [(ids[1], 'updated'), ('SAL_MISSING', 'not_found'), (ids[3], 'updated')]
+    assert (result['matched'], result['updated'], result['notFound'], result['failed']) == (2, 2, 1, 0)
+    assert stored(conn, 'customer_name') == ['Acme Traders', 'Zenith', 'Acme Traders', 'Zenith', 'Acme Traders']
+
+
+def test_update_by_filter(conn, ids):
+    result = batch_update(conn, SALES, {'filter': {'month': '2024-05'}, 'set': {'taxableValue': 250.5}})
+    conn.commit()
+    assert statuses(result) == [(ids[3], 'updated'), (ids[4], 'updated')]
+    assert stored(conn, 'taxable_value') == [10000, 10000, 10000, 25050, 25050]
+
+
+def test_delete_by_ids(conn, ids):
+    result = batch_delete(conn, SALES, {'ids': [ids[0], ids[0], ids[2]]})
+    conn.commit()
+    assert statuses(result) == [(ids[0], 'deleted'), (ids[2], 'deleted')]
+    assert stored(conn, 'invoice_number') == ['INV/0001', 'INV/0003', 'INV/0004']
+
+
+def test_failing_rows_are_retried_alone(conn, ids):
+    # Both rows cannot take the same invoice number, so the chunk fails
+    # and is redone row by row
+    result = batch_update(conn, SALES, {'ids': ids[1:3], 'set': {'invoiceNumber': 'INV/0100'}})
+    conn.commit()
+    assert statuses(result) == [(ids[1], 'updated'), (ids[2], 'error')]
+    assert 'UNIQUE' in result['outcomes'][1]['error']
+    assert stored(conn, 'invoice_number') == ['INV/0000', 'INV/0002', 'INV/0003', 'INV/0004', 'INV/0100']
+
+
+def test_atomic_batch_is_rolled_back(db_path, conn, ids):
+    queues = WriteQueues(connect)
+    data = {'ids': ids[1:3], 'set': {'invoiceNumber': 'INV/0100'}, 'atomic': True}
+    with pytest.raises(BatchAborted) as aborted:
+        queues.run(db_path, lambda conn: batch_update(conn, SALES, data))
+    assert statuses(aborted.value.result) == [(ids[1], 'updated'), (ids[2], 'error')]
+    assert stored(conn, 'invoice_number') == [f'INV/{n:04d}' for n in range(5)]
+
+    with pytest.raises(BatchAborted):
+        queues.run(db_path, lambda conn: batch_delete(conn, SALES, {'ids': [ids[0], 'SAL_MISSING'], 'atomic': True}))
+    assert len(stored(conn, 'id')) == 5
+
+
+@pytest.mark.parametrize('data', [
+    {'set': {'customerName': 'Zenith'}},
+    {'ids': ['SAL_1'], 'filter': {'month': '2024-04'}, 'set': {'customerName': 'Zenith'}},
+    {'ids': [], 'set': {'customerName': 'Zenith'}},
+    {'filter': {'colour': 'red'}, 'set': {'customerName': 'Zenith'}},
+    {'ids': ['SAL_1'], 'set': {'taxableValue': 'lots'}},
+    {'ids': ['SAL_1'], 'set': {}},
+])
+def test_invalid_requests(data):
+    with pytest.raises(BatchError):
+        validate_request(SALES, data, update=True)
@@ -0,0 +1,109 @@
+import pytest
+
+import bulk_import
+import rollups
+import search
+from bulk_import import BulkImporter, import_rows
+from conftest import make_sale
+from migrations import migrate_database
+from schema import SALES
+from storage import DEFAULT_PROFILE, connection_factory
+
+
+def triggers(conn):
+    return sorted(row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'"))
+
+
+def index_entries(conn):
+    """Every (term, doc, column, offset) in search_index"""
+    conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS temp.search_terms USING fts5vocab(main, search_index, 'instance')")
+    return sorted(tuple(row) for row in conn.execute('SELECT term, doc, col, offset FROM temp.search_terms'))
+
+
+def maintained(conn):
+    """What the triggers maintain, each in a comparable order"""
+    queries = {
+        'totals': 'SELECT * FROM monthly_totals',
+        'versions': 'SELECT table_name, month, version FROM data_versions',
+        'changes': 'SELECT table_name, row_id, op, month, old_month FROM change_log',
+    }
+    state = {name: sorted(tuple(row) for row in conn.execute(sql)) for name, sql in queries.items()}
+    state['search'] = index_entries(conn)
+    return state
+
+
+def found(conn, text):
+    return sorted(item['invoiceNumber'] for item in search.search(conn, text)['items'])
+
+
+@pytest.fixture
+def imported(conn):
+    import_rows(conn, SALES, [make_sale(n) for n in range(5)], chunk_size=2)
+
+
+def test_chunks_index_new_rows(conn, imported):
+    assert found(conn, 'acme') == [f'INV/{n:04d}' for n in range(5)]
+    before = index_entries(conn)
+    search.rebuild(conn)
+    assert index_entries(conn) == before
+
+
+@pytest.mark.parametrize('mode', ['upsert', 'replace'])
+def test_chunks_reindex_changed_rows(conn, imported, mode):
+    rows = [make_sale(n, customerName='Zenith Exports') for n in (1, 3)] + [make_sale(7)]
+    import_rows(conn, SALES, rows, chunk_size=2, mode=mode)
+    assert found(conn, 'zenith') == ['INV/0001', 'INV/0003']
+    assert found(conn, 'acme') == ['INV/0000', 'INV/0002', 'INV/0004', 'INV/0007']
+    before = index_entries(conn)
+    search.rebuild(conn)
+    assert index_entries(conn) == before
+
+
+def test_triggers_are_restored(conn, imported):
+    names = triggers(conn)
+    # A duplicate fails the chunk, which is redone row by row
+    result = import_rows(conn, SALES, [make_sale(8), make_sale(1)])
+    assert result['count'] == 1
+    assert triggers(conn) == names
+    conn.execute('UPDATE sales SET customer_name = ? WHERE invoice_number = ?', ('Orbit Retail', 'INV/0008'))
+    conn.commit()
+    assert found(conn, 'orbit') == ['INV/0008']
+
+
+def test_failed_chunk_keeps_triggers(conn, imported, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError('index failed')
+
+    names = triggers(conn)
+    monkeypatch.setitem(bulk_import.SUSPENDED_TRIGGERS, 'search', fail)
+    with pytest.raises(RuntimeError):
+        import_rows(conn, SALES, [make_sale(9)])
+    assert not conn.in_transaction
+    assert triggers(conn) == names
+    assert conn.execute("SELECT COUNT(*) FROM sales WHERE invoice_number = 'INV/0009'").fetchone()[0] == 0
+
+
+@pytest.mark.parametrize('mode', ['skip', 'upsert', 'replace'])
+def test_chunks_match_the_triggers(tmp_path, conn, mode, monkeypatch):
+    """A chunk leaves rollups, versions, change log and index as the per-row triggers would"""
+    def run(conn):
+        BulkImporter(conn, SALES, chunk_size=3, id_stem='SAL_FIRST').import_rows(
+            [make_sale(n, month=f'2024-0{4 + n % 3}') for n in range(8)]
+        )
+        rows = [make_sale(n, taxableValue=50 * n, month='2024-06', customerName=f'Party {n}') for n in (1, 2, 4)]
+        rows += [make_sale(5), make_sale(9, month='2024-07')]
+        BulkImporter(conn, SALES, chunk_size=2, id_stem='SAL_AGAIN', mode=mode).import_rows(rows)
+        return maintained(conn)
+
+    reference_path = str(tmp_path / 'reference.db')
+    migrate_database(reference_path)
+    reference = connection_factory(DEFAULT_PROFILE)(reference_path)
+    try:
+        monkeypatch.setattr(bulk_import, 'SUSPENDED_TRIGGERS', {})
+        expected = run(reference)
+    finally:
+        reference.close()
+    monkeypatch.undo()
+
+    assert run(conn) == expected
+    assert rollups.verify(conn) == []
@@ -0,0 +1,102 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from connection_pool import ConnectionPool, PoolTimeout
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return {name: str(tmp_path / f'{name}.db') for name in ('a', 'b', 'c')}
+
+
+def counters(pool, *names):
+    stats = pool.stats()
+    return tuple(stats[name] for name in names)
+
+
+def test_close_returns_the_connection(paths):
+    pool = ConnectionPool()
+    conn = pool.connect(paths['a'])
+    conn.execute('CREATE TABLE notes (body TEXT)')
+    conn.commit()
+    conn.execute("INSERT INTO notes VALUES ('uncommitted')")
+    conn.close()
+
+    assert conn.released
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute('SELECT 1')
+    assert counters(pool, 'open', 'idle', 'inUse') == (1, 1, 0)
+    # The same connection comes back, with the open transaction rolled back
+    again = pool.connect(paths['a'])
+    assert not again.in_transaction
+    assert again.execute('SELECT COUNT(*) FROM notes').fetchone()[0] == 0
+    assert counters(pool, 'checkouts', 'hits', 'misses', 'hitRate') == (2, 1, 1, 0.5)
+    again.close()
+
+
+def test_clients_are_bounded(paths):
+    pool = ConnectionPool(max_per_client=1, checkout_timeout=0.05)
+    held = pool.connect(paths['a'])
+    with pytest.raises(PoolTimeout):
+        pool.connect(paths['a'])
+    # Other databases are not held up
+    pool.connect(paths['b']).close()
+    assert counters(pool, 'waits', 'timeouts', 'open') == (1, 1, 2)
+    held.close()
+
+
+def test_waiters_get_released_connections(paths):
+    pool = ConnectionPool(max_per_client=1)
+    held = pool.connect(paths['a'])
+    underlying = held._conn
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.connect(paths['a'])))
+    waiter.start()
+    while not pool.stats()['waits']:
+        time.sleep(0.01)
+    held.close()
+    waiter.join(5)
+
+    assert got[0]._conn is underlying
+    stats = pool.stats()
+    assert (stats['hits'], stats['misses'], stats['open']) == (1, 1, 1)
+    assert stats['waitSeconds'] > 0
+    got[0].close()
+
+
+def test_least_recently_used_databases_are_evicted(paths):
+    pool = ConnectionPool(max_open=2)
+    pool.connect(paths['a']).close()
+    pool.connect(paths['b']).close()
+    pool.connect(paths['a']).close()
+
+    # c needs a slot; b was used longest ago
+    held = pool.connect(paths['c'])
+    assert counters(pool, 'lruEvictions', 'open', 'databases') == (1, 2, 2)
+    pool.connect(paths['a']).close()
+    assert counters(pool, 'hits', 'misses') == (2, 3)
+    # Nothing idle is left to evict while a and c are both in use
+    pool.checkout_timeout = 0.05
+    in_use = pool.connect(paths['a'])
+    with pytest.raises(PoolTimeout):
+        pool.connect(paths['b'])
+    in_use.close()
+    held.close()
+
+
+def test_idle_connections_are_closed(paths):
+    pool = ConnectionPool(idle_timeout=0.05)
+    conn = pool.connect(paths['a'])
+    underlying = conn._conn
+    conn.close()
+    time.sleep(0.1)
+
+    fresh = pool.connect(paths['a'])
+    assert fresh._conn is not underlying
+    with pytest.raises(sqlite3.ProgrammingError):
+        underlying.execute('SELECT 1')
+    assert counters(pool, 'idleEvictions', 'hits', 'misses', 'open') == (1, 0, 2, 1)
+    fresh.close()
@@ -0,0 +1,93 @@
+import io
+import json
+import sqlite3
+import threading
+
+import pytest
+
+from bulk_import import import_rows
+from conftest import make_sale
+from jobs import JobManager, create_jobs_table
+from schema import SALES
+from storage import DEFAULT_PROFILE, connection_factory
+
+
+class RecordingLock:
+    """Writer lock that counts how often it was taken"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.taken = 0
+
+    def __enter__(self):
+        self._lock.acquire()
+        self.taken += 1
+
+    def __exit__(self, *exc_info):
+        self._lock.release()
+
+
+@pytest.fixture
+def manager(tmp_path):
+    def connect_jobs():
+        conn = sqlite3.connect(str(tmp_path / 'jobs.db'))
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    conn = connect_jobs()
+    create_jobs_table(conn)
+    conn.close()
+    lock = RecordingLock()
+    manager = JobManager(connect_jobs, connection_factory(DEFAULT_PROFILE), str(tmp_path / 'payloads'),
+                         chunk_size=2, writer_lock=lambda db_path: lock)
+    manager.lock = lock
+    # Jobs are run by the test, one step at a time
+    manager._submit = lambda job_id: None
+    return manager
+
+
+def submit(manager, db_path, rows, mode):
+    body = io.BytesIO(json.dumps({'sales': rows}).encode('utf-8'))
+    return manager.submit_bulk_import('CLI_1', db_path, SALES, body, mode=mode)['id']
+
+
+def cancel_after_first_chunk(manager, job_id):
+    answers = []
+    manager._on_change = lambda db_path: answers.append(manager.cancel(job_id)) if not answers else None
+    manager._run(job_id)
+    return answers[0]
+
+
+def stored(conn):
+    return dict(conn.execute('SELECT invoice_number, taxable_value FROM sales').fetchall())
+
+
+def test_cancel_removes_inserted_rows(manager, db_path, conn):
+    job_id = submit(manager, db_path, [make_sale(n) for n in range(5)], 'insert')
+    assert cancel_after_first_chunk(manager, job_id)['cancelRequested']
+    job = manager.get(job_id)
+    assert (job['status'], job['count']) == ('cancelled', 0)
+    assert stored(conn) == {}
+    # One chunk, then the delete of the imported rows
+    assert manager.lock.taken == 2
+
+
+@pytest.mark.parametrize('mode', ['upsert', 'replace'])
+def test_started_overwriting_jobs_cannot_be_cancelled(manager, db_path, conn, mode):
+    import_rows(conn, SALES, [make_sale(n) for n in range(3)])
+    job_id = submit(manager, db_path, [make_sale(n, taxableValue=500) for n in range(5)], mode)
+    answer = cancel_after_first_chunk(manager, job_id)
+    assert (answer['cancelRequested'], answer['cancellable']) == (False, False)
+    assert manager.get(job_id)['status'] == 'completed'
+    assert stored(conn) == {f'INV/{n:04d}': 50000 for n in range(5)}
+
+
+def test_cancel_before_an_overwriting_job_writes(manager, db_path, conn):
+    import_rows(conn, SALES, [make_sale(n) for n in range(3)])
+    job_id = submit(manager, db_path, [make_sale(n, taxableValue=500) for n in range(5)], 'replace')
+    # Cancelled after the runner picked the job up but before its first chunk
+    manager._update(job_id, status='running')
+    assert manager.cancel(job_id)['cancelRequested']
+    manager._run(job_id)
+    assert manager.get(job_id)['status'] == 'cancelled'
+    assert stored(conn) == {f'INV/{n:04d}': 10000 for n in range(3)}
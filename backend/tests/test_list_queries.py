@@ -0,0 +1,95 @@
+import json
+import sqlite3
+
+import pytest
+
+from bulk_import import BulkImporter
+from conftest import make_sale
+from list_queries import ListQueryError, decode_cursor, encode_cursor, list_query_json
+from migrations import CLIENT_MIGRATIONS, SUPERSEDED_LIST_INDEXES, add_list_indexes, migrate_database
+from schema import SALES
+
+MONTH = '2024-04'
+
+
+@pytest.fixture
+def sales(conn):
+    # Repeated dates and values, so pages have to break ties on the id
+    BulkImporter(conn, SALES).import_rows(
+        make_sale(n, invoiceDate=f'2024-04-{n % 5 + 1:02d}', taxableValue=100 * (n % 3))
+        for n in range(23)
+    )
+    return conn
+
+
+def read_pages(conn, args):
+    ids, cursor = [], None
+    while True:
+        page_args = dict(args, cursor=cursor) if cursor else dict(args)
+        page = json.loads(list_query_json(conn, SALES, page_args, {'month': MONTH}))
+        assert len(page['items']) <= page['limit']
+        ids.extend(item['id'] for item in page['items'])
+        cursor = page['nextCursor']
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize('args', [
+    {'limit': '5'},
+    {'limit': '4', 'sort': 'taxableValue', 'order': 'asc'},
+    {'limit': '7', 'sort': 'invoiceDate', 'order': 'desc'},
+    {'limit': '23'},
+])
+def test_pages_cover_the_full_list_once(sales, args):
+    unpaginated = {key: value for key, value in args.items() if key != 'limit'}
+    everything = json.loads(b''.join(list_query_json(sales, SALES, unpaginated, {'month': MONTH})))
+    ids = read_pages(sales, args)
+    assert ids == [item['id'] for item in everything]
+    assert len(ids) == len(set(ids)) == 23
+
+
+def test_fields_and_filters_keep_the_cursor_working(sales):
+    page = json.loads(list_query_json(sales, SALES, {'limit': '2', 'fields': 'invoiceNumber',
+                                                     'sort': 'taxableValue', 'taxableValue': '100'},
+                                      {'month': MONTH}))
+    assert all(set(item) == {'invoiceNumber'} for item in page['items'])
+    assert decode_cursor(page['nextCursor'], 2)[0] == 10000
+
+
+def test_cursor_round_trip():
+    values = ['2024-04-01', 'SAL_1_0000001']
+    assert decode_cursor(encode_cursor(values), 2) == values
+
+
+@pytest.mark.parametrize('token', ['not a cursor', encode_cursor(['one value']), encode_cursor({'a': 1})])
+def test_invalid_cursors_are_rejected(token):
+    with pytest.raises(ListQueryError):
+        decode_cursor(token, 2)
+
+
+def list_indexes(conn):
+    return {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%' AND sql IS NOT NULL"
+    )}
+
+
+def test_list_indexes_end_in_id(tmp_path, conn):
+    fresh = list_indexes(conn)
+    assert 'idx_sales_month_type_keyset' in fresh
+    assert not fresh & set(SUPERSEDED_LIST_INDEXES)
+
+    # A database that got the list indexes before they ended in id
+    path = str(tmp_path / 'old.db')
+    version = next(version for version, _description, function in CLIENT_MIGRATIONS if function is add_list_indexes)
+    migrate_database(path, [migration for migration in CLIENT_MIGRATIONS if migration[0] <= version])
+    old = sqlite3.connect(path)
+    old.execute('CREATE INDEX idx_sales_month_type_date ON sales(month, transaction_type, invoice_date, created_at)')
+    old.commit()
+    old.close()
+
+    migrate_database(path)
+    old = sqlite3.connect(path)
+    try:
+        assert list_indexes(old) == fresh
+    finally:
+        old.close()
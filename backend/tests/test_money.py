@@ -0,0 +1,38 @@
+import math
+
+import pytest
+
+from money import to_paise, to_rupees
+
+
+@pytest.mark.parametrize('value, paise', [
+    (118, 11800),
+    (118.5, 11850),
+    ('1,180.50', 118050),
+    (' 42 ', 4200),
+    # Halves of a paisa round up, from the decimal form of the number
+    ('0.125', 13),
+    (0.125, 13),
+    (1.005, 101),
+    ('2.675', 268),
+    ('-0.125', -13),
+])
+def test_to_paise(value, paise):
+    assert to_paise(value) == paise
+
+
+def test_to_paise_blank_values_use_the_default():
+    assert to_paise(None, 500) == 500
+    assert to_paise('', 500) == 500
+    assert to_paise('  ') == 0
+
+
+@pytest.mark.parametrize('value', ['abc', '1.2.3', math.nan, math.inf, 'Infinity'])
+def test_to_paise_rejects_non_amounts(value):
+    with pytest.raises(ValueError):
+        to_paise(value)
+
+
+def test_to_rupees():
+    assert to_rupees(118050) == 1180.5
+    assert to_rupees(None) is None
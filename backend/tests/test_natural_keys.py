@@ -0,0 +1,96 @@
+import sqlite3
+
+import pytest
+
+from bulk_import import import_rows
+from conftest import make_sale
+from migrations import CLIENT_MIGRATIONS, add_natural_key_indexes, migrate_database
+from natural_keys import ImportModeError, parse_mode, quarantine_table
+from schema import B2C_SALES, SALES
+
+
+def stored(conn):
+    return {
+        row['invoice_number']: (row['id'], row['taxable_value'])
+        for row in conn.execute('SELECT id, invoice_number, taxable_value FROM sales')
+    }
+
+
+@pytest.fixture
+def imported(conn):
+    import_rows(conn, SALES, [make_sale(n) for n in range(3)])
+    return stored(conn)
+
+
+def test_insert_reports_duplicates(conn, imported):
+    result = import_rows(conn, SALES, [make_sale(1), make_sale(3)])
+    assert result['count'] == 1
+    assert [error['row'] for error in result['errors']] == [0]
+    assert 'mode=skip' in result['errors'][0]['error']
+
+
+def test_skip_leaves_existing_invoices(conn, imported):
+    result = import_rows(conn, SALES, [make_sale(1, taxableValue=500), make_sale(3)], mode='skip')
+    assert (result['count'], result['skipped'], result['errorCount']) == (1, 1, 0)
+    assert stored(conn)['INV/0001'] == imported['INV/0001']
+
+
+def test_upsert_updates_in_place(conn, imported):
+    result = import_rows(conn, SALES, [make_sale(1, taxableValue=500), make_sale(2), make_sale(3)],
+                         mode='upsert')
+    assert (result['count'], result['updated'], result['skipped']) == (1, 1, 1)
+    rows = stored(conn)
+    assert rows['INV/0001'] == (imported['INV/0001'][0], 50000)
+    assert rows['INV/0002'] == imported['INV/0002']
+
+
+def test_replace_swaps_the_row(conn, imported):
+    result = import_rows(conn, SALES, [make_sale(1, taxableValue=500)], mode='replace')
+    assert (result['count'], result['replaced']) == (1, 1)
+    row_id, taxable = stored(conn)['INV/0001']
+    assert row_id != imported['INV/0001'][0]
+    assert taxable == 50000
+    assert len(stored(conn)) == 3
+
+
+def test_other_invoice_dates_are_new_invoices(conn, imported):
+    result = import_rows(conn, SALES, [make_sale(1, invoiceDate='2024-05-10', month='2024-05')], mode='skip')
+    assert (result['count'], result['skipped']) == (1, 0)
+
+
+def test_modes_need_a_natural_key():
+    assert parse_mode(SALES, None) == 'insert'
+    assert parse_mode(SALES, ' Upsert ') == 'upsert'
+    with pytest.raises(ImportModeError):
+        parse_mode(SALES, 'merge')
+    with pytest.raises(ImportModeError):
+        parse_mode(B2C_SALES, 'skip')
+
+
+def test_migration_quarantines_all_but_the_oldest_copy(tmp_path):
+    # Duplicates can only exist in databases from before the unique indexes
+    path = str(tmp_path / 'old.db')
+    version = next(version for version, _description, function in CLIENT_MIGRATIONS
+                   if function is add_natural_key_indexes)
+    migrate_database(path, [migration for migration in CLIENT_MIGRATIONS if migration[0] < version])
+    old = sqlite3.connect(path)
+    old.executemany(
+        "INSERT INTO sales (id, customer_gstin, customer_name, invoice_number, invoice_type, invoice_date, "
+        "invoice_value, place_of_supply, reverse_charge, taxable_value, integrated_tax, central_tax, "
+        "state_tax, cess, tax_rate, month, created_at) "
+        "VALUES (?, '27AAACA1234A1Z5', 'Acme', 'INV/1', 'Regular', '2024-04-10', "
+        "118, 'MH', 'No', ?, 0, 9, 9, 0, '18', '2024-04', ?)",
+        [('first', 100, '2024-04-10 10:00'), ('second', 500, '2024-04-11 10:00')]
+    )
+    old.commit()
+    old.close()
+
+    migrate_database(path)
+    conn = sqlite3.connect(path)
+    try:
+        assert conn.execute('SELECT id FROM sales').fetchall() == [('first',)]
+        assert conn.execute(f'SELECT id, duplicate_of FROM {quarantine_table("sales")}').fetchall() == [
+            ('second', 'first')
+        ]
+    finally:
+        conn.close()
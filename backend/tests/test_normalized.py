@@ -0,0 +1,38 @@
+import pytest
+
+from bulk_import import BulkImporter
+from conftest import make_sale
+from normalized import rate_bp_sql, rate_from_basis_points, to_basis_points, to_day
+from schema import SALES
+
+RATES = ['0', '5', '12.5%', ' 18 ', '28.00', '0.125', '1.005', '2.675', '-0.125', '0.285']
+
+
+@pytest.mark.parametrize('rate', RATES)
+def test_to_basis_points_matches_the_generated_column(conn, rate):
+    sql = conn.execute(f"SELECT {rate_bp_sql('?')}", (rate.strip().rstrip('%'),)).fetchone()[0]
+    assert to_basis_points(rate) == sql
+
+
+def test_to_basis_points_rounds_halves_away_from_zero():
+    assert to_basis_points('0.125') == 13
+    assert to_basis_points('-0.125') == -13
+    assert to_basis_points(18) == 1800
+
+
+@pytest.mark.parametrize('rate', ['', 'GST', 'nan', 'inf'])
+def test_to_basis_points_rejects_non_rates(rate):
+    with pytest.raises(ValueError):
+        to_basis_points(rate)
+
+
+def test_rate_filter_finds_stored_rows(conn):
+    BulkImporter(conn, SALES).import_rows([make_sale(1, taxRate='0.125'), make_sale(2, taxRate='18')])
+    rows = conn.execute('SELECT invoice_number FROM sales WHERE tax_rate_bp = ?',
+                        (to_basis_points('0.125'),)).fetchall()
+    assert [row[0] for row in rows] == ['INV/0001']
+    assert rate_from_basis_points(1250) == '12.5'
+
+
+def test_to_day_reads_every_stored_format():
+    assert to_day('2024-04-10') == to_day('10-04-2024') == to_day('10/04/2024')
@@ -0,0 +1,103 @@
+import os
+import sqlite3
+import stat
+
+import pytest
+
+import partitions
+from bulk_import import import_rows
+from conftest import TODAY, make_sale, read
+from schema import SALES
+from search import search
+
+
+def count_sales(db_path, first_month, last_month):
+    return read(db_path, 'SELECT COUNT(*) FROM sales', first_month, last_month)[0][0]
+
+
+def test_close_moves_the_year_out(two_years, conn):
+    moved = partitions.close_year(two_years, '2023-24', today=TODAY)
+    assert moved == {'purchases': 0, 'sales': 6, 'b2c_sales': 0}
+
+    path = partitions.year_path(two_years, '2023-24')
+    assert not os.stat(path).st_mode & stat.S_IWUSR
+    assert conn.execute('SELECT COUNT(*) FROM sales').fetchone()[0] == 3
+    assert count_sales(two_years, '2023-05', '2023-05') == 6
+    assert count_sales(two_years, '2024-04', '2024-04') == 3
+    # Across both years the hot tables are shadowed by views over both files
+    assert count_sales(two_years, '2023-04', '2025-03') == 9
+
+
+def test_closed_year_rejects_writes(two_years, conn):
+    partitions.close_year(two_years, '2023-24', today=TODAY)
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute("UPDATE sales SET month = '2023-06' WHERE month = '2024-04'")
+    conn.rollback()
+    names = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")]
+    rows = [make_sale(9, invoiceDate='2023-06-01', month='2023-06'), make_sale(10, month='2024-05')]
+    for mode in ('insert', 'upsert'):
+        result = import_rows(conn, SALES, rows, mode=mode)
+        assert result['errors'] == [{'row': 0, 'field': None, 'error': partitions.CLOSED_MONTH_MESSAGE}]
+    assert conn.execute("SELECT COUNT(*) FROM sales WHERE invoice_number = 'INV/0010'").fetchone()[0] == 1
+    assert [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")] == names
+
+
+def test_unfinished_and_repeated_closes_fail(two_years):
+    with pytest.raises(partitions.PartitionError):
+        partitions.close_year(two_years, '2025-26', today=TODAY)
+    partitions.close_year(two_years, '2023-24', today=TODAY)
+    with pytest.raises(partitions.PartitionError):
+        partitions.close_year(two_years, '2023', today=TODAY)
+
+
+def test_reopen_brings_the_rows_back(two_years, conn):
+    before = conn.execute('SELECT rowid, id FROM sales ORDER BY rowid').fetchall()
+    partitions.close_year(two_years, '2023-24', today=TODAY)
+    assert partitions.reopen_year(two_years, '2023-24')['sales'] == 6
+
+    assert conn.execute('SELECT rowid, id FROM sales ORDER BY rowid').fetchall() == before
+    assert not os.path.exists(partitions.year_path(two_years, '2023-24'))
+    assert partitions.reader_for(conn, two_years, '2023-05', '2023-05') is conn
+    assert conn.execute('SELECT COUNT(*) FROM partitions').fetchone()[0] == 0
+
+
+def test_search_finds_closed_years(two_years, conn):
+    partitions.close_year(two_years, '2023-24', today=TODAY)
+    years = partitions.search_readers(conn, two_years)
+    try:
+        result = search(conn, 'traders', years=years)
+        assert len(result['items']) == 9
+        assert {item['name'] for item in search(conn, 'old', years=years)['items']} == {'Old Traders'}
+        assert len(search(conn, 'traders', month='2023-05', years=years)['items']) == 4
+        page = search(conn, 'traders', limit=5, offset=5, years=years)
+        assert len(page['items']) == 4 and not page['hasMore']
+    finally:
+        for year in years:
+            year.close()
+
+
+def test_spans_are_limited_to_what_sqlite_can_attach(db_path, conn):
+    years = [f'{year}-{(year + 1) % 100:02d}' for year in range(2013, 2024)]
+    import_rows(conn, SALES, [
+        make_sale(n, invoiceDate=f'{2013 + n}-05-10', month=f'{2013 + n}-05') for n in range(len(years))
+    ])
+    for year in years:
+        partitions.close_year(db_path, year, today=TODAY)
+    assert len(years) > partitions.MAX_ATTACHED
+    with pytest.raises(partitions.SpanError):
+        count_sales(db_path, '2013-04', '2025-03')
+
+    # Archived years share one in-memory database
+    for year in years[:2]:
+        partitions.archive_year(db_path, year)
+    assert count_sales(db_path, '2013-04', '2025-03') == len(years)
+
+
+def test_reopen_names_invoices_already_back_in_open_years(two_years, conn):
+    partitions.close_year(two_years, '2023-24', today=TODAY)
+    # The same invoice filed again in an open month
+    import_rows(conn, SALES, [make_sale(2, invoiceDate='2023-05-10', month='2024-05')])
+    with pytest.raises(partitions.PartitionError, match='INV/0002'):
+        partitions.reopen_year(two_years, '2023-24')
+    assert conn.execute('SELECT status FROM partitions').fetchone()[0] == partitions.CLOSED
+    assert count_sales(two_years, '2023-05', '2023-05') == 6
@@ -0,0 +1,48 @@
+import pytest
+
+import rollups
+from bulk_import import import_rows
+from conftest import make_sale
+from schema import SALES
+
+
+@pytest.fixture
+def sales(conn):
+    rows = [make_sale(n) for n in range(3)]
+    rows += [make_sale(n, month='2024-05', taxRate='12', taxableValue=50) for n in range(3, 5)]
+    import_rows(conn, SALES, rows)
+    return conn
+
+
+def totals(conn):
+    return sorted(tuple(row) for row in conn.execute('SELECT * FROM monthly_totals'))
+
+
+def test_triggers_keep_totals_current(sales):
+    sales.execute("UPDATE sales SET taxable_value = 30000, month = '2024-05' WHERE invoice_number = 'INV/0000'")
+    sales.execute("DELETE FROM sales WHERE invoice_number = 'INV/0003'")
+    sales.commit()
+    assert rollups.verify(sales) == []
+    april = rollups.month_summary(sales, '2024-04')['sales']
+    assert (april['invoices'], april['taxableValue']) == (2, 200)
+
+
+def test_rebuild_repairs_drift(sales):
+    expected = totals(sales)
+    # Changes that bypass the triggers
+    sales.execute("UPDATE monthly_totals SET taxable_value = taxable_value + 1 WHERE month = '2024-04'")
+    sales.execute("DELETE FROM monthly_totals WHERE month = '2024-05'")
+    sales.execute("INSERT INTO monthly_totals (source, month, transaction_type, tax_rate_bp, itc_eligible) "
+                  "VALUES ('sales', '2023-01', 'B2B', 0, 0)")
+    sales.commit()
+
+    drift = rollups.verify(sales)
+    assert sorted(entry['key'][1] for entry in drift) == ['2023-01', '2024-04', '2024-05']
+    stray = next(entry for entry in drift if entry['key'][1] == '2023-01')
+    assert stray['expected'] is None
+    missing = next(entry for entry in drift if entry['key'][1] == '2024-05')
+    assert missing['actual'] is None and missing['expected'][0] == 2
+
+    rollups.rebuild(sales)
+    assert rollups.verify(sales) == []
+    assert totals(sales) == expected
@@ -0,0 +1,56 @@
+from email.utils import format_datetime
+
+import pytest
+
+import app
+from bulk_import import import_rows
+from conftest import make_sale
+from schema import SALES
+from versions import month_versions, table_versions, version_etag
+
+PATH = '/api/clients/CLI_1/sales?month=2024-04'
+
+
+@pytest.fixture
+def sales(conn):
+    import_rows(conn, SALES, [make_sale(n) for n in range(3)])
+    return conn
+
+
+def etag(conn, path=PATH):
+    return version_etag(*table_versions(conn, ['sales'], '2024-04', '2024-04'), path)
+
+
+def validators(conn, headers=None):
+    with app.app.test_request_context(PATH, headers=headers):
+        current = app.data_validators(conn, ['sales'], '2024-04', '2024-04')
+        return current, app.not_modified(current)
+
+
+def test_etag_follows_writes_to_its_months(sales):
+    before = etag(sales)
+    assert etag(sales, PATH + '&limit=5') != before
+    import_rows(sales, SALES, [make_sale(9, month='2024-05')])
+    assert etag(sales) == before
+
+    sales.execute("UPDATE sales SET customer_name = 'Zenith' WHERE invoice_number = 'INV/0001'")
+    sales.commit()
+    assert etag(sales) != before
+    assert month_versions(sales, '2024-04')['sales']['version'] == 4
+
+
+def test_unchanged_data_is_not_modified(sales):
+    (tag, last_modified), fresh = validators(sales)
+    assert fresh is None
+
+    _, response = validators(sales, {'If-None-Match': f'"{tag}"'})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == f'"{tag}"'
+    assert response.headers['Cache-Control'] == 'no-cache'
+    _, response = validators(sales, {'If-Modified-Since': format_datetime(last_modified, usegmt=True)})
+    assert response.status_code == 304
+
+    sales.execute("DELETE FROM sales WHERE invoice_number = 'INV/0002'")
+    sales.commit()
+    (new_tag, _), stale = validators(sales, {'If-None-Match': f'"{tag}"'})
+    assert stale is None and new_tag != tag
@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+
+from conftest import connect
+from write_queue import WriteQueues
+
+
+@pytest.fixture
+def queues(db_path, conn):
+    conn.execute('CREATE TABLE notes (body TEXT NOT NULL)')
+    conn.commit()
+    return WriteQueues(connect, idle_timeout=0.1)
+
+
+def add(body):
+    def job(conn):
+        conn.execute('INSERT INTO notes (body) VALUES (?)', (body,))
+        return body
+    return job
+
+
+def fail(body):
+    def job(conn):
+        conn.execute('INSERT INTO notes (body) VALUES (?)', (body,))
+        raise ValueError(body)
+    return job
+
+
+def held(queues, db_path):
+    """Start a job that keeps the writer busy until the returned event is set"""
+    started, release = threading.Event(), threading.Event()
+
+    def job(conn):
+        started.set()
+        release.wait(5)
+
+    future = queues.submit(db_path, job)
+    assert started.wait(5)
+    return future, release
+
+
+def notes(conn):
+    return sorted(row[0] for row in conn.execute('SELECT body FROM notes'))
+
+
+def wait_for(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_waiting_jobs_commit_together(queues, db_path, conn):
+    first, release = held(queues, db_path)
+    futures = [queues.submit(db_path, add(f'note {n}')) for n in range(3)]
+    release.set()
+    assert [future.result(5) for future in futures] == ['note 0', 'note 1', 'note 2']
+    first.result(5)
+    assert notes(conn) == ['note 0', 'note 1', 'note 2']
+    stats = queues.stats()
+    assert (stats['jobs'], stats['batches'], stats['largestBatch']) == (4, 2, 3)
+
+
+def test_failing_job_is_rolled_back_alone(queues, db_path, conn):
+    first, release = held(queues, db_path)
+    futures = [queues.submit(db_path, job) for job in (add('kept'), fail('dropped'), add('also kept'))]
+    release.set()
+    first.result(5)
+    assert futures[0].result(5) == 'kept'
+    with pytest.raises(ValueError, match='dropped'):
+        futures[1].result(5)
+    assert futures[2].result(5) == 'also kept'
+    assert notes(conn) == ['also kept', 'kept']
+    stats = queues.stats()
+    assert (stats['failed'], stats['batches'], stats['largestBatch']) == (1, 2, 3)
+
+
+def test_idle_writer_exits_and_restarts(queues, db_path, conn):
+    assert queues.run(db_path, add('before')) == 'before'
+    wait_for(lambda: queues.stats()['writers'] == 0)
+    assert queues.run(db_path, add('after')) == 'after'
+    assert notes(conn) == ['after', 'before']
+    wait_for(lambda: not any(thread.name == f'writer:{db_path}' for thread in threading.enumerate()))
+    assert queues.stats()['writers'] == 0
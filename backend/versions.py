@@ -0,0 +1,154 @@
+"""
+Per-table, per-month data versions of a client database.
+
+data_versions holds a counter for every (table, month) that has ever
+been written, together with the time of the last change. Triggers on
+purchases, sales, b2c_sales and sundry_debtors bump the counters inside
+the same transaction as every insert, update and delete, so each write
+path (single rows, bulk and file imports, background jobs) is covered.
+sundry_debtors has no month and is versioned under month ''. Bulk
+imports suspend the triggers and bump each chunk's months with
+bump_rows instead.
+
+Counters only ever grow, so the sum of the counters over a set of
+tables and a month range changes whenever any row in it does. The API
+turns that sum into an ETag and the latest change into Last-Modified,
+and answers conditional GETs with 304 without running the query.
+"""
+
+import hashlib
+
+# Month expression per versioned table; '{p}' is NEW. or OLD. inside triggers
+VERSIONED_TABLES = {
+    'purchases': '{p}month',
+    'sales': '{p}month',
+    'b2c_sales': '{p}month',
+    'sundry_debtors': "''",
+}
+
+CHANGED_AT_SQL = "CAST(strftime('%s', 'now') AS INTEGER)"
+
+
+def _bump_sql(table, month_expr, condition=None):
+    """Upsert that increments the counter of one (table, month)"""
+    source = f"SELECT '{table}', {month_expr}, 1, {CHANGED_AT_SQL} WHERE {condition or 1}"
+    return (
+        f'INSERT INTO data_versions (table_name, month, version, changed_at) {source} '
+        f'ON CONFLICT (table_name, month) DO UPDATE SET '
+        f'version = version + 1, changed_at = excluded.changed_at;'
+    )
+
+
+def bump_rows(conn, table, rows_sql, params=(), old=None, new=None):
+    """Set-based counterpart of the triggers, for writes that suspend them
+
+    rows_sql is the FROM ... WHERE clause selecting the written rows; old
+    and new are the prefixes of their old and new values in it, as OLD.
+    and NEW. are in the triggers (see bulk_import.py). Each month goes up
+    by its number of rows, as it would row by row.
+    """
+    month = VERSIONED_TABLES[table]
+    sets = []
+    if new is not None:
+        sets.append((month.format(p=new), rows_sql))
+    if old is not None:
+        condition = '' if new is None else f' AND {month.format(p=old)} IS NOT {month.format(p=new)}'
+        sets.append((month.format(p=old), rows_sql + condition))
+    for month_expr, source in sets:
+        conn.execute(
+            f"INSERT INTO data_versions (table_name, month, version, changed_at) "
+            f"SELECT '{table}', {month_expr}, COUNT(*), {CHANGED_AT_SQL} {source} GROUP BY 2 "
+            f'ON CONFLICT (table_name, month) DO UPDATE SET '
+            f'version = version + excluded.version, changed_at = excluded.changed_at',
+            params
+        )
+
+
+def create_triggers(conn):
+    """(Re)create the triggers that maintain data_versions"""
+    for table, month in VERSIONED_TABLES.items():
+        for event in ('insert', 'update', 'delete'):
+            conn.execute(f'DROP TRIGGER IF EXISTS trg_{table}_version_{event}')
+        new_month, old_month = month.format(p='NEW.'), month.format(p='OLD.')
+        conn.execute(
+            f'CREATE TRIGGER trg_{table}_version_insert AFTER INSERT ON {table} '
+            f'BEGIN {_bump_sql(table, new_month)} END'
+        )
+        # A row moved to another month changes both months
+        conn.execute(
+            f'CREATE TRIGGER trg_{table}_version_update AFTER UPDATE ON {table} '
+            f'BEGIN {_bump_sql(table, new_month)} '
+            f'{_bump_sql(table, old_month, f"{old_month} IS NOT {new_month}")} END'
+        )
+        conn.execute(
+            f'CREATE TRIGGER trg_{table}_version_delete AFTER DELETE ON {table} '
+            f'BEGIN {_bump_sql(table, old_month)} END'
+        )
+
+
+def create_versions(conn):
+    """Create data_versions with its triggers, starting every existing month at 1"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            table_name TEXT NOT NULL,
+            month TEXT NOT NULL,
+            version INTEGER NOT NULL DEFAULT 0,
+            changed_at INTEGER NOT NULL,
+            PRIMARY KEY (table_name, month)
+        ) WITHOUT ROWID
+    ''')
+    create_triggers(conn)
+    for table, month in VERSIONED_TABLES.items():
+        month = month.format(p='')
+        conn.execute(f'''
+            INSERT OR IGNORE INTO data_versions (table_name, month, version, changed_at)
+            SELECT DISTINCT '{table}', {month}, 1, {CHANGED_AT_SQL} FROM {table}
+        ''')
+
+
+def table_versions(conn, tables, first_month=None, last_month=None):
+    """(summed version, last change as epoch seconds or None) of tables over a month range
+
+    Without months every month counts; sundry_debtors always matches.
+    """
+    where = [f"table_name IN ({', '.join('?' * len(tables))})"]
+    params = list(tables)
+    if first_month is not None:
+        where.append("(month >= ? OR table_name = 'sundry_debtors')")
+        params.append(first_month)
+    if last_month is not None:
+        where.append("(month <= ? OR table_name = 'sundry_debtors')")
+        params.append(last_month)
+    version, changed_at = conn.execute(
+        f"SELECT TOTAL(version), MAX(changed_at) FROM data_versions WHERE {' AND '.join(where)}",
+        params
+    ).fetchone()
+    return int(version), changed_at
+
+
+def month_versions(conn, month=None):
+    """Counters per table for one month, or per table and month"""
+    if month is not None:
+        rows = conn.execute(
+            "SELECT table_name, version, changed_at FROM data_versions WHERE month = ? OR table_name = 'sundry_debtors'",
+            (month,)
+        ).fetchall()
+        return {table: {'version': version, 'changedAt': changed_at} for table, version, changed_at in rows}
+
+    versions = {}
+    for table, row_month, version, changed_at in conn.execute(
+        'SELECT table_name, month, version, changed_at FROM data_versions ORDER BY table_name, month'
+    ):
+        versions.setdefault(table, {})[row_month] = {'version': version, 'changedAt': changed_at}
+    return versions
+
+
+def version_etag(version, changed_at, *parts):
+    """Opaque entity tag for a representation of versioned data
+
+    parts distinguish representations of the same data (path and query).
+    The change time is included so a recreated database with the same
+    counters does not reuse old tags.
+    """
+    raw = '\0'.join(str(part) for part in (version, changed_at) + parts)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:24]
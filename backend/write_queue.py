@@ -0,0 +1,146 @@
+"""
+Single-writer queues with group commit for the client databases.
+
+SQLite allows one writer per database at a time. When several request
+threads write to the same client database they would otherwise take
+turns on the write lock, each paying for its own commit. Here every
+client database gets one writer thread; write jobs submitted for it are
+queued, and the writer runs all jobs that are waiting (up to max_batch)
+in a single transaction. Each job runs inside its own SAVEPOINT, so a
+failing job is rolled back and reported to its caller without affecting
+the rest of the batch.
+
+A job is a function taking the connection; whatever it returns is
+handed back to the caller once the batch has committed. Writer threads
+exit after idle_timeout seconds without work and are restarted on demand.
+
+Chunked imports commit thousands of rows per transaction through a
+connection of their own rather than as queued jobs. They hold the
+database's writer_lock around each chunk, which the writer thread also
+holds while it writes a batch, so there is still one writer at a time
+and queued jobs wait for at most one chunk.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class WriteQueues:
+    """One writer thread and job queue per database path"""
+
+    def __init__(self, connect, max_batch=64, idle_timeout=30.0):
+        self._connect = connect
+        self.max_batch = max_batch
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._queues = {}  # db_path -> queue.Queue of (function, Future)
+        self._writer_locks = {}  # db_path -> threading.Lock held while writing
+        self._stats = {'jobs': 0, 'failed': 0, 'batches': 0, 'largestBatch': 0, 'commitSeconds': 0.0}
+
+    def submit(self, db_path, function):
+        """Queue function(conn) for db_path; returns a Future with its result"""
+        future = Future()
+        with self._lock:
+            jobs = self._queues.get(db_path)
+            if jobs is None:
+                jobs = self._queues[db_path] = queue.Queue()
+                threading.Thread(target=self._writer, args=(db_path, jobs),
+                                 name=f'writer:{db_path}', daemon=True).start()
+            jobs.put((function, future))
+        return future
+
+    def run(self, db_path, function):
+        """Queue function(conn) and wait until it has been committed"""
+        return self.submit(db_path, function).result()
+
+    def writer_lock(self, db_path):
+        """Lock held by whoever is writing to db_path: the writer thread or an import"""
+        with self._lock:
+            return self._writer_locks.setdefault(db_path, threading.Lock())
+
+    def stats(self):
+        """Queue counters for the health endpoint"""
+        with self._lock:
+            snapshot = dict(self._stats)
+            batches = self._stats['batches']
+            snapshot['commitSeconds'] = round(self._stats['commitSeconds'], 6)
+            snapshot['averageBatch'] = round(self._stats['jobs'] / batches, 2) if batches else 0.0
+            snapshot['writers'] = len(self._queues)
+            snapshot['queued'] = sum(jobs.qsize() for jobs in self._queues.values())
+            return snapshot
+
+    def _writer(self, db_path, jobs):
+        writer_lock = self.writer_lock(db_path)
+        while True:
+            try:
+                batch = [jobs.get(timeout=self.idle_timeout)]
+            except queue.Empty:
+                with self._lock:
+                    # submit() puts under the same lock, so nothing can slip in here
+                    if jobs.empty():
+                        del self._queues[db_path]
+                        return
+                continue
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(jobs.get_nowait())
+                except queue.Empty:
+                    break
+            with writer_lock:
+                self._run_batch(db_path, batch)
+
+    def _run_batch(self, db_path, batch):
+        started = time.monotonic()
+        done = []
+        failed = 0
+        try:
+            conn = self._connect(db_path)
+        except Exception as e:
+            for _function, future in batch:
+                future.set_exception(e)
+            self._record(len(batch), len(batch), started)
+            return
+
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for function, future in batch:
+                conn.execute('SAVEPOINT job')
+                try:
+                    result = function(conn)
+                except Exception as e:
+                    conn.execute('ROLLBACK TO job')
+                    conn.execute('RELEASE job')
+                    future.set_exception(e)
+                    failed += 1
+                    continue
+                conn.execute('RELEASE job')
+                done.append((future, result))
+            conn.commit()
+        except Exception as e:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            for future, _result in done:
+                future.set_exception(e)
+            for _function, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            self._record(len(batch), len(batch), started)
+            return
+        finally:
+            conn.close()
+
+        for future, result in done:
+            future.set_result(result)
+        self._record(len(batch), failed, started)
+
+    def _record(self, size, failed, started):
+        with self._lock:
+            self._stats['jobs'] += size
+            self._stats['failed'] += failed
+            self._stats['batches'] += 1
+            self._stats['largestBatch'] = max(self._stats['largestBatch'], size)
+            self._stats['commitSeconds'] += time.monotonic() - started